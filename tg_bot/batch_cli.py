@@ -0,0 +1,254 @@
+"""
+Пакетный расчет портфеля сделок из файла.
+Строки читаются потоком и обрабатываются порциями, результаты записываются по мере расчета.
+Формат файлов определяется по расширению: .csv или .jsonl.
+
+Запуск: python batch_cli.py mortgage deals.csv results.csv [--chunk-size 10000] [--workers 4]
+
+Поля входных строк (поле id, если есть, переносится в результат):
+- mortgage: object_cost, down_payment_percent, loan_term_years, annual_rate, grace_years, grace_rate
+- tranche: cost, markup, initial_percent, loan_term_years, tranches - список траншей
+  (в CSV строкой вида "2025-01:30:6;2025-07:30:8;2026-03::10" - дата:процент:ставка)
+- installment: cost, markup, down_payment, ddu_date, commissioning_date, key_handover_date (ДД.ММ.ГГГГ),
+  program - название программы рассрочки (необязательно)
+Строки проверяются схемами из schema.py; при ошибках выводятся все ошибки порции с номерами строк.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from dates import format_month
+from installment_rules import PROGRAMS, evaluate_portfolio
+from mortgage_batch import compute_mortgage_batch
+from schema import INSTALLMENT_SCHEMA, MORTGAGE_SCHEMA, TRANCHE_SCHEMA, SchemaError
+from tranche_engine import build_tables, compute_tranche_batch
+
+date_format = '%d.%m.%Y'
+
+
+def iter_rows(path: str):
+    """Построчно читает сделки из CSV или JSONL файла."""
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def iter_chunks(rows, chunk_size: int):
+    """Разбивает поток строк на списки длиной не больше chunk_size."""
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ResultWriter:
+    """Записывает результаты в CSV или JSONL файл по мере поступления."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._jsonl = path.endswith('.jsonl')
+        self._csv_writer = None
+
+    def write(self, results: list[dict]) -> None:
+        if self._jsonl:
+            self._file.writelines(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+        else:
+            if self._csv_writer is None and results:
+                self._csv_writer = csv.DictWriter(self._file, fieldnames=list(results[0]))
+                self._csv_writer.writeheader()
+            self._csv_writer.writerows(results)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Поля ипотечной сделки, проверяемые векторно по всей порции
+MORTGAGE_COLUMNS = (
+    'object_cost', 'down_payment_percent', 'loan_term_years', 'annual_rate', 'grace_years', 'grace_rate',
+)
+
+
+def _with_id(row: dict, result: dict) -> dict:
+    return {'id': row['id'], **result} if 'id' in row else result
+
+
+def price_mortgage_chunk(chunk: list[dict]) -> list[dict]:
+    """Рассчитывает порцию ипотечных сделок одним векторным вызовом."""
+    columns = MORTGAGE_SCHEMA.check_columns(chunk, MORTGAGE_COLUMNS)
+    object_cost = columns['object_cost']
+    loan_amounts = object_cost - object_cost * (columns['down_payment_percent'] / 100)
+    result = compute_mortgage_batch(
+        loan_amounts,
+        columns['loan_term_years'],
+        columns['annual_rate'],
+        columns['grace_years'],
+        columns['grace_rate'],
+    )
+    return [
+        _with_id(row, {
+            'loan_amount': round(float(loan_amount), 2),
+            'grace_monthly_payment': round(float(grace_payment), 2),
+            'remaining_loan': round(float(remaining_loan), 2),
+            'main_monthly_payment': round(float(main_payment), 2),
+            'overpayment': round(float(overpayment), 2),
+        })
+        for row, loan_amount, grace_payment, remaining_loan, main_payment, overpayment in zip(
+            chunk, loan_amounts, result['grace_monthly_payment'], result['remaining_loan'],
+            result['main_monthly_payment'], result['overpayment']
+        )
+    ]
+
+
+def _parse_tranches(value):
+    """
+    Транши из JSON-списка или строки "дата:процент:ставка;...". Значения проверяет TRANCHE_SCHEMA;
+    строка неверного вида возвращается как есть и отклоняется схемой.
+    """
+    if not isinstance(value, str):
+        return value
+    tranches = []
+    for item in value.split(';'):
+        parts = item.split(':')
+        if len(parts) != 3:
+            return value
+        tranches.append(dict(zip(('date', 'percent', 'rate'), parts)))
+    return tranches
+
+
+def price_tranche_chunk(chunk: list[dict]) -> list[dict]:
+    """Рассчитывает порцию сделок с траншевой ипотекой одним векторным вызовом."""
+    plans = TRANCHE_SCHEMA.check_many([dict(row, tranches=_parse_tranches(row.get('tranches'))) for row in chunk])
+    plan_table, tranche_table = build_tables(plans)
+    result = compute_tranche_batch(plan_table, tranche_table, with_timeline=False)
+
+    # Платежи по траншам, сгруппированные по планам (транши внутри плана упорядочены по дате)
+    plan_ends = np.cumsum([len(plan['tranches']) for plan in plans])
+    tranche_payments = np.split(result['tranches']['monthly_payment'], plan_ends[:-1])
+    return [
+        _with_id(row, {
+            'full_cost': round(float(result['plans']['full_cost'][idx]), 2),
+            'initial_payment': round(float(result['plans']['initial_payment'][idx]), 2),
+            'loan_amount': round(float(result['plans']['loan_amount'][idx]), 2),
+            'start_date': format_month(result['plans']['start_month'][idx]),
+            'tranche_payments': ';'.join(f'{payment:.2f}' for payment in tranche_payments[idx]),
+            'peak_payment': round(float(result['plans']['peak_payment'][idx]), 2),
+            'peak_date': format_month(result['plans']['peak_month'][idx]),
+        })
+        for idx, row in enumerate(chunk)
+    ]
+
+
+def price_installment_chunk(chunk: list[dict]) -> list[dict]:
+    """Рассчитывает порцию сделок с рассрочкой по программам из installment_rules."""
+    contracts = INSTALLMENT_SCHEMA.check_many(chunk)
+    return [
+        _with_id(row, {
+            'full_cost': round(result['full_cost'], 2),
+            'payments': ';'.join(
+                f'{payment["date"].strftime(date_format)}:{payment["amount"]:.2f}' for payment in result['payments']
+            ),
+        })
+        for row, result in zip(chunk, evaluate_portfolio(contracts, PROGRAMS))
+    ]
+
+
+PRICERS = {
+    'mortgage': price_mortgage_chunk,
+    'tranche': price_tranche_chunk,
+    'installment': price_installment_chunk,
+}
+
+
+def _chunk_error(err: Exception, first_row: int, size: int) -> ValueError:
+    """Ошибка расчета порции с номерами строк файла; ошибки проверки перечисляются все."""
+    if isinstance(err, SchemaError):
+        return ValueError('Ошибки в данных:\n' + '\n'.join(
+            f'строка {first_row + index}: {message}' for index, _, message in err.errors))
+    return ValueError(f'Ошибка в строках {first_row}-{first_row + size - 1}: {err!r}')
+
+
+def iter_priced_chunks(pricer, chunks, workers: int = 1):
+    """
+    Рассчитывает порции и выдает списки результатов в исходном порядке порций.
+    При workers > 1 порции распределяются по процессам; чтобы память не росла,
+    одновременно в работе находится не больше 2 * workers порций.
+    """
+    first_row = 1
+    if workers <= 1:
+        for chunk in chunks:
+            try:
+                yield pricer(chunk)
+            except (KeyError, ValueError) as err:
+                raise _chunk_error(err, first_row, len(chunk)) from err
+            first_row += len(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunks = iter(chunks)
+        while True:
+            for chunk in islice(chunks, 2 * workers - len(pending)):
+                pending.append((len(chunk), executor.submit(pricer, chunk)))
+            if not pending:
+                return
+            size, future = pending.popleft()
+            try:
+                yield future.result()
+            except (KeyError, ValueError) as err:
+                for _, other in pending:
+                    other.cancel()
+                raise _chunk_error(err, first_row, size) from err
+            first_row += size
+
+
+def run_batch(product: str, input_path: str, output_path: str, chunk_size: int = 10_000, workers: int = 1) -> int:
+    """
+    Рассчитывает все сделки из input_path и записывает результаты в output_path.
+    workers - количество процессов для расчета. Возвращает число строк.
+    """
+    writer = ResultWriter(output_path)
+    total = 0
+    try:
+        for results in iter_priced_chunks(PRICERS[product], iter_chunks(iter_rows(input_path), chunk_size), workers):
+            writer.write(results)
+            total += len(results)
+    finally:
+        writer.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетный расчет сделок из CSV/JSONL файла.')
+    parser.add_argument('product', choices=sorted(PRICERS), help='вид расчета')
+    parser.add_argument('input', help='файл со сделками (.csv или .jsonl)')
+    parser.add_argument('output', help='файл для результатов (.csv или .jsonl)')
+    parser.add_argument('--chunk-size', type=int, default=10_000, help='количество строк в порции')
+    parser.add_argument('--workers', type=int, default=1, help='количество процессов для расчета')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        total = run_batch(args.product, args.input, args.output, args.chunk_size, args.workers)
+    except ValueError as err:
+        print(f'❌ {err}', file=sys.stderr)
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - started
+    print(f'Обработано строк: {total} за {elapsed:.2f} с ({total / elapsed if elapsed else 0:.0f} строк/с)',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
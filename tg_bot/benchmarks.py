@@ -0,0 +1,676 @@
+"""
+Набор замеров производительности расчетов.
+Каждый сценарий регистрируется декоратором @scenario и строит нагрузку на данных
+с фиксированным зерном генератора, поэтому результаты разных версий сопоставимы.
+Для сценария измеряются лучшее и медианное время, операций в секунду и пик памяти (tracemalloc).
+
+Запуск: python benchmarks.py [-k mortgage -k tranche.batch] [--repeat 5] [--scale 1.0] [--json results.json]
+        python benchmarks.py --list
+        python benchmarks.py --parallel [--rows 200000] [--chunk-size 5000] [--max-workers 8]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+import installment_calculator
+import installment_calculator_limits
+from batch_cli import MORTGAGE_COLUMNS, PRICERS, iter_chunks, iter_priced_chunks
+from comparison import compare_products
+from dates import first_day, parse_date, parse_month
+from effective_rate import effective_rates, full_credit_cost, mortgage_cash_flows
+from export import INSTALLMENT_COLUMNS, SCHEDULE_COLUMNS, export_rows, installment_rows
+from input_tools import validate_float, validate_int
+from installment_rules import PROGRAMS, evaluate_portfolio
+from money import compute_mortgage_exact, compute_mortgage_exact_batch, iter_exact_schedule
+from mortgage_batch import calculate_annuity_batch, compute_mortgage_batch
+from mortgage_calculator import (calculate_annuity, compute_mortgage, validate_date, validate_percent,
+                                 validate_positive_float, validate_yes_no)
+from mortgage_solvers import max_loan_amount, required_rate
+from payment_schedule import (iter_mortgage_schedule, iter_tranche_schedule, mortgage_schedule_columns,
+                              tranche_schedule_columns)
+from prepayment import simulate_prepayments
+from tranche_engine import build_tables, compute_tranche_batch
+from schema import MORTGAGE_SCHEMA, TRANCHE_SCHEMA
+from sensitivity import mortgage_sensitivity, rate_shocks, tranche_sensitivity
+from tranche_mortgage_calculator import calculate_mortgage as calculate_tranche_mortgage
+
+SEED = 20240101
+
+
+class Scenario(NamedTuple):
+    """Сценарий замера: setup(scale) готовит данные и возвращает (нагрузка без аргументов, число операций)."""
+    name: str
+    group: str
+    setup: Callable[[float], tuple[Callable[[], object], int]]
+
+
+SCENARIOS = {}
+
+
+def scenario(name: str, group: str):
+    """Регистрирует функцию подготовки сценария в SCENARIOS."""
+    def register(setup):
+        SCENARIOS[name] = Scenario(name, group, setup)
+        return setup
+    return register
+
+
+def _size(base: int, scale: float) -> int:
+    return max(int(base * scale), 1)
+
+
+def make_mortgage_rows(count: int, seed: int = SEED) -> list[dict]:
+    """Синтетические ипотечные сделки, в том числе с льготным периодом."""
+    rng = random.Random(seed)
+    rows = []
+    for idx in range(count):
+        loan_term_years = rng.randint(5, 30)
+        grace_years = rng.choice([0, 0, rng.randint(1, 3)])
+        rows.append({
+            'id': idx,
+            'object_cost': round(rng.uniform(3e6, 3e7), 2),
+            'down_payment_percent': rng.choice([15, 20, 30, 50]),
+            'loan_term_years': loan_term_years,
+            'annual_rate': rng.choice([6.0, 8.5, 16.0, 21.5]),
+            'grace_years': grace_years,
+            'grace_rate': rng.choice([0.1, 3.0, 6.0]) if grace_years else 0.0,
+        })
+    return rows
+
+
+def make_tranche_rows(count: int, seed: int = SEED) -> list[dict]:
+    """Синтетические сделки с траншевой ипотекой от 1 до 10 траншей."""
+    rng = random.Random(seed)
+    rows = []
+    for idx in range(count):
+        num_tranches = rng.randint(1, 10)
+        first_month = 2025 * 12 + rng.randint(0, 23)
+        months = sorted(rng.sample(range(first_month, first_month + 48), num_tranches))
+        tranches = []
+        for tranche_idx, month in enumerate(months):
+            tranche = {'date': f'{month // 12:04d}-{month % 12 + 1:02d}', 'rate': rng.choice([0.1, 6.0, 12.0])}
+            if tranche_idx < num_tranches - 1:
+                tranche['percent'] = rng.uniform(2, 8)
+            tranches.append(tranche)
+        rows.append({
+            'id': idx,
+            'cost': round(rng.uniform(5e6, 5e7), 2),
+            'markup': rng.choice([0.0, 5.0, 10.0]),
+            'initial_percent': rng.choice([10.0, 20.0]),
+            'loan_term_years': rng.randint(10, 30),
+            'tranches': tranches,
+        })
+    return rows
+
+
+def make_installment_rows(count: int, seed: int = SEED) -> list[dict]:
+    """Синтетические договоры рассрочки с датами в формате ДД.ММ.ГГГГ."""
+    rng = random.Random(seed)
+    rows = []
+    for idx in range(count):
+        ddu_date = date(2025, rng.randint(1, 12), rng.randint(1, 28))
+        commissioning_date = date(rng.randint(2026, 2028), rng.randint(1, 12), rng.randint(1, 28))
+        key_handover_date = date(commissioning_date.year + 1, rng.randint(1, 12), rng.randint(1, 28))
+        rows.append({
+            'id': idx,
+            'cost': round(rng.uniform(3e6, 3e7), 2),
+            'markup': rng.choice([0.0, 5.0, 10.0]),
+            'down_payment': rng.choice([10.0, 20.0, 50.0]),
+            'ddu_date': ddu_date.strftime('%d.%m.%Y'),
+            'commissioning_date': commissioning_date.strftime('%d.%m.%Y'),
+            'key_handover_date': key_handover_date.strftime('%d.%m.%Y'),
+            'program': rng.choice(['standard', 'limits']),
+        })
+    return rows
+
+
+def to_mortgage_params(rows: list[dict]) -> list[dict]:
+    """Параметры compute_mortgage() из строк make_mortgage_rows(): дата первоначального взноса 31.01.2025."""
+    return [dict(row, start_date=date(2025, 1, 31)) for row in rows]
+
+
+def to_tranche_params(rows: list[dict]) -> list[dict]:
+    """Параметры расчета ипотеки с траншами из строк make_tranche_rows()."""
+    return [dict(row, num_tranches=len(row['tranches'])) for row in rows]
+
+
+def to_installment_params(rows: list[dict]) -> list[dict]:
+    """Параметры расчета рассрочки из строк make_installment_rows(): даты разобраны в date."""
+    return [
+        dict(row, **{field: parse_date(row[field])
+                     for field in ('ddu_date', 'commissioning_date', 'key_handover_date')})
+        for row in rows
+    ]
+
+
+def _mortgage_columns(rows: list[dict]) -> tuple:
+    """Массивы параметров для compute_mortgage_batch(): тело кредита, срок, ставка, льготный период."""
+    object_cost = np.array([row['object_cost'] for row in rows])
+    return (
+        object_cost - object_cost * (np.array([row['down_payment_percent'] for row in rows]) / 100),
+        np.array([row['loan_term_years'] for row in rows]),
+        np.array([row['annual_rate'] for row in rows]),
+        np.array([row['grace_years'] for row in rows]),
+        np.array([row['grace_rate'] for row in rows]),
+    )
+
+
+@scenario('validators.mortgage_calculator', 'validation')
+def _validators_mortgage(scale: float):
+    rng = random.Random(SEED)
+    values = [(f'{rng.uniform(1, 3e7):.2f}', f'{rng.uniform(1, 100):.1f}',
+               f'{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2024, 2030)}',
+               rng.choice(['да', 'Нет', ' ДА ']))
+              for _ in range(_size(20_000, scale))]
+
+    def run():
+        for number, percent, date_str, answer in values:
+            validate_positive_float(number, 'Стоимость объекта')
+            validate_percent(percent, 'Первоначальный взнос')
+            validate_date(date_str)
+            validate_yes_no(answer)
+    return run, len(values) * 4
+
+
+@scenario('validators.input_tools', 'validation')
+def _validators_input_tools(scale: float):
+    rng = random.Random(SEED)
+    values = [(f'{rng.uniform(1, 3e7):.2f}', rng.choice([str(rng.randint(1, 30)), f'{rng.randint(1, 30)}.0']))
+              for _ in range(_size(50_000, scale))]
+
+    def run():
+        for number, term in values:
+            validate_float(number, 'Стоимость объекта', 0)
+            validate_int(term, 'Срок кредита', 1, 30)
+    return run, len(values) * 2
+
+
+def _as_text(rows: list[dict]) -> list[dict]:
+    """Строки в виде, прочитанном из CSV: все значения - строки."""
+    return [{key: str(value) for key, value in row.items()} for row in rows]
+
+
+@scenario('validators.schema.mortgage', 'validation')
+def _validators_schema_mortgage(scale: float):
+    rows = _as_text(make_mortgage_rows(_size(50_000, scale)))
+    return lambda: MORTGAGE_SCHEMA.check_many(rows), len(rows)
+
+
+@scenario('validators.schema.columns', 'validation')
+def _validators_schema_columns(scale: float):
+    rows = _as_text(make_mortgage_rows(_size(200_000, scale)))
+    return lambda: MORTGAGE_SCHEMA.check_columns(rows, MORTGAGE_COLUMNS), len(rows)
+
+
+@scenario('validators.schema.tranche', 'validation')
+def _validators_schema_tranche(scale: float):
+    rows = make_tranche_rows(_size(10_000, scale))
+    return lambda: TRANCHE_SCHEMA.check_many(rows), len(rows)
+
+
+@scenario('annuity.scalar', 'scalar')
+def _annuity_scalar(scale: float):
+    rng = random.Random(SEED)
+    values = [(rng.uniform(1e6, 3e7), rng.randint(12, 360), rng.choice([0.0, 0.005, 0.0125]))
+              for _ in range(_size(200_000, scale))]
+
+    def run():
+        for loan_amount, months, monthly_rate in values:
+            calculate_annuity(loan_amount, months, monthly_rate)
+    return run, len(values)
+
+
+@scenario('annuity.batch', 'batch')
+def _annuity_batch(scale: float):
+    rng = np.random.default_rng(SEED)
+    count = _size(1_000_000, scale)
+    loan_amounts = rng.uniform(1e6, 3e7, count)
+    months = rng.integers(12, 361, count)
+    monthly_rates = rng.choice([0.0, 0.005, 0.0125], count)
+    return lambda: calculate_annuity_batch(loan_amounts, months, monthly_rates), count
+
+
+@scenario('mortgage.scalar', 'scalar')
+def _mortgage_scalar(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(_size(20_000, scale)))
+    return lambda: [compute_mortgage(item) for item in params], len(params)
+
+
+@scenario('mortgage.batch', 'batch')
+def _mortgage_batch(scale: float):
+    columns = _mortgage_columns(make_mortgage_rows(_size(200_000, scale)))
+    return lambda: compute_mortgage_batch(*columns), len(columns[0])
+
+
+@scenario('mortgage.schedule.iter', 'schedule')
+def _mortgage_schedule_iter(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(_size(200, scale)))
+    rows = sum(item['loan_term_years'] * 12 for item in params)
+    return lambda: [list(iter_mortgage_schedule(item)) for item in params], rows
+
+
+@scenario('mortgage.schedule.columns', 'schedule')
+def _mortgage_schedule_columns(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(_size(2_000, scale)))
+    rows = sum(item['loan_term_years'] * 12 for item in params)
+    return lambda: [mortgage_schedule_columns(item) for item in params], rows
+
+
+@scenario('mortgage.exact.scalar', 'scalar')
+def _mortgage_exact_scalar(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(_size(5_000, scale)))
+    return lambda: [compute_mortgage_exact(item) for item in params], len(params)
+
+
+@scenario('mortgage.exact.batch', 'batch')
+def _mortgage_exact_batch(scale: float):
+    loan_amounts, *columns = _mortgage_columns(make_mortgage_rows(_size(50_000, scale)))
+    loan_kopecks = np.rint(loan_amounts * 100).astype(np.int64)
+    return lambda: compute_mortgage_exact_batch(loan_kopecks, *columns), len(loan_kopecks)
+
+
+@scenario('mortgage.exact.schedule', 'schedule')
+def _mortgage_exact_schedule(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(_size(200, scale)))
+    rows = sum(item['loan_term_years'] * 12 for item in params)
+    return lambda: [list(iter_exact_schedule(item)) for item in params], rows
+
+
+@scenario('mortgage.solvers', 'scalar')
+def _mortgage_solvers(scale: float):
+    rows = make_mortgage_rows(_size(10_000, scale))
+
+    def run():
+        for row in rows:
+            loan_amount = max_loan_amount(100_000.0, row['loan_term_years'], row['annual_rate'])
+            required_rate(loan_amount, 120_000.0, row['loan_term_years'])
+    return run, len(rows) * 2
+
+
+@scenario('mortgage.prepayment', 'schedule')
+def _mortgage_prepayment(scale: float):
+    rng = random.Random(SEED)
+    params = to_mortgage_params(make_mortgage_rows(_size(2_000, scale)))
+    events = [
+        [{'month': month, 'amount': rng.uniform(1e4, 1e5), 'mode': rng.choice(['term', 'payment'])}
+         for month in range(6, item['loan_term_years'] * 12 // 3, 12)]
+        for item in params
+    ]
+    return lambda: [simulate_prepayments(item, item_events).summary()
+                    for item, item_events in zip(params, events)], len(params)
+
+
+@scenario('tranche.scalar', 'scalar')
+def _tranche_scalar(scale: float):
+    params = to_tranche_params(make_tranche_rows(_size(10_000, scale)))
+    return lambda: [calculate_tranche_mortgage(item) for item in params], len(params)
+
+
+@scenario('tranche.batch', 'batch')
+def _tranche_batch(scale: float):
+    params = make_tranche_rows(_size(50_000, scale))
+    return lambda: compute_tranche_batch(*build_tables(params), with_timeline=False), len(params)
+
+
+@scenario('tranche.batch.timeline', 'batch')
+def _tranche_batch_timeline(scale: float):
+    params = make_tranche_rows(_size(10_000, scale))
+    return lambda: compute_tranche_batch(*build_tables(params)), len(params)
+
+
+@scenario('tranche.schedule.iter', 'schedule')
+def _tranche_schedule_iter(scale: float):
+    params = to_tranche_params(make_tranche_rows(_size(100, scale)))
+    rows = sum(item['loan_term_years'] * 12 for item in params)
+    return lambda: [list(iter_tranche_schedule(item)) for item in params], rows
+
+
+@scenario('tranche.schedule.columns', 'schedule')
+def _tranche_schedule_columns(scale: float):
+    params = to_tranche_params(make_tranche_rows(_size(1_000, scale)))
+    rows = sum(item['loan_term_years'] * 12 for item in params)
+    return lambda: [tranche_schedule_columns(item) for item in params], rows
+
+
+SENSITIVITY_TERMS = (5, 10, 15, 20, 25, 30)
+
+
+@scenario('sensitivity.mortgage', 'batch')
+def _sensitivity_mortgage(scale: float):
+    columns = _mortgage_columns(make_mortgage_rows(_size(2_000, scale)))
+    shocks = rate_shocks()
+    cells = len(columns[0]) * len(shocks) * len(SENSITIVITY_TERMS)
+    return lambda: mortgage_sensitivity(*columns, shocks=shocks, terms=SENSITIVITY_TERMS), cells
+
+
+@scenario('sensitivity.mortgage.loop', 'batch')
+def _sensitivity_mortgage_loop(scale: float):
+    # Та же сетка перебором сдвигов и сроков через compute_mortgage_batch() - для сравнения
+    loan_amounts, _, annual_rates, grace_years, grace_rates = _mortgage_columns(make_mortgage_rows(_size(2_000, scale)))
+    shocks = rate_shocks()
+
+    def run():
+        for term in SENSITIVITY_TERMS:
+            feasible = grace_years < term
+            for shock in shocks:
+                compute_mortgage_batch(loan_amounts[feasible], term, np.maximum(annual_rates[feasible] + shock, 0),
+                                       grace_years[feasible], grace_rates[feasible])
+    return run, len(loan_amounts) * len(shocks) * len(SENSITIVITY_TERMS)
+
+
+@scenario('sensitivity.tranche', 'batch')
+def _sensitivity_tranche(scale: float):
+    params = make_tranche_rows(_size(1_000, scale))
+    shocks = rate_shocks()
+    cells = len(params) * len(shocks) * len(SENSITIVITY_TERMS)
+    return lambda: tranche_sensitivity(params, shocks=shocks, terms=SENSITIVITY_TERMS), cells
+
+
+@scenario('effective_rate.psk', 'batch')
+def _effective_rate_psk(scale: float):
+    portfolio = [mortgage_cash_flows(item) for item in to_mortgage_params(make_mortgage_rows(_size(2_000, scale)))]
+    return lambda: effective_rates(portfolio, 'psk'), len(portfolio)
+
+
+@scenario('effective_rate.xirr', 'batch')
+def _effective_rate_xirr(scale: float):
+    portfolio = [mortgage_cash_flows(item) for item in to_mortgage_params(make_mortgage_rows(_size(2_000, scale)))]
+    return lambda: effective_rates(portfolio, 'xirr'), len(portfolio)
+
+
+@scenario('effective_rate.scalar', 'scalar')
+def _effective_rate_scalar(scale: float):
+    portfolio = [mortgage_cash_flows(item) for item in to_mortgage_params(make_mortgage_rows(_size(200, scale)))]
+    return lambda: [full_credit_cost(flows) for flows in portfolio], len(portfolio)
+
+
+@scenario('comparison.deal', 'scalar')
+def _comparison_deal(scale: float):
+    count = _size(200, scale)
+    # ДДУ - не позже первого транша: транши раньше месяца ДДУ compare_products() не принимает
+    deals = [
+        dict(mortgage, down_payment_percent=tranche['initial_percent'],
+             start_date=min(parse_date(installment['ddu_date']),
+                            first_day(min(parse_month(item['date']) for item in tranche['tranches']))),
+             discount_rate=12.0, tranches=tranche['tranches'], tranche_markup=tranche['markup'],
+             commissioning_date=installment['commissioning_date'], key_handover_date=installment['key_handover_date'],
+             installment_markup=installment['markup'], program=installment['program'])
+        for mortgage, tranche, installment in zip(make_mortgage_rows(count), make_tranche_rows(count),
+                                                  make_installment_rows(count))
+    ]
+    return lambda: [compare_products(deal) for deal in deals], len(deals)
+
+
+# График для выгрузки: 10 траншей, 360 платежей
+EXPORT_TRANCHE_PARAMS = {
+    'cost': 20_000_000.0, 'markup': 5.0, 'initial_percent': 20.0, 'loan_term_years': 30, 'num_tranches': 10,
+    'tranches': [
+        {'date': f'2025-{month:02d}', 'percent': 7.0, 'rate': 6.0} for month in range(1, 10)
+    ] + [{'date': '2025-10', 'rate': 6.0}],
+}
+
+
+def _export_scenario(fmt: str, make_rows, columns, scale: float):
+    count = _size(100, scale)
+    rows = sum(1 for _ in make_rows())
+
+    def run():
+        for _ in range(count):
+            export_rows(make_rows(), fmt, columns, io.BytesIO())
+    return run, count * rows
+
+
+@scenario('export.csv.mortgage', 'export')
+def _export_csv_mortgage(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(1))[0] | {'loan_term_years': 30}
+    return _export_scenario('csv', lambda: iter_mortgage_schedule(params), SCHEDULE_COLUMNS, scale)
+
+
+@scenario('export.xlsx.mortgage', 'export')
+def _export_xlsx_mortgage(scale: float):
+    params = to_mortgage_params(make_mortgage_rows(1))[0] | {'loan_term_years': 30}
+    return _export_scenario('xlsx', lambda: iter_mortgage_schedule(params), SCHEDULE_COLUMNS, scale)
+
+
+@scenario('export.csv.tranche', 'export')
+def _export_csv_tranche(scale: float):
+    return _export_scenario('csv', lambda: iter_tranche_schedule(EXPORT_TRANCHE_PARAMS), SCHEDULE_COLUMNS, scale)
+
+
+@scenario('export.xlsx.tranche', 'export')
+def _export_xlsx_tranche(scale: float):
+    return _export_scenario('xlsx', lambda: iter_tranche_schedule(EXPORT_TRANCHE_PARAMS), SCHEDULE_COLUMNS, scale)
+
+
+@scenario('export.xlsx.installment', 'export')
+def _export_xlsx_installment(scale: float):
+    result = installment_calculator.calculate_installment(to_installment_params(make_installment_rows(1))[0])
+    return _export_scenario('xlsx', lambda: installment_rows(result), INSTALLMENT_COLUMNS, scale)
+
+
+@scenario('installment.standard', 'scalar')
+def _installment_standard(scale: float):
+    params = to_installment_params(make_installment_rows(_size(20_000, scale)))
+    return lambda: [installment_calculator.calculate_installment(item) for item in params], len(params)
+
+
+@scenario('installment.limits', 'scalar')
+def _installment_limits(scale: float):
+    params = to_installment_params(make_installment_rows(_size(20_000, scale)))
+    return lambda: [installment_calculator_limits.calculate_installment(item) for item in params], len(params)
+
+
+@scenario('installment.portfolio', 'batch')
+def _installment_portfolio(scale: float):
+    params = to_installment_params(make_installment_rows(_size(20_000, scale)))
+    return lambda: evaluate_portfolio(params, PROGRAMS), len(params)
+
+
+@scenario('batch_cli.mortgage', 'batch')
+def _batch_cli_mortgage(scale: float):
+    rows = make_mortgage_rows(_size(100_000, scale))
+    return lambda: [PRICERS['mortgage'](chunk) for chunk in iter_chunks(iter(rows), 10_000)], len(rows)
+
+
+@scenario('batch_cli.tranche', 'batch')
+def _batch_cli_tranche(scale: float):
+    rows = make_tranche_rows(_size(25_000, scale))
+    return lambda: [PRICERS['tranche'](chunk) for chunk in iter_chunks(iter(rows), 10_000)], len(rows)
+
+
+@scenario('batch_cli.installment', 'batch')
+def _batch_cli_installment(scale: float):
+    rows = make_installment_rows(_size(25_000, scale))
+    return lambda: [PRICERS['installment'](chunk) for chunk in iter_chunks(iter(rows), 10_000)], len(rows)
+
+
+# Разовые расчеты в отдельном процессе интерпретатора: время запуска, импорта модулей и одного расчета
+COLD_START_QUOTES = {
+    'mortgage': (
+        'from mortgage_calculator import compute_mortgage, validate_date\n'
+        "compute_mortgage({'object_cost': 1e7, 'down_payment_percent': 20, 'start_date': validate_date('31.01.2025'),"
+        " 'loan_term_years': 20, 'annual_rate': 16.0, 'grace_years': 2, 'grace_rate': 6.0})"
+    ),
+    'mortgage.cached': (
+        'from mortgage_calculator import validate_date\n'
+        'from quote_cache import cached_compute_mortgage\n'
+        "cached_compute_mortgage({'object_cost': 1e7, 'down_payment_percent': 20,"
+        " 'start_date': validate_date('31.01.2025'), 'loan_term_years': 20, 'annual_rate': 16.0})"
+    ),
+    'mortgage.schedule': (
+        'from mortgage_calculator import validate_date\n'
+        'from payment_schedule import iter_mortgage_schedule\n'
+        "list(iter_mortgage_schedule({'object_cost': 1e7, 'down_payment_percent': 20,"
+        " 'start_date': validate_date('31.01.2025'), 'loan_term_years': 20, 'annual_rate': 16.0}))"
+    ),
+    'mortgage.exact': (
+        'from mortgage_calculator import validate_date\n'
+        'from money import iter_exact_schedule\n'
+        "list(iter_exact_schedule({'object_cost': 1e7, 'down_payment_percent': 20,"
+        " 'start_date': validate_date('31.01.2025'), 'loan_term_years': 20, 'annual_rate': 16.0}))"
+    ),
+    'tranche': (
+        'from tranche_mortgage_calculator import calculate_mortgage\n'
+        "calculate_mortgage({'cost': 1e7, 'markup': 5.0, 'initial_percent': 20.0, 'loan_term_years': 20,"
+        " 'num_tranches': 2, 'tranches': [{'date': '2025-03', 'percent': 5.0, 'rate': 0.1},"
+        " {'date': '2026-03', 'rate': 12.0}]})"
+    ),
+    'installment': (
+        'from dates import parse_date\n'
+        'from installment_calculator_limits import calculate_installment\n'
+        "calculate_installment({'cost': 1e7, 'markup': 5.0, 'down_payment': 20.0,"
+        " 'ddu_date': parse_date('15.03.2025'), 'commissioning_date': parse_date('30.09.2027'),"
+        " 'key_handover_date': parse_date('31.03.2028')})"
+    ),
+}
+
+
+def _cold_start(code: str):
+    def setup(scale: float):
+        count = _size(10, scale)
+        command = [sys.executable, '-c', code]
+        directory = os.path.dirname(os.path.abspath(__file__))
+
+        def run():
+            for _ in range(count):
+                subprocess.run(command, cwd=directory, check=True)
+        return run, count
+    return setup
+
+
+for _name, _code in COLD_START_QUOTES.items():
+    scenario(f'cold_start.{_name}', 'startup')(_cold_start(_code))
+
+
+def measure(item: Scenario, scale: float = 1.0, repeat: int = 5) -> dict:
+    """
+    Выполняет сценарий: прогрев, repeat замеров времени и отдельный прогон под tracemalloc
+    (трассировка памяти замедляет расчет и не должна влиять на время).
+    """
+    run, ops = item.setup(scale)
+    run()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'name': item.name,
+        'group': item.group,
+        'ops': ops,
+        'best_s': best,
+        'median_s': statistics.median(times),
+        'ops_per_s': ops / best if best else None,
+        'peak_memory_kib': round(peak_memory / 1024, 1),
+    }
+
+
+def select_scenarios(patterns: list[str] | None) -> list[Scenario]:
+    """Сценарии, в названии которых встречается хотя бы одна из подстрок patterns (все, если не заданы)."""
+    return [item for name, item in SCENARIOS.items() if not patterns or any(pattern in name for pattern in patterns)]
+
+
+def environment() -> dict:
+    """Сведения об окружении для сравнения результатов между версиями."""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+    }
+
+
+def run_suite(args) -> None:
+    scenarios = select_scenarios(args.k)
+    if not scenarios:
+        raise SystemExit('Нет сценариев, подходящих под фильтр.')
+    results = []
+    print(f'{"сценарий":32s} {"операций":>9s} {"лучшее, с":>10s} {"медиана, с":>10s} '
+          f'{"оп/с":>12s} {"память, КиБ":>12s}')
+    for item in scenarios:
+        result = measure(item, args.scale, args.repeat)
+        results.append(result)
+        print(f'{result["name"]:32s} {result["ops"]:9d} {result["best_s"]:10.4f} {result["median_s"]:10.4f} '
+              f'{result["ops_per_s"] or 0:12.0f} {result["peak_memory_kib"]:12.1f}')
+
+    if args.json:
+        report = {'environment': environment(), 'scale': args.scale, 'repeat': args.repeat, 'results': results}
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def bench_parallel(product: str, rows: list[dict], chunk_size: int, workers: int) -> float:
+    """Время расчета всех строк через iter_priced_chunks() с заданным числом процессов, с."""
+    started = time.perf_counter()
+    for _ in iter_priced_chunks(PRICERS[product], iter_chunks(iter(rows), chunk_size), workers):
+        pass
+    return time.perf_counter() - started
+
+
+def run_parallel(args) -> None:
+    workers_list = [1]
+    while workers_list[-1] * 2 <= args.max_workers:
+        workers_list.append(workers_list[-1] * 2)
+    if workers_list[-1] != args.max_workers:
+        workers_list.append(args.max_workers)
+
+    print(f'Ядер процессора: {os.cpu_count()}')
+    for product, rows in (('mortgage', make_mortgage_rows(args.rows)),
+                          ('tranche', make_tranche_rows(args.rows // 4))):
+        print(f'\n{product}: {len(rows)} строк')
+        baseline = None
+        for workers in workers_list:
+            elapsed = bench_parallel(product, rows, args.chunk_size, workers)
+            baseline = baseline or elapsed
+            print(f'  процессов: {workers:2d}  время: {elapsed:6.2f} с  '
+                  f'строк/с: {len(rows) / elapsed:9.0f}  ускорение: {baseline / elapsed:4.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры производительности расчетов.')
+    parser.add_argument('-k', action='append', help='выполнить сценарии, содержащие подстроку (можно повторять)')
+    parser.add_argument('--list', action='store_true', help='вывести список сценариев')
+    parser.add_argument('--repeat', type=int, default=5, help='количество замеров на сценарий')
+    parser.add_argument('--scale', type=float, default=1.0, help='множитель объема данных сценариев')
+    parser.add_argument('--json', help='файл для результатов в формате JSON')
+    parser.add_argument('--parallel', action='store_true', help='замер ускорения пакетного расчета на процессах')
+    parser.add_argument('--rows', type=int, default=200_000, help='количество сделок для --parallel')
+    parser.add_argument('--chunk-size', type=int, default=5_000, help='количество строк в порции для --parallel')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help='максимум процессов для --parallel')
+    args = parser.parse_args()
+
+    if args.list:
+        for item in select_scenarios(args.k):
+            print(f'{item.name:32s} {item.group}')
+    elif args.parallel:
+        run_parallel(args)
+    else:
+        run_suite(args)
+
+
+if __name__ == '__main__':
+    main()
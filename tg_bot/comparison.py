@@ -0,0 +1,180 @@
+"""
+Сравнение продуктов для одной сделки: ипотека, ипотека с траншами и рассрочка от застройщика.
+Сделка описывается одним словарем с общими параметрами и параметрами продуктов:
+- object_cost, down_payment_percent, start_date (дата ДДУ и первоначального взноса),
+  discount_rate (ставка дисконтирования, % годовых) - общие;
+- loan_term_years, annual_rate, grace_years, grace_rate - ипотека;
+- tranches (месяц ГГГГ-ММ или первое число месяца 01.ММ.ГГГГ / date), tranche_markup, loan_term_years -
+  ипотека с траншами;
+- commissioning_date, key_handover_date, installment_markup, program - рассрочка.
+Продукт сравнивается, если указан хотя бы один из его параметров. Даты разбираются схемами
+один раз: даты сделки дальше передаются объектами date, месяцы траншей - строками ГГГГ-ММ,
+которые сравниваются как даты.
+Ошибки одной сделки выводятся без номера записи.
+
+Все платежи покупателя, включая первоначальный взнос, дисконтируются на дату ДДУ
+по ставке discount_rate (сроки - дни / 365); дешевле продукт с меньшей приведенной стоимостью.
+
+Запуск: python comparison.py deal.json [--discount-rate 12] - сделка в файле JSON ("-" - стандартный ввод)
+"""
+import argparse
+import json
+import math
+import sys
+from dataclasses import dataclass
+from datetime import date
+
+from dates import format_date, format_month, month_of
+from installment_rules import PROGRAMS, calculate_installment
+from payment_schedule import iter_mortgage_schedule, iter_tranche_schedule
+from schema import COMPARISON_SCHEMA, INSTALLMENT_SCHEMA, MORTGAGE_SCHEMA, TRANCHE_SCHEMA, SchemaError
+
+PRODUCTS = {
+    'mortgage': 'Ипотека',
+    'tranche': 'Ипотека с траншами',
+    'installment': 'Рассрочка',
+}
+# Параметры, по которым определяется, что продукт нужно сравнивать
+_PRODUCT_FIELDS = {
+    'mortgage': ('annual_rate', 'grace_years', 'grace_rate'),
+    'tranche': ('tranches', 'tranche_markup'),
+    'installment': ('commissioning_date', 'key_handover_date', 'installment_markup', 'program'),
+}
+DEFAULT_PROGRAM = 'limits'
+
+
+@dataclass(frozen=True, slots=True)
+class ProductQuote:
+    """Строка сравнения продуктов."""
+    rank: int  # Место по приведенной стоимости, 1 - самый дешевый
+    product: str  # Ключ продукта из PRODUCTS
+    title: str
+    total_paid: float  # Сумма всех платежей покупателя с первоначальным взносом, руб.
+    present_value: float  # Приведенная стоимость платежей на дату ДДУ, руб.
+    difference: float  # Разница с самым дешевым продуктом по приведенной стоимости, руб.
+    last_payment_date: date
+
+
+def _mortgage_payments(deal: dict, values: dict) -> list[tuple[date, float]]:
+    params = MORTGAGE_SCHEMA.check(dict(deal, start_date=values['start_date']))
+    down_payment = params['object_cost'] * params['down_payment_percent'] / 100
+    return [(params['start_date'], down_payment)] + [(row.date, row.payment) for row in iter_mortgage_schedule(params)]
+
+
+def _tranche_payments(deal: dict, values: dict) -> list[tuple[date, float]]:
+    params = TRANCHE_SCHEMA.check({
+        'cost': deal.get('object_cost'),
+        'markup': deal.get('tranche_markup', 0.0),
+        'initial_percent': deal.get('down_payment_percent'),
+        'loan_term_years': deal.get('loan_term_years'),
+        'tranches': deal.get('tranches'),
+    })
+    params['num_tranches'] = len(params['tranches'])
+    # Платежи раньше ДДУ дисконтировались бы в обратную сторону и искажали сравнение
+    ddu_month = format_month(month_of(values['start_date']))
+    early = [tranche['date'] for tranche in params['tranches'] if tranche['date'] < ddu_month]
+    if early:
+        raise SchemaError([(0, 'tranches', f'Транши не могут быть раньше месяца ДДУ: {", ".join(early)}.')],
+                          numbered=False)
+    # Первоначальный взнос вносится в дату ДДУ, как и у остальных продуктов
+    down_payment = params['cost'] * (1 + params['markup'] / 100) * params['initial_percent'] / 100
+    return [(values['start_date'], down_payment)] + [(row.date, row.payment) for row in iter_tranche_schedule(params)]
+
+
+def _installment_payments(deal: dict, values: dict) -> list[tuple[date, float]]:
+    params = INSTALLMENT_SCHEMA.check({
+        'cost': deal.get('object_cost'),
+        'markup': deal.get('installment_markup', 0.0),
+        'down_payment': deal.get('down_payment_percent'),
+        'ddu_date': values['start_date'],
+        'commissioning_date': deal.get('commissioning_date'),
+        'key_handover_date': deal.get('key_handover_date'),
+        'program': deal.get('program'),
+    })
+    program = params.get('program', DEFAULT_PROGRAM)
+    if program not in PROGRAMS:
+        raise ValueError(f'Неизвестная программа рассрочки "{program}". Доступны: {", ".join(PROGRAMS)}.')
+    result = calculate_installment(params, PROGRAMS[program])
+    return [(payment['date'], payment['amount']) for payment in result['payments']]
+
+
+_PRODUCT_PAYMENTS = {
+    'mortgage': _mortgage_payments,
+    'tranche': _tranche_payments,
+    'installment': _installment_payments,
+}
+
+
+def present_value(payments: list[tuple[date, float]], start_date: date, discount_rate: float) -> float:
+    """Приведенная к start_date стоимость платежей при годовой ставке discount_rate, %."""
+    start = start_date.toordinal()
+    log_base = math.log1p(discount_rate / 100) / 365
+    return sum(amount * math.exp(-log_base * (payment_date.toordinal() - start)) for payment_date, amount in payments)
+
+
+def compare_products(deal: dict) -> list[ProductQuote]:
+    """
+    Рассчитывает продукты, параметры которых указаны в deal, и возвращает их
+    в порядке возрастания приведенной стоимости платежей.
+    При ошибках в параметрах бросает SchemaError (ValueError) со всеми ошибками продукта.
+    """
+    values = COMPARISON_SCHEMA.check(deal)
+    priced = []
+    for product, title in PRODUCTS.items():
+        if all(deal.get(name) in (None, '') for name in _PRODUCT_FIELDS[product]):
+            continue
+        payments = _PRODUCT_PAYMENTS[product](deal, values)
+        priced.append((
+            present_value(payments, values['start_date'], values['discount_rate']),
+            product,
+            title,
+            sum(amount for _, amount in payments),
+            max(payment_date for payment_date, _ in payments),
+        ))
+    if not priced:
+        raise ValueError('Не указаны параметры ни одного продукта для сравнения.')
+
+    priced.sort(key=lambda item: item[0])
+    best = priced[0][0]
+    return [
+        ProductQuote(rank, product, title, total_paid, value, value - best, last_payment_date)
+        for rank, (value, product, title, total_paid, last_payment_date) in enumerate(priced, 1)
+    ]
+
+
+def format_comparison(quotes: list[ProductQuote]) -> str:
+    """Таблица сравнения в текстовом виде."""
+    lines = ['Сравнение на дату ДДУ (приведенная стоимость платежей):']
+    for quote in quotes:
+        difference = f' (+{quote.difference:.2f} руб.)' if quote.difference else ''
+        lines.append(f'{quote.rank}. {quote.title}: {quote.present_value:.2f} руб.{difference}')
+        lines.append(f'▪ Всего платежей: {quote.total_paid:.2f} руб., '
+                     f'последний - {format_date(quote.last_payment_date)}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение ипотеки, ипотеки с траншами и рассрочки для сделки.')
+    parser.add_argument('deal', help='файл JSON с параметрами сделки ("-" - стандартный ввод)')
+    parser.add_argument('--discount-rate', type=float,
+                        help='ставка дисконтирования, %% годовых (вместо указанной в файле)')
+    args = parser.parse_args()
+
+    try:
+        if args.deal == '-':
+            deal = json.load(sys.stdin)
+        else:
+            with open(args.deal, encoding='utf-8') as file:
+                deal = json.load(file)
+        if not isinstance(deal, dict):
+            raise ValueError('Сделка должна быть объектом JSON.')
+        if args.discount_rate is not None:
+            deal['discount_rate'] = args.discount_rate
+        print(format_comparison(compare_products(deal)))
+    except (OSError, ValueError) as err:
+        print(f'❌ {err}', file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Работа с датами без dateutil и strptime: разбор ДД.ММ.ГГГГ и ГГГГ-ММ, арифметика месяцев.
+Сдвиг на месяцы повторяет relativedelta(months=n): день переносится на последний день
+короткого месяца, тип значения (date или datetime) и время сохраняются.
+Порядковый номер месяца - год * 12 + номер месяца - 1.
+"""
+from datetime import date
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def days_in_month(year: int, month: int) -> int:
+    """Количество дней в месяце."""
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month - 1]
+
+
+def month_of(value: date) -> int:
+    """Порядковый номер месяца даты."""
+    return value.year * 12 + value.month - 1
+
+
+def first_day(index: int) -> date:
+    """Первое число месяца с порядковым номером index."""
+    year, month = divmod(int(index), 12)
+    return date(year, month + 1, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Сдвиг даты на months месяцев (months может быть отрицательным) с переносом на конец месяца."""
+    year, month = divmod(value.year * 12 + value.month - 1 + months, 12)
+    if not 1 <= year <= 9999:
+        raise ValueError(f'Год {year} вне допустимого диапазона.')
+    month += 1
+    return value.replace(year=year, month=month, day=min(value.day, days_in_month(year, month)))
+
+
+def _parse_number(part: str, min_digits: int, max_digits: int) -> int:
+    if not min_digits <= len(part) <= max_digits or not part.isascii() or not part.isdigit():
+        raise ValueError
+    return int(part)
+
+
+def parse_date(value: str) -> date:
+    """
+    Разбирает дату ДД.ММ.ГГГГ. Принимает то же, что datetime.strptime(value, '%d.%m.%Y'):
+    день и месяц из одной или двух цифр, год из четырех (цифры только ASCII).
+    """
+    try:
+        day, month, year = value.split('.')
+        return date(_parse_number(year, 4, 4), _parse_number(month, 1, 2), _parse_number(day, 1, 2))
+    except ValueError:
+        raise ValueError(f'Неверная дата "{value}". Используйте формат ДД.ММ.ГГГГ.') from None
+
+
+def parse_month(value: str) -> int:
+    """Переводит дату ГГГГ-ММ в порядковый номер месяца."""
+    if len(value) == 7 and value[4] == '-' and value.isascii():
+        # Быстрый путь для основного вида записи с ведущим нулем
+        year, month = value[:4], value[5:]
+        if year.isdigit() and month.isdigit() and '01' <= month <= '12' and year != '0000':
+            return int(year) * 12 + int(month) - 1
+    try:
+        year, month = value.split('-')
+        year, month = _parse_number(year, 4, 4), _parse_number(month, 1, 2)
+    except ValueError:
+        raise ValueError(f'Неверная дата "{value}". Используйте формат ГГГГ-ММ.') from None
+    if not 1 <= month <= 12 or year == 0:
+        raise ValueError(f'Неверный месяц в дате "{value}". Используйте формат ГГГГ-ММ.')
+    return year * 12 + month - 1
+
+
+def format_date(value: date) -> str:
+    """Дата в формате ДД.ММ.ГГГГ."""
+    return f'{value.day:02d}.{value.month:02d}.{value.year:04d}'
+
+
+def format_month(index: int) -> str:
+    """Переводит порядковый номер месяца обратно в строку ГГГГ-ММ."""
+    year, month = divmod(int(index), 12)
+    return f'{year:04d}-{month + 1:02d}'
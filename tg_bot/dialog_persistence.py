@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from ast import literal_eval
+from collections import OrderedDict
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """
+    Хранилище состояний диалогов в памяти процесса.
+    Записи упорядочены по времени последнего изменения (LRU), значения хранятся сериализованными pickle.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # (вид, ключ) -> (время изменения, значение)
+
+    def load(self, kind: str) -> dict:
+        """Возвращает все записи указанного вида."""
+        return {key: pickle.loads(value) for (entry_kind, key), (_, value) in self._entries.items()
+                if entry_kind == kind}
+
+    def write(self, batch: dict, updated_at: float) -> None:
+        """Записывает пакет изменений (значения сериализованы pickle). Значение None означает удаление записи."""
+        for entry, value in batch.items():
+            self._entries.pop(entry, None)
+            if value is not None:
+                self._entries[entry] = (updated_at, value)
+
+    def evict(self, expire_before: float, max_entries: int) -> list[tuple]:
+        """
+        Удаляет записи старше expire_before и самые старые сверх max_entries.
+        Возвращает удаленные записи как пары (вид, ключ).
+        """
+        evicted = []
+        while self._entries:
+            entry, (updated_at, _) = next(iter(self._entries.items()))
+            if updated_at >= expire_before and len(self._entries) <= max_entries:
+                break
+            del self._entries[entry]
+            evicted.append(entry)
+        return evicted
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteBackend:
+    """Хранилище состояний диалогов в файле SQLite, переживает перезапуск бота."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS dialogs ('
+                'kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated_at REAL NOT NULL, '
+                'PRIMARY KEY (kind, key))'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS dialogs_updated_at ON dialogs (updated_at)')
+
+    def load(self, kind: str) -> dict:
+        """Возвращает все записи указанного вида."""
+        with self._lock:
+            rows = self._connection.execute('SELECT key, value FROM dialogs WHERE kind = ?', (kind,)).fetchall()
+        return {literal_eval(key): pickle.loads(value) for key, value in rows}
+
+    def write(self, batch: dict, updated_at: float) -> None:
+        """
+        Записывает пакет изменений одной транзакцией (значения сериализованы pickle).
+        Значение None означает удаление записи.
+        """
+        upserts = [(kind, repr(key), value, updated_at)
+                   for (kind, key), value in batch.items() if value is not None]
+        deletes = [(kind, repr(key)) for (kind, key), value in batch.items() if value is None]
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO dialogs VALUES (?, ?, ?, ?)', upserts)
+            self._connection.executemany('DELETE FROM dialogs WHERE kind = ? AND key = ?', deletes)
+
+    def evict(self, expire_before: float, max_entries: int) -> list[tuple]:
+        """
+        Удаляет записи старше expire_before и самые старые сверх max_entries.
+        Возвращает удаленные записи как пары (вид, ключ).
+        """
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                'DELETE FROM dialogs WHERE updated_at < ? RETURNING kind, key', (expire_before,)).fetchall()
+            (count,) = self._connection.execute('SELECT COUNT(*) FROM dialogs').fetchone()
+            if count > max_entries:
+                rows += self._connection.execute(
+                    'DELETE FROM dialogs WHERE rowid IN (SELECT rowid FROM dialogs ORDER BY updated_at LIMIT ?) '
+                    'RETURNING kind, key',
+                    (count - max_entries,)
+                ).fetchall()
+        return [(kind, literal_eval(key)) for kind, key in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class DialogPersistence(BasePersistence):
+    """
+    Хранение user_data и состояний ConversationHandler во внешнем хранилище.
+    Изменения, накопленные приложением за один цикл update_interval, записываются одним пакетом.
+    Записи старше ttl секунд и самые старые сверх max_entries удаляются из хранилища
+    не чаще раза в evict_interval секунд, а после set_application() - и из памяти приложения.
+    """
+
+    def __init__(
+            self,
+            backend: MemoryBackend | SqliteBackend,
+            ttl: float = 24 * 60 * 60,
+            max_entries: int = 500_000,
+            evict_interval: float = 60,
+            update_interval: float = 5
+    ):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self._pending = {}
+        self._write_task = None
+        self._write_lock = asyncio.Lock()
+        self._last_evict = 0.0
+        self.application = None
+
+    def set_application(self, application) -> None:
+        """Приложение, из user_data и диалогов которого удаляются вытесненные из хранилища записи."""
+        self.application = application
+
+    async def _evict(self) -> None:
+        now = time.time()
+        if now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        evicted = await asyncio.to_thread(self.backend.evict, now - self.ttl, self.max_entries)
+        self._forget(evicted)
+
+    def _forget(self, entries: list[tuple]) -> None:
+        """
+        Удаляет вытесненные записи из user_data и состояний ConversationHandler приложения:
+        без JobQueue брошенные диалоги иначе остаются в памяти навсегда.
+        Записи, измененные после вытеснения (еще не записанные в хранилище), не трогаются.
+        """
+        if self.application is None or not entries:
+            return
+        # Словари состояний постоянных ConversationHandler по имени; публичного доступа к ним в PTB нет
+        conversations = self.application._conversation_handler_conversations
+        for kind, key in entries:
+            if (kind, key) in self._pending:
+                continue
+            if kind == 'user':
+                self.application.drop_user_data(key)
+            else:
+                states = conversations.get(kind.removeprefix('conversation:'))
+                if states is not None:
+                    states.pop(key, None)
+
+    async def _write_pending(self) -> None:
+        async with self._write_lock:
+            batch, self._pending = self._pending, {}
+            self._write_task = None
+            try:
+                if batch:
+                    await asyncio.to_thread(self.backend.write, batch, time.time())
+                await self._evict()
+            except Exception:
+                # Пакет возвращается в очередь и будет записан со следующими изменениями
+                logger.exception('Не удалось записать %d состояний диалогов', len(batch))
+                batch.update(self._pending)
+                self._pending = batch
+
+    def _schedule_write(self, kind: str, key, value) -> None:
+        """
+        Откладывает запись до окончания текущего цикла обновления хранилища.
+        Значение сериализуется сразу: в поток записи попадает снимок, а не изменяемый словарь диалога.
+        """
+        if value is not None:
+            try:
+                value = pickle.dumps(value)
+            except Exception:
+                logger.exception('Не удалось сохранить состояние диалога %r', key)
+                return
+        self._pending[(kind, key)] = value
+        if self._write_task is None:
+            self._write_task = asyncio.create_task(self._write_pending())
+
+    async def get_user_data(self) -> dict:
+        await self._evict()
+        return await asyncio.to_thread(self.backend.load, 'user')
+
+    async def get_conversations(self, name: str) -> dict:
+        return await asyncio.to_thread(self.backend.load, f'conversation:{name}')
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._schedule_write('user', user_id, data)
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object | None) -> None:
+        self._schedule_write(f'conversation:{name}', key, new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._schedule_write('user', user_id, None)
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        await self._write_pending()
+        self.backend.close()
+
+    # Данные чатов, бота и callback_data не сохраняются
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
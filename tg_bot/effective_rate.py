@@ -0,0 +1,219 @@
+"""
+Полная стоимость кредита (ПСК) и внутренняя норма доходности (XIRR) по денежным потокам заемщика.
+Потоки строятся по графикам калькуляторов: поступления (кредит, транши, стоимость объекта в рассрочку)
+положительные, платежи отрицательные.
+
+ПСК считается по формуле 353-ФЗ с базовым периодом в один месяц:
+    sum(ДП_k / ((1 + e_k * i) * (1 + i) ^ q_k)) = 0,  ПСК = i * 12 * 100,
+где q_k - число полных месяцев от первого потока, e_k - остаток в долях следующего месяца.
+XIRR - годовая ставка при сроках в днях / 365.
+
+Корень ищется методом Ньютона с защитой бисекцией сразу для всего портфеля: потоки сделок
+выравниваются в матрицы NumPy, сошедшиеся сделки исключаются из следующих итераций.
+"""
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from dates import first_day, parse_month
+from payment_schedule import iter_mortgage_schedule, iter_tranche_schedule
+from tranche_mortgage_calculator import calculate_mortgage as calculate_tranche_mortgage
+
+METHODS = ('psk', 'xirr')
+# Начальный отрезок поиска ставки за период; верхняя граница расширяется, пока не найдется смена знака
+_LOW_RATE = -0.5
+_HIGH_RATE = 1.0
+_BRACKET_EXPANSIONS = 20
+_UNIX_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class CashFlow(NamedTuple):
+    """Денежный поток заемщика."""
+    date: date
+    amount: float  # Больше нуля - получено, меньше нуля - уплачено, руб.
+
+
+def mortgage_cash_flows(params: dict) -> list[CashFlow]:
+    """
+    Потоки по ипотеке: на дату start_date заемщик получает стоимость объекта и платит первоначальный взнос
+    (в сумме - тело кредита), затем вносит платежи по графику iter_mortgage_schedule().
+    Параметры те же, что у compute_mortgage().
+    """
+    rows = list(iter_mortgage_schedule(params))
+    loan_amount = sum(row.principal for row in rows)
+    return [CashFlow(params['start_date'], loan_amount)] + [CashFlow(row.date, -row.payment) for row in rows]
+
+
+def tranche_cash_flows(params: dict) -> list[CashFlow]:
+    """
+    Потоки по ипотеке с траншами: выдача каждого транша первым числом месяца транша
+    и суммарные платежи по графику iter_tranche_schedule().
+    Параметры те же, что у calculate_mortgage() из tranche_mortgage_calculator.
+    """
+    results = calculate_tranche_mortgage(params)
+    flows = []
+    issued = 0.0
+    for tranche in results['tranches']:
+        flows.append(CashFlow(first_day(parse_month(tranche['date'])), tranche['total_loan'] - issued))
+        issued = tranche['total_loan']
+    flows.extend(CashFlow(row.date, -row.payment) for row in iter_tranche_schedule(params))
+    return flows
+
+
+def installment_cash_flows(params: dict, result: dict) -> list[CashFlow]:
+    """
+    Потоки по рассрочке: на дату ДДУ покупатель получает объект по цене без удорожания (cost)
+    и вносит первый платеж, затем - остальные платежи из result (результат calculate_installment()).
+    Стоимость рассрочки для покупателя - удорожание.
+    """
+    return [CashFlow(params['ddu_date'], params['cost'])] + [
+        CashFlow(payment['date'], -payment['amount']) for payment in result['payments']
+    ]
+
+
+def _flow_arrays(portfolio: list[list[CashFlow]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Выравнивает потоки сделок в матрицы дат и сумм формы (сделки, потоки), потоки упорядочены по дате.
+    Короткие сделки дополняются нулевыми потоками на дату первого потока.
+    """
+    lengths = np.fromiter(map(len, portfolio), dtype=np.int64, count=len(portfolio))
+    total = int(lengths.sum())
+    # Даты переводятся в дни от 01.01.1970 через порядковые номера, без разбора каждой даты NumPy
+    days = np.fromiter((flow.date.toordinal() for flows in portfolio for flow in flows), dtype=np.int64,
+                       count=total) - _UNIX_EPOCH
+    amounts = np.fromiter((flow.amount for flows in portfolio for flow in flows), dtype=np.float64, count=total)
+    rows = np.repeat(np.arange(len(portfolio)), lengths)
+    order = np.lexsort((days, rows))
+    starts = np.cumsum(lengths) - lengths
+    columns = np.arange(total) - np.repeat(starts, lengths)
+
+    first_days = np.zeros(len(portfolio), dtype=np.int64)
+    first_days[lengths > 0] = days[order][starts[lengths > 0]]
+    day_table = np.repeat(first_days[:, None], lengths.max(initial=0), axis=1)
+    day_table[rows, columns] = days[order]
+    amount_table = np.zeros(day_table.shape)
+    amount_table[rows, columns] = amounts[order]
+    return day_table.astype('datetime64[D]'), amount_table
+
+
+def _add_months(start: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Даты start + months месяцев с переносом на последний день короткого месяца (как add_months())."""
+    month_start = start.astype('datetime64[M]') + months
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    day = (start - start.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    return month_start.astype('datetime64[D]') + (np.minimum(day, days_in_month) - 1)
+
+
+def _psk_periods(dates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Полные месяцы q_k от первого потока и остаток e_k в долях следующего месяца."""
+    start = dates[:, :1]
+    months = (dates.astype('datetime64[M]') - start.astype('datetime64[M]')).astype(np.int64)
+    months -= _add_months(start, months) > dates
+    anchor = _add_months(start, months)
+    period_days = (_add_months(start, months + 1) - anchor).astype(np.float64)
+    return months.astype(np.float64), (dates - anchor).astype(np.float64) / period_days
+
+
+def _xirr_periods(dates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Сроки потоков в годах (дни / 365) от первого потока; долей периода нет."""
+    years = (dates - dates[:, :1]).astype(np.float64) / 365
+    return years, np.zeros_like(years)
+
+
+def _present_value(rates, periods, fractions, amounts) -> tuple[np.ndarray, np.ndarray]:
+    """Приведенная стоимость потоков по ставкам за период и ее производная по ставке."""
+    rates = rates[:, None]
+    partial = 1 + fractions * rates
+    discounted = amounts * np.exp(-periods * np.log1p(rates)) / partial
+    value = discounted.sum(axis=1)
+    derivative = -(discounted * (periods / (1 + rates) + fractions / partial)).sum(axis=1)
+    return value, derivative
+
+
+def _solve_rates(periods: np.ndarray, fractions: np.ndarray, amounts: np.ndarray, tolerance: float = 1e-12,
+                 max_iterations: int = 100) -> np.ndarray:
+    """
+    Ставки за период, при которых приведенная стоимость потоков каждой сделки равна нулю
+    (по модулю меньше tolerance - ровно 0); NaN, если на отрезке поиска нет смены знака или метод не сошелся.
+    Начальное приближение - шаг Ньютона от нулевой ставки для логарифма (1 + i): для обычного кредита
+    (сначала поступления, потом платежи) оно близко к корню и не превышает его.
+    """
+    count = len(amounts)
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        low = np.full(count, _LOW_RATE)
+        high = np.full(count, _HIGH_RATE)
+        value_low, _ = _present_value(low, periods, fractions, amounts)
+        value_high, _ = _present_value(high, periods, fractions, amounts)
+        for _ in range(_BRACKET_EXPANSIONS):
+            unbracketed = np.sign(value_low) * np.sign(value_high) > 0
+            if not unbracketed.any():
+                break
+            high[unbracketed] = high[unbracketed] * 4
+            value_high[unbracketed], _ = _present_value(
+                high[unbracketed], periods[unbracketed], fractions[unbracketed], amounts[unbracketed])
+
+        guess = np.expm1(amounts.sum(axis=1) / (amounts * (periods + fractions)).sum(axis=1))
+        inside = (guess > low) & (guess < high)
+        rates = np.where(inside, guess, (low + high) / 2)
+        result = np.full(count, np.nan)
+        # Ставка определена, только если есть и поступления, и платежи, и знак меняется на отрезке
+        two_sided = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+        active = np.flatnonzero(two_sided & (np.sign(value_low) * np.sign(value_high) <= 0))
+
+        for _ in range(max_iterations):
+            if not len(active):
+                break
+            rate = rates[active]
+            value, derivative = _present_value(rate, periods[active], fractions[active], amounts[active])
+            # Сужаем отрезок: корень между точками с разными знаками приведенной стоимости
+            at_low = np.sign(value) == np.sign(value_low[active])
+            low[active] = np.where(at_low, rate, low[active])
+            value_low[active] = np.where(at_low, value, value_low[active])
+            high[active] = np.where(at_low, high[active], rate)
+
+            candidate = rate - value / derivative
+            outside = ~((candidate >= low[active]) & (candidate <= high[active]))
+            candidate = np.where(outside, (low[active] + high[active]) / 2, candidate)
+            converged = (value == 0) | (np.abs(candidate - rate) <= tolerance * (1 + np.abs(rate)))
+            result[active[converged]] = np.where(value[converged] == 0, rate[converged], candidate[converged])
+            rates[active] = candidate
+            active = active[~converged]
+    # Остаток погрешности вокруг нулевой ставки (например, -6e-31 при нулевом удорожании) считается нулем
+    result[np.abs(result) < tolerance] = 0.0
+    return result
+
+
+def effective_rates(portfolio: list[list[CashFlow]], method: str = 'psk') -> np.ndarray:
+    """
+    Эффективные ставки по портфелю сделок, % годовых: ПСК (method='psk') или XIRR (method='xirr').
+    portfolio - список потоков сделок (например, из mortgage_cash_flows()).
+    Для сделок без смены знака потоков или без сходимости возвращается NaN.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Неизвестный метод "{method}". Доступны: {", ".join(METHODS)}.')
+    dates, amounts = _flow_arrays(portfolio)
+    periods, fractions = (_psk_periods if method == 'psk' else _xirr_periods)(dates)
+    rates = _solve_rates(periods, fractions, amounts)
+    if method == 'psk':
+        rates = np.round(rates * 12 * 100, 3)
+    else:
+        rates = rates * 100
+    return rates + 0.0  # + 0.0 убирает -0.0, оставшийся после округления ПСК
+
+
+def _effective_rate(flows: list[CashFlow], method: str) -> float:
+    rate = effective_rates([flows], method)[0]
+    if np.isnan(rate):
+        raise ValueError('Не удалось рассчитать ставку: нужны и поступления, и платежи.')
+    return float(rate)
+
+
+def full_credit_cost(flows: list[CashFlow]) -> float:
+    """ПСК, % годовых с точностью до третьего знака. При невозможности расчета бросает ValueError."""
+    return _effective_rate(flows, 'psk')
+
+
+def xirr(flows: list[CashFlow]) -> float:
+    """Годовая внутренняя норма доходности потоков, %. При невозможности расчета бросает ValueError."""
+    return _effective_rate(flows, 'xirr')
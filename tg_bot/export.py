@@ -0,0 +1,195 @@
+"""
+Выгрузка графиков платежей в файлы CSV и XLSX.
+Строки графика пишутся в файл по одной прямо из итератора (iter_mortgage_schedule(), iter_tranche_schedule(),
+installment_rows()), без промежуточных списков отформатированных строк.
+По умолчанию файл создается в памяти и переносится во временный файл на диске, если становится больше
+SPOOL_MAX_SIZE; готовый объект файла передается в send_document() бота без сохранения на диск
+(имя файла в этом случае задается параметром filename).
+XLSX собирается без сторонних библиотек: служебные части книги постоянные, лист пишется потоком в архив.
+"""
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import date
+from typing import IO, Iterable, Iterator, NamedTuple
+from xml.sax.saxutils import escape
+
+from dates import format_date
+
+SPOOL_MAX_SIZE = 1024 * 1024
+FORMATS = ('csv', 'xlsx')
+# Даты в XLSX хранятся числом дней от 30.12.1899
+_EXCEL_EPOCH = date(1899, 12, 30).toordinal()
+
+
+class Column(NamedTuple):
+    """Колонка выгрузки."""
+    title: str  # Заголовок
+    kind: str  # Тип значения: int, date или money
+    width: float = 16  # Ширина колонки в XLSX, символов
+
+
+SCHEDULE_COLUMNS = (
+    Column('№', 'int', 6),
+    Column('Дата', 'date', 12),
+    Column('Платеж, руб.', 'money'),
+    Column('Проценты, руб.', 'money'),
+    Column('Основной долг, руб.', 'money'),
+    Column('Остаток долга, руб.', 'money'),
+)
+INSTALLMENT_COLUMNS = (
+    Column('№', 'int', 6),
+    Column('Дата', 'date', 12),
+    Column('Сумма, руб.', 'money'),
+)
+
+_CSV_FORMATTERS = {
+    'int': str,
+    'date': format_date,
+    'money': lambda value: f'{value:.2f}',
+}
+_XLSX_CONVERTERS = {
+    'int': int,
+    'date': lambda value: value.toordinal() - _EXCEL_EPOCH,
+    'money': lambda value: repr(round(float(value), 2)),
+}
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_DOC_RELS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+# Служебные части книги; {title} - название листа
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        _XML_DECLARATION
+        + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        _XML_DECLARATION
+        + f'<Relationships xmlns="{_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        _XML_DECLARATION
+        + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_DOC_RELS}">'
+        '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        _XML_DECLARATION
+        + f'<Relationships xmlns="{_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_DOC_RELS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_DOC_RELS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Стили ячеек: 0 - обычный, 1 - дата ДД.ММ.ГГГГ, 2 - сумма #,##0.00 (встроенный формат 4)
+    'xl/styles.xml': (
+        _XML_DECLARATION
+        + f'<styleSheet xmlns="{_MAIN_NS}">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="DD.MM.YYYY"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_XLSX_SHEET_HEADER = _XML_DECLARATION + f'<worksheet xmlns="{_MAIN_NS}">'
+
+
+def installment_rows(result: dict) -> Iterator[tuple]:
+    """Строки графика рассрочки (номер, дата, сумма) из результата calculate_installment()."""
+    for number, payment in enumerate(result['payments'], 1):
+        yield number, payment['date'], payment['amount']
+
+
+def write_csv(rows: Iterable[tuple], file: IO[bytes], columns: tuple = SCHEDULE_COLUMNS) -> None:
+    """
+    Пишет строки в двоичный файл file в формате CSV (UTF-8 с BOM, чтобы Excel распознал кириллицу).
+    Суммы - с двумя знаками после точки, даты - ДД.ММ.ГГГГ.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        writer = csv.writer(text)
+        writer.writerow([column.title for column in columns])
+        formatters = [_CSV_FORMATTERS[column.kind] for column in columns]
+        writer.writerows([formatter(value) for formatter, value in zip(formatters, row)] for row in rows)
+        text.flush()
+    finally:
+        # Отсоединяем обертку, чтобы она не закрыла файл вызывающего кода
+        text.detach()
+
+
+def _xlsx_cell(kind: str, ref: str, position: int) -> str:
+    """Шаблон ячейки листа XLSX: номер строки подставляется как {0}, значение - как {position}."""
+    style = {'date': ' s="1"', 'money': ' s="2"'}.get(kind, '')
+    return f'<c r="{ref}{{0}}"{style}><v>{{{position}}}</v></c>'
+
+
+def write_xlsx(rows: Iterable[tuple], file: IO[bytes], columns: tuple = SCHEDULE_COLUMNS,
+               title: str = 'График платежей') -> None:
+    """
+    Пишет строки в файл file в формате XLSX (одна книга с одним листом).
+    Лист пишется потоком прямо в архив, без сторонних библиотек; даты и суммы остаются числовыми
+    ячейками с форматами ДД.ММ.ГГГГ и #,##0.00.
+    """
+    letters = [chr(ord('A') + idx) for idx in range(len(columns))]
+    cells = [_xlsx_cell(column.kind, letter, idx) for idx, (column, letter) in enumerate(zip(columns, letters), 1)]
+    row_template = '<row r="{0}">' + ''.join(cells) + '</row>'
+    converters = [_XLSX_CONVERTERS[column.kind] for column in columns]
+
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content.format(title=escape(title, {'"': '&quot;'})))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((
+                _XLSX_SHEET_HEADER
+                + '<cols>' + ''.join(
+                    f'<col min="{idx}" max="{idx}" width="{column.width}" customWidth="1"/>'
+                    for idx, column in enumerate(columns, 1)) + '</cols>'
+                + '<sheetData><row r="1">' + ''.join(
+                    f'<c r="{letter}1" t="inlineStr"><is><t>{escape(column.title)}</t></is></c>'
+                    for column, letter in zip(columns, letters)) + '</row>'
+            ).encode())
+            for number, row in enumerate(rows, 2):
+                sheet.write(row_template.format(
+                    number, *[convert(value) for convert, value in zip(converters, row)]).encode())
+            sheet.write(b'</sheetData></worksheet>')
+
+
+_WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+}
+
+
+def export_rows(rows: Iterable[tuple], fmt: str, columns: tuple = SCHEDULE_COLUMNS,
+                file: IO[bytes] | None = None) -> IO[bytes]:
+    """
+    Выгружает строки в формате fmt ('csv' или 'xlsx') в двоичный файл file.
+    Без file создается tempfile.SpooledTemporaryFile: данные хранятся в памяти, пока не превысят SPOOL_MAX_SIZE.
+    Возвращает файл с позицией, установленной на начало выгрузки.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f'Неизвестный формат выгрузки "{fmt}". Доступны: {", ".join(FORMATS)}.')
+    if file is None:
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    start = file.tell()
+    _WRITERS[fmt](rows, file, columns)
+    file.seek(start)
+    return file
@@ -0,0 +1,231 @@
+"""
+Локальная заглушка Bot API для нагрузочной проверки бота без сети.
+Запуск: python fake_bot_api.py --chats 500 [--persistence sqlite] [--metrics]
+Inline-режим: python fake_bot_api.py --inline --chats 200 [--typing-interval 0.05]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+import metrics
+from dialog_persistence import DialogPersistence, MemoryBackend, SqliteBackend
+from tg_bot import InstrumentedRequest, build_application
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Calculator', 'username': 'calculator_bot'}
+
+# Ответы пользователя на каждом шаге диалога
+CONVERSATION = ['/start', '12000000', '20', '15.01.2025', '30', '6', 'да', '2', '3']
+# Inline-запрос, который пользователь набирает по одному символу
+INLINE_QUERY = '12000000 20% 30y 6%'
+
+
+class FakeBotRequest(BaseRequest):
+    """Заглушка транспорта Bot API: отвечает на запросы бота и складывает сообщения в очереди по чатам."""
+
+    def __init__(self):
+        self.messages = defaultdict(asyncio.Queue)
+        self.documents = defaultdict(int)  # Количество отправленных файлов по чатам
+        self.inline_answers = defaultdict(asyncio.Queue)  # Идентификаторы отвеченных inline-запросов по пользователям
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None) -> tuple[int, bytes]:
+        endpoint = url.rsplit('/', 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+
+        if endpoint == 'getMe':
+            result = BOT_USER
+        elif endpoint == 'sendMessage':
+            chat_id = int(parameters['chat_id'])
+            result = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': parameters['text'],
+            }
+            self.messages[chat_id].put_nowait(parameters['text'])
+        elif endpoint == 'sendDocument':
+            chat_id = int(parameters['chat_id'])
+            result = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'document': {'file_id': f'document{chat_id}', 'file_unique_id': f'document{chat_id}'},
+            }
+            self.documents[chat_id] += 1
+        elif endpoint == 'answerInlineQuery':
+            query_id = parameters['inline_query_id']
+            self.inline_answers[int(query_id.split(':')[0])].put_nowait(query_id)
+            result = True
+        else:
+            result = True
+
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def make_update(update_id: int, chat_id: int, text: str, bot) -> Update:
+    """Создает входящее обновление с текстовым сообщением пользователя."""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return Update.de_json({'update_id': update_id, 'message': message}, bot)
+
+
+def make_inline_update(update_id: int, user_id: int, query_id: str, text: str, bot) -> Update:
+    """Создает входящее обновление с inline-запросом пользователя."""
+    inline_query = {
+        'id': query_id,
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+        'query': text,
+        'offset': '',
+    }
+    return Update.de_json({'update_id': update_id, 'inline_query': inline_query}, bot)
+
+
+async def run_conversation(application: Application, request: FakeBotRequest, chat_id: int,
+                           update_ids: itertools.count, messages: list[str]) -> str:
+    """Отправляет сообщения от имени одного пользователя и возвращает последний ответ бота."""
+    reply = ''
+    for text in messages:
+        await application.update_queue.put(make_update(next(update_ids), chat_id, text, application.bot))
+        reply = await request.messages[chat_id].get()
+    return reply
+
+
+async def run_load(chats: int, make_backend=None) -> None:
+    """
+    Запускает chats параллельных диалогов и выводит пропускную способность.
+    Если задана фабрика хранилища make_backend, бот перезапускается в середине диалогов.
+    """
+    request = FakeBotRequest()
+    update_ids = itertools.count(1)
+    middle = len(CONVERSATION) // 2
+    parts = [CONVERSATION] if make_backend is None else [CONVERSATION[:middle], CONVERSATION[middle:]]
+
+    started = time.perf_counter()
+    for part in parts:
+        persistence = None if make_backend is None else DialogPersistence(make_backend())
+        bot_request = InstrumentedRequest(request) if metrics.is_enabled() else request
+        application = build_application(
+            Application.builder().token('123456:TEST').request(bot_request).get_updates_request(request).updater(None),
+            persistence
+        )
+        async with application:
+            await application.start()
+            replies = await asyncio.gather(*(
+                run_conversation(application, request, chat_id, update_ids, part) for chat_id in range(1, chats + 1)
+            ))
+            await application.stop()
+    elapsed = time.perf_counter() - started
+
+    completed = sum(reply.startswith('📊') for reply in replies)
+    documents = sum(1 for chat_id in range(1, chats + 1) if request.documents[chat_id])
+    print(f'Диалогов завершено: {completed} из {chats}, графиков платежей отправлено: {documents}')
+    print(f'Время: {elapsed:.2f} с, сообщений в секунду: {chats * len(CONVERSATION) / elapsed:.0f}')
+    if metrics.is_enabled():
+        print(metrics.format_snapshot())
+    if completed != chats or documents != chats:
+        raise SystemExit(1)
+
+
+async def type_inline_query(application: Application, request: FakeBotRequest, user_id: int,
+                            update_ids: itertools.count, interval: float) -> tuple[int, float]:
+    """
+    Набирает INLINE_QUERY по одному символу с паузой interval и ждет ответа на последний запрос.
+    Возвращает количество полученных ответов и задержку ответа после последнего символа.
+    """
+    query_id = ''
+    for length in range(1, len(INLINE_QUERY) + 1):
+        query_id = f'{user_id}:{length}'
+        await application.update_queue.put(
+            make_inline_update(next(update_ids), user_id, query_id, INLINE_QUERY[:length], application.bot))
+        if length < len(INLINE_QUERY):
+            await asyncio.sleep(interval)
+    typed = time.perf_counter()
+    answers = 1
+    while await request.inline_answers[user_id].get() != query_id:
+        answers += 1
+    return answers, time.perf_counter() - typed
+
+
+async def run_inline_load(users: int, interval: float) -> None:
+    """Запускает users пользователей, одновременно набирающих inline-запрос, и выводит число ответов и задержку."""
+    request = FakeBotRequest()
+    update_ids = itertools.count(1)
+    bot_request = InstrumentedRequest(request) if metrics.is_enabled() else request
+    application = build_application(
+        Application.builder().token('123456:TEST').request(bot_request).get_updates_request(request).updater(None)
+    )
+    async with application:
+        await application.start()
+        outcomes = await asyncio.gather(*(
+            type_inline_query(application, request, user_id, update_ids, interval) for user_id in range(1, users + 1)
+        ))
+        await application.stop()
+
+    answers = sum(count for count, _ in outcomes)
+    latencies = sorted(latency for _, latency in outcomes)
+    print(f'Inline-запросов: {users * len(INLINE_QUERY)}, ответов: {answers}')
+    print(f'Задержка ответа после последнего символа: p50={latencies[len(latencies) // 2] * 1000:.0f} мс, '
+          f'p95={latencies[int(len(latencies) * 0.95)] * 1000:.0f} мс, max={latencies[-1] * 1000:.0f} мс')
+    if metrics.is_enabled():
+        print(metrics.format_snapshot())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочная проверка бота на локальной заглушке Bot API.')
+    parser.add_argument('--chats', type=int, default=200, help='количество параллельных диалогов')
+    parser.add_argument('--persistence', choices=['memory', 'sqlite'],
+                        help='хранить состояние диалогов и перезапустить бот в середине диалогов')
+    parser.add_argument('--metrics', action='store_true', help='собрать метрики и вывести сводку')
+    parser.add_argument('--inline', action='store_true',
+                        help='вместо диалогов набирать inline-запросы (--chats - количество пользователей)')
+    parser.add_argument('--typing-interval', type=float, default=0.05,
+                        help='пауза между символами inline-запроса, с')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    if args.inline:
+        asyncio.run(run_inline_load(args.chats, args.typing_interval))
+    elif args.persistence is None:
+        asyncio.run(run_load(args.chats))
+    elif args.persistence == 'memory':
+        backend = MemoryBackend()
+        asyncio.run(run_load(args.chats, lambda: backend))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dialogs.sqlite3')
+            asyncio.run(run_load(args.chats, lambda: SqliteBackend(path)))
+
+
+if __name__ == '__main__':
+    main()
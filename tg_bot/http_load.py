@@ -0,0 +1,98 @@
+"""
+Нагрузочная проверка HTTP-сервиса расчетов на локальной машине.
+Сервис запускается в том же процессе; клиенты держат соединения открытыми (keep-alive)
+и отправляют одиночные запросы один за другим.
+Запуск: python http_load.py [--product mortgage] [--connections 200] [--requests 20] [--batch-window 0.002]
+    [--processes]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import metrics
+from benchmarks import make_installment_rows, make_mortgage_rows, make_tranche_rows
+from http_service import QuoteService
+
+MAKE_ROWS = {
+    'mortgage': make_mortgage_rows,
+    'tranche': make_tranche_rows,
+    'installment': make_installment_rows,
+}
+
+
+async def run_client(host: str, port: int, path: str, bodies: list[bytes], latencies: list[float]) -> int:
+    """Отправляет запросы по одному соединению и возвращает количество ответов с ошибкой."""
+    reader, writer = await asyncio.open_connection(host, port)
+    failures = 0
+    try:
+        for body in bodies:
+            started = time.perf_counter()
+            writer.write(
+                f'POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+            )
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            failures += status != 200
+    finally:
+        writer.close()
+    return failures
+
+
+async def run_load(product: str, connections: int, requests: int, batch_window: float, workers: int,
+                   port: int, processes: bool = False) -> None:
+    metrics.enable()
+    rows = MAKE_ROWS[product](connections * requests)
+    bodies = [json.dumps(row, ensure_ascii=False).encode() for row in rows]
+    service = QuoteService(workers, processes, batch_window=batch_window)
+    await service.start('127.0.0.1', port)
+    latencies = []
+    try:
+        started = time.perf_counter()
+        failures = await asyncio.gather(*(
+            run_client('127.0.0.1', port, f'/{product}', bodies[idx::connections], latencies)
+            for idx in range(connections)
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        await service.close()
+
+    counters = metrics.registry.snapshot()['counters']
+    labels = (('product', product),)
+    batches = counters.get(('http_batches_total', labels), 0)
+    items = counters.get(('http_batched_items_total', labels), 0)
+    latencies.sort()
+    print(f'Запросов: {len(latencies)}, ошибок: {sum(failures)}, время: {elapsed:.2f} с, '
+          f'запросов в секунду: {len(latencies) / elapsed:.0f}')
+    print(f'Задержка: p50={latencies[len(latencies) // 2] * 1000:.1f} мс, '
+          f'p95={latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс, '
+          f'p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс')
+    print(f'Порций расчета: {batches}, средний размер порции: {items / batches if batches else 0:.1f}')
+    if sum(failures):
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочная проверка HTTP-сервиса расчетов.')
+    parser.add_argument('--product', choices=sorted(MAKE_ROWS), default='mortgage', help='вид расчета')
+    parser.add_argument('--connections', type=int, default=200, help='количество одновременных соединений')
+    parser.add_argument('--requests', type=int, default=20, help='количество запросов на соединение')
+    parser.add_argument('--batch-window', type=float, default=0.002,
+                        help='ожидание запросов в порцию, с (0 - без ожидания)')
+    parser.add_argument('--workers', type=int, default=4, help='количество потоков или процессов для расчетов')
+    parser.add_argument('--processes', action='store_true', help='считать в процессах вместо потоков')
+    parser.add_argument('--port', type=int, default=8765, help='порт сервиса')
+    args = parser.parse_args()
+    asyncio.run(run_load(args.product, args.connections, args.requests, args.batch_window, args.workers, args.port,
+                         args.processes))
+
+
+if __name__ == '__main__':
+    main()
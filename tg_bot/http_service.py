@@ -0,0 +1,354 @@
+"""
+Локальный HTTP/JSON сервис расчетов для CRM и сайта на asyncio без сторонних библиотек.
+Запуск: python http_service.py [--host 127.0.0.1] [--port 8080] [--workers 4] [--processes]
+
+Точки:
+- POST /mortgage, /tranche, /installment - расчет одной сделки; тело - объект JSON с полями,
+  как у строк batch_cli.py, ответ - объект с результатом или {"error": "..."} со статусом 422
+- POST /batch - {"product": "mortgage", "items": [...]}; ответ {"results": [...]}, ошибки - по элементам
+- GET /health, GET /metrics (текстовый формат Prometheus, если метрики включены)
+
+Соединения HTTP/1.1 поддерживаются между запросами (keep-alive). Одиночные запросы, пришедшие
+почти одновременно, собираются в порцию (micro-batching) и считаются одним векторным вызовом
+расчетчика из batch_cli.PRICERS. Порции считаются в пуле из workers потоков или процессов,
+одновременно в работе не больше workers порций.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from batch_cli import PRICERS
+from schema import SchemaError
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_TIMEOUT = 60.0  # с, простой соединения между запросами
+MAX_BODY_SIZE = 16 * 1024 * 1024
+MAX_HEADERS = 100
+BATCH_WINDOW = 0.002  # с, сколько ждать одиночные запросы в порцию
+MAX_BATCH_SIZE = 512
+MAX_BATCH_ITEMS = 100_000  # Элементов в одном запросе /batch
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+    413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    """Ошибка запроса, которая возвращается клиенту со статусом status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def price_items(pricer, items: list) -> list[dict]:
+    """
+    Рассчитывает элементы одной порцией и возвращает результат или {'error': сообщение} для каждого.
+    Записи с ошибками проверки исключаются из порции, остальные пересчитываются;
+    при прочих ошибках элементы считаются по одному, чтобы ошибка одного не влияла на другие.
+    Результат с NaN или бесконечностью заменяется ошибкой: в JSON такие числа не записываются.
+    """
+    results = [None] * len(items)
+    pending = []
+    for idx, item in enumerate(items):
+        if isinstance(item, dict):
+            pending.append(idx)
+        else:
+            results[idx] = {'error': 'Сделка должна быть объектом JSON.'}
+
+    while pending:
+        try:
+            priced = pricer([items[idx] for idx in pending])
+        except SchemaError as err:
+            messages = {}
+            for index, _, message in err.errors:
+                messages.setdefault(index, []).append(message)
+            for index, item_messages in messages.items():
+                results[pending[index]] = {'error': ' '.join(item_messages)}
+            pending = [idx for position, idx in enumerate(pending) if position not in messages]
+            continue
+        except (KeyError, TypeError, ValueError) as err:
+            if len(pending) == 1:
+                results[pending[0]] = {'error': f'Ошибка расчета: {err!r}'}
+            else:
+                for idx in pending:
+                    results[idx] = price_items(pricer, [items[idx]])[0]
+            break
+        for idx, result in zip(pending, priced):
+            non_finite = [name for name, value in result.items()
+                          if isinstance(value, float) and not math.isfinite(value)]
+            if non_finite:
+                result = {'error': f'Расчет дал нечисловой результат: {", ".join(non_finite)}.'}
+            results[idx] = result
+        break
+    return results
+
+
+class MicroBatcher:
+    """
+    Собирает одиночные запросы одного вида расчета в порции: порция отправляется в расчет через
+    window секунд после первого запроса или сразу при накоплении max_size запросов.
+    """
+
+    def __init__(self, product: str, executor: Executor, limit: asyncio.Semaphore,
+                 window: float = BATCH_WINDOW, max_size: int = MAX_BATCH_SIZE):
+        self.product = product
+        self._pricer = PRICERS[product]
+        self._executor = executor
+        self._limit = limit
+        self._window = window
+        self._max_size = max_size
+        self._pending = []  # (сделка, future результата)
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list) -> None:
+        metrics.inc('http_batched_items_total', len(batch), product=self.product)
+        metrics.inc('http_batches_total', product=self.product)
+        try:
+            async with self._limit:
+                results = await run_pricer(self._executor, self._pricer, [item for item, _ in batch])
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def run_pricer(executor: Executor, pricer, items: list) -> list[dict]:
+    with metrics.timer('http_pricing_seconds', pricer=pricer.__name__):
+        return await asyncio.get_running_loop().run_in_executor(executor, price_items, pricer, items)
+
+
+class QuoteService:
+    """HTTP-сервис расчетов. Пул расчетов создается при запуске start() и закрывается в close()."""
+
+    def __init__(self, workers: int = 4, processes: bool = False, batch_window: float = BATCH_WINDOW,
+                 max_batch_size: int = MAX_BATCH_SIZE):
+        self.workers = workers
+        self.processes = processes
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._executor = None
+        self._limit = None
+        self._batchers = {}
+        self._server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.Server:
+        if self.processes:
+            # Процессы запускаются через forkserver и до открытия сокета сервиса, иначе fork
+            # при первом расчете передал бы им слушающий сокет и соединения клиентов
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('forkserver'))
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, price_items, PRICERS[product], [])
+                for product in PRICERS for _ in range(self.workers)
+            ))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._limit = asyncio.Semaphore(self.workers)
+        self._batchers = {
+            product: MicroBatcher(product, self._executor, self._limit, self.batch_window, self.max_batch_size)
+            for product in PRICERS
+        }
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обрабатывает запросы одного соединения, пока клиент не закроет его или не истечет простой."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return
+                if not request_line:
+                    return
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request_line: bytes, reader: asyncio.StreamReader,
+                              writer: asyncio.StreamWriter) -> bool:
+        """Читает и обрабатывает один запрос. Возвращает, можно ли оставить соединение открытым."""
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            self._write_response(writer, 400, {'error': 'Некорректная строка запроса.'}, False)
+            return False
+        method, path, version = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                self._write_response(writer, 400, {'error': 'Слишком много заголовков.'}, False)
+                return False
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        body = b''
+        if method == 'POST':
+            if 'transfer-encoding' in headers or 'content-length' not in headers:
+                self._write_response(writer, 411, {'error': 'Нужен заголовок Content-Length.'}, False)
+                return False
+            if not headers['content-length'].isdigit():
+                self._write_response(writer, 400, {'error': 'Некорректный заголовок Content-Length.'}, False)
+                return False
+            length = int(headers['content-length'])
+            if length > MAX_BODY_SIZE:
+                self._write_response(writer, 413, {'error': 'Слишком большой запрос.'}, False)
+                return False
+            if headers.get('expect', '').lower() == '100-continue':
+                writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            body = await reader.readexactly(length)
+
+        endpoint = path.split('?', 1)[0]
+        with metrics.timer('http_request_seconds', endpoint=endpoint if endpoint in _ENDPOINTS else 'other'):
+            try:
+                status, payload = 200, await self.dispatch(method, endpoint, body)
+            except HTTPError as err:
+                status, payload = err.status, {'error': str(err)}
+            except Exception:
+                logger.exception('Ошибка обработки запроса %s %s', method, endpoint)
+                status, payload = 500, {'error': 'Внутренняя ошибка сервиса.'}
+            if status == 200 and isinstance(payload, dict) and 'error' in payload:
+                status = 422
+        metrics.inc('http_requests_total', endpoint=endpoint if endpoint in _ENDPOINTS else 'other', status=status)
+        self._write_response(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def dispatch(self, method: str, endpoint: str, body: bytes):
+        """Выполняет запрос к точке endpoint и возвращает тело ответа (объект JSON или текст)."""
+        if endpoint not in _ENDPOINTS:
+            raise HTTPError(404, f'Неизвестная точка {endpoint}.')
+        if method != _ENDPOINTS[endpoint]:
+            raise HTTPError(405, f'Точка {endpoint} принимает только {_ENDPOINTS[endpoint]}.')
+        if endpoint == '/health':
+            return {'status': 'ok'}
+        if endpoint == '/metrics':
+            return metrics.registry.render_prometheus()
+
+        try:
+            data = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as err:
+            raise HTTPError(400, f'Некорректный JSON: {err}') from None
+        if endpoint != '/batch':
+            if not isinstance(data, dict):
+                raise HTTPError(400, 'Тело запроса должно быть объектом JSON.')
+            return await self._batchers[endpoint[1:]].submit(data)
+
+        if not isinstance(data, dict) or data.get('product') not in PRICERS or not isinstance(data.get('items'), list):
+            raise HTTPError(400, f'Ожидается {{"product": один из {", ".join(sorted(PRICERS))}, "items": [...]}}.')
+        if len(data['items']) > MAX_BATCH_ITEMS:
+            raise HTTPError(413, f'Не больше {MAX_BATCH_ITEMS} сделок в запросе.')
+        async with self._limit:
+            results = await run_pricer(self._executor, PRICERS[data['product']], data['items'])
+        return {'results': results}
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            content_type = 'application/json; charset=utf-8'
+            try:
+                body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode()
+            except ValueError:
+                # NaN и бесконечность price_items() заменяет ошибками; ответ со статусом 200 и NaN не отправляется
+                logger.error('Ответ со статусом %s содержит нечисловые значения', status)
+                status, body = 500, json.dumps({'error': 'Внутренняя ошибка сервиса.'}, ensure_ascii=False).encode()
+        writer.write(
+            f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode()
+            + body
+        )
+
+
+_ENDPOINTS = {
+    '/mortgage': 'POST',
+    '/tranche': 'POST',
+    '/installment': 'POST',
+    '/batch': 'POST',
+    '/health': 'GET',
+    '/metrics': 'GET',
+}
+
+
+async def serve(host: str, port: int, workers: int, processes: bool) -> None:
+    service = QuoteService(workers, processes)
+    server = await service.start(host, port)
+    logger.info('Сервис расчетов доступен на http://%s:%s', host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP/JSON сервис расчетов ипотеки и рассрочки.')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес для входящих соединений')
+    parser.add_argument('--port', type=int, default=8080, help='порт')
+    parser.add_argument('--workers', type=int, default=4, help='количество потоков (процессов) для расчетов')
+    parser.add_argument('--processes', action='store_true', help='считать в процессах вместо потоков')
+    parser.add_argument('--metrics', action='store_true', help='собирать метрики для GET /metrics')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if args.metrics:
+        metrics.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
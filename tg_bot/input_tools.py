@@ -75,8 +75,8 @@ def get_input(prompt: str, validation_function, **kwargs):
 
 
 if __name__ == '__main__':
+    from schema import MORTGAGE_SCHEMA
+
     print('Введите параметры расчета:')
-    get_input('Стоимость объекта (руб.): ',
-              lambda value: validate_float(value, 'Стоимость объекта', 0))
-    get_input('Срок кредита (лет): ',
-              lambda value: validate_int(value, 'Срок кредита', 0, 30))
+    get_input('Стоимость объекта (руб.): ', MORTGAGE_SCHEMA.field_parser('object_cost'))
+    get_input('Срок кредита (лет): ', MORTGAGE_SCHEMA.field_parser('loan_term_years'))
@@ -1,7 +1,7 @@
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from input_tools import get_input
+from installment_rules import PROGRAMS, calculate_installment as calculate_program_installment
+from schema import INSTALLMENT_SCHEMA
 
-date_format = '%d.%m.%Y'
 
 def get_parameters():
     """
@@ -15,15 +15,15 @@ def get_parameters():
     - key_handover_date: дата выдачи ключей
     """
     params = {}
-    params['cost'] = float(input('Введите стоимость объекта, руб.: '))
-    params['markup'] = float(input('Введите удорожание, %: '))
-    params['down_payment'] = float(input('Введите первоначальный взнос, %: '))
-    ddu_date_str = input('Введите дату заключения ДДУ (ДД.ММ.ГГГГ): ')
-    params['ddu_date'] = datetime.strptime(ddu_date_str, date_format)
-    commissioning_date_str = input('Введите дату ввода объекта в эксплуатацию (ДД.ММ.ГГГГ): ')
-    params['commissioning_date'] = datetime.strptime(commissioning_date_str, date_format)
-    key_handover_str = input('Введите дату выдачи ключей (ДД.ММ.ГГГГ): ')
-    params['key_handover_date'] = datetime.strptime(key_handover_str, date_format)
+    for name, prompt in (
+            ('cost', 'Введите стоимость объекта, руб.: '),
+            ('markup', 'Введите удорожание, %: '),
+            ('down_payment', 'Введите первоначальный взнос, %: '),
+            ('ddu_date', 'Введите дату заключения ДДУ (ДД.ММ.ГГГГ): '),
+            ('commissioning_date', 'Введите дату ввода объекта в эксплуатацию (ДД.ММ.ГГГГ): '),
+            ('key_handover_date', 'Введите дату выдачи ключей (ДД.ММ.ГГГГ): '),
+    ):
+        params[name] = get_input(prompt, INSTALLMENT_SCHEMA.field_parser(name, params))
     return params
 
 
@@ -32,41 +32,9 @@ def calculate_installment(params):
     Функция расчета рассрочки. Принимает параметры, возвращает словарь с результатами:
     - full_cost: полная стоимость с учетом удорожания
     - payments: список словарей с датой и суммой платежей
+    Платежи рассчитываются по стандартной программе из installment_rules.
     """
-    result = {}
-    # Рассчитываем полную стоимость с учетом удорожания
-    result['full_cost'] = params['cost'] * (1 + params['markup'] / 100)
-    # Рассчитываем сумму первоначального взноса
-    initial_payment = (params['down_payment'] / 100) * result['full_cost']
-    # Остаток после первого взноса делится на 4 равные части
-    remaining = result['full_cost'] - initial_payment
-    part_payment = remaining / 4
-    # Создаем список для хранения платежей
-    payments = []
-    # Первый платеж (дата заключения ДДУ)
-    payments.append({'date': params['ddu_date'], 'amount': initial_payment})
-    # Второй платеж (+12 месяцев к дате ДДУ)
-    payments.append({
-        'date': params['ddu_date'] + relativedelta(months=12),
-        'amount': part_payment
-    })
-    # Третий платеж (+24 месяца к дате ДДУ)
-    payments.append({
-        'date': params['ddu_date'] + relativedelta(months=24),
-        'amount': part_payment
-    })
-    # Четвертый платеж (за 3 месяца до ввода в эксплуатацию)
-    payments.append({
-        'date': params['commissioning_date'] - relativedelta(months=3),
-        'amount': part_payment
-    })
-    # Пятый платеж (+3 месяца после выдачи ключей)
-    payments.append({
-        'date': params['key_handover_date'] + relativedelta(months=3),
-        'amount': part_payment
-    })
-    result['payments'] = payments
-    return result
+    return calculate_program_installment(params, PROGRAMS['standard'])
 
 
 def print_results(result):
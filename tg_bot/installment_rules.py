@@ -0,0 +1,181 @@
+import json
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from dates import add_months
+
+# Даты договора, от которых отсчитываются платежи
+ANCHORS = {
+    'ddu': 'ddu_date',
+    'commissioning': 'commissioning_date',
+    'key_handover': 'key_handover_date',
+}
+
+# Встроенные программы рассрочки в формате конфигурационного файла.
+# Первый взнос всегда вносится в дату ДДУ, остаток делится на parts равных частей,
+# правила сопоставляют кварталу ввода в эксплуатацию график оставшихся платежей.
+DEFAULT_PROGRAMS = [
+    {
+        # Пять платежей по стандартному графику (installment_calculator)
+        'name': 'standard',
+        'parts': 4,
+        'rules': [
+            {'from': None, 'to': None, 'payments': [
+                {'anchor': 'ddu', 'months': 12, 'parts': 1},
+                {'anchor': 'ddu', 'months': 24, 'parts': 1},
+                {'anchor': 'commissioning', 'months': -3, 'parts': 1},
+                {'anchor': 'key_handover', 'months': 3, 'parts': 1},
+            ]},
+        ],
+    },
+    {
+        # Объединение платежей в зависимости от квартала ввода в эксплуатацию (installment_calculator_limits)
+        'name': 'limits',
+        'parts': 4,
+        'rules': [
+            {'from': '2027-Q3', 'to': None, 'payments': [
+                {'anchor': 'ddu', 'months': 12, 'parts': 1},
+                {'anchor': 'ddu', 'months': 24, 'parts': 1},
+                {'anchor': 'commissioning', 'months': -3, 'parts': 1},
+                {'anchor': 'key_handover', 'months': 3, 'parts': 1},
+            ]},
+            {'from': '2026-Q3', 'to': '2027-Q2', 'payments': [
+                {'anchor': 'ddu', 'months': 12, 'parts': 1},
+                {'anchor': 'commissioning', 'months': -3, 'parts': 2},
+                {'anchor': 'key_handover', 'months': 3, 'parts': 1},
+            ]},
+            {'from': None, 'to': '2026-Q2', 'payments': [
+                {'anchor': 'commissioning', 'months': -3, 'parts': 3},
+                {'anchor': 'key_handover', 'months': 3, 'parts': 1},
+            ]},
+        ],
+    },
+]
+
+# Границы для правил без начала или конца диапазона
+_MIN_QUARTER = -1
+_MAX_QUARTER = 10 ** 9
+
+
+@dataclass(frozen=True, slots=True)
+class InstallmentProgram:
+    """Скомпилированная программа рассрочки с интервальным индексом правил по кварталам."""
+    name: str
+    parts: int
+    starts: tuple  # Начальные кварталы правил по возрастанию
+    ends: tuple  # Конечные кварталы правил (включительно)
+    patterns: tuple  # Графики платежей: кортежи (поле даты, смещение в месяцах, число частей)
+
+
+def quarter_index(year: int, quarter: int) -> int:
+    """Порядковый номер квартала (год * 4 + номер квартала - 1)."""
+    return year * 4 + quarter - 1
+
+
+def get_quarter(date) -> int:
+    """Порядковый номер квартала, в который попадает дата."""
+    return quarter_index(date.year, (date.month - 1) // 3 + 1)
+
+
+def parse_quarter(value: str | None, default: int) -> int:
+    """Разбирает квартал в формате ГГГГ-QN, для None возвращает default."""
+    if value is None:
+        return default
+    year, quarter = value.upper().split('-Q')
+    quarter = int(quarter)
+    if not 1 <= quarter <= 4:
+        raise ValueError(f'Неверный квартал "{value}". Используйте формат ГГГГ-QN.')
+    return quarter_index(int(year), quarter)
+
+
+def compile_program(spec: dict) -> InstallmentProgram:
+    """Проверяет описание программы рассрочки и строит по нему интервальный индекс правил."""
+    name = spec['name']
+    parts = int(spec['parts'])
+    rules = []
+    for rule in spec['rules']:
+        start = parse_quarter(rule.get('from'), _MIN_QUARTER)
+        end = parse_quarter(rule.get('to'), _MAX_QUARTER)
+        if start > end:
+            raise ValueError(f'Программа "{name}": начало диапазона правила позже его конца.')
+        pattern = []
+        for payment in rule['payments']:
+            if payment['anchor'] not in ANCHORS:
+                raise ValueError(f'Программа "{name}": неизвестная дата платежа "{payment["anchor"]}".')
+            pattern.append((ANCHORS[payment['anchor']], int(payment['months']), int(payment['parts'])))
+        if sum(payment_parts for _, _, payment_parts in pattern) != parts:
+            raise ValueError(f'Программа "{name}": сумма частей в правиле должна быть равна {parts}.')
+        rules.append((start, end, tuple(pattern)))
+
+    rules.sort()
+    for (_, prev_end, _), (next_start, _, _) in zip(rules, rules[1:]):
+        if next_start <= prev_end:
+            raise ValueError(f'Программа "{name}": диапазоны правил пересекаются.')
+
+    return InstallmentProgram(
+        name=name,
+        parts=parts,
+        starts=tuple(start for start, _, _ in rules),
+        ends=tuple(end for _, end, _ in rules),
+        patterns=tuple(pattern for _, _, pattern in rules),
+    )
+
+
+def compile_programs(specs: list[dict]) -> dict:
+    """Компилирует список описаний программ в словарь {название: InstallmentProgram}."""
+    return {spec['name']: compile_program(spec) for spec in specs}
+
+
+def load_programs(path: str) -> dict:
+    """Загружает программы рассрочки из JSON-файла вида {"programs": [...]}."""
+    with open(path, encoding='utf-8') as file:
+        return compile_programs(json.load(file)['programs'])
+
+
+def find_pattern(program: InstallmentProgram, commissioning_quarter: int) -> tuple:
+    """Находит график платежей для квартала ввода в эксплуатацию бинарным поиском."""
+    idx = bisect_right(program.starts, commissioning_quarter) - 1
+    if idx < 0 or commissioning_quarter > program.ends[idx]:
+        year, quarter = divmod(commissioning_quarter, 4)
+        raise ValueError(f'Программа "{program.name}" не покрывает {quarter + 1} квартал {year} года.')
+    return program.patterns[idx]
+
+
+def calculate_installment(params: dict, program: InstallmentProgram) -> dict:
+    """
+    Расчет рассрочки по программе. Принимает параметры, возвращает словарь с результатами:
+    - full_cost: полная стоимость с учетом удорожания
+    - payments: список словарей с датой и суммой платежей
+    """
+    result = {}
+    # Расчет полной стоимости
+    result['full_cost'] = params['cost'] * (1 + params['markup'] / 100)
+    initial_payment = (params['down_payment'] / 100) * result['full_cost']
+    remaining = result['full_cost'] - initial_payment
+    part_payment = remaining / program.parts
+
+    # Первый платеж (дата ДДУ)
+    payments = [{'date': params['ddu_date'], 'amount': initial_payment}]
+    # Остальные платежи по правилу для квартала ввода в эксплуатацию
+    for date_field, months, parts in find_pattern(program, get_quarter(params['commissioning_date'])):
+        payments.append({
+            'date': add_months(params[date_field], months),
+            'amount': part_payment * parts
+        })
+
+    result['payments'] = payments
+    return result
+
+
+def evaluate_portfolio(contracts: list[dict], programs: dict, default_program: str = 'limits') -> list[dict]:
+    """
+    Рассчитывает рассрочку для каждого договора портфеля.
+    Программа договора берется из ключа 'program', иначе используется default_program.
+    """
+    return [
+        calculate_installment(contract, programs[contract.get('program', default_program)])
+        for contract in contracts
+    ]
+
+
+PROGRAMS = compile_programs(DEFAULT_PROGRAMS)
@@ -0,0 +1,264 @@
+"""
+Встроенные метрики: счетчики и гистограммы длительностей с метками.
+По умолчанию выключены: timer(), inc() и observe() сводятся к проверке одного флага,
+поэтому инструментирование можно оставлять в горячих участках кода.
+Включение - enable(). Показатели отдаются в текстовом формате Prometheus (render_prometheus(),
+start_http_server()) или периодически пишутся в журнал (log_periodically()).
+Модули asyncio и inspect загружаются только при использовании, чтобы не замедлять запуск расчетов.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограмм длительностей, с
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_enabled = False
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: память не зависит от числа наблюдений."""
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - значения больше всех границ
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины, как histogram_quantile() в Prometheus."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if idx == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[idx - 1] if idx else 0.0
+                return lower + (self.buckets[idx] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class Registry:
+    """Хранилище метрик. Ключ метрики - название и кортеж пар (метка, значение)."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: tuple, amount: float = 1) -> None:
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """
+        Текущие значения: counters - {(название, метки): значение},
+        histograms - {(название, метки): {'count', 'sum', 'p50', 'p95', 'p99'}}.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {
+                    key: {
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        **{f'p{round(q * 100)}': histogram.quantile(q) for q in QUANTILES},
+                    }
+                    for key, histogram in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {name} counter')
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {name} histogram')
+                for (histogram_name, labels), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = Registry()
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Увеличивает счетчик."""
+    if _enabled:
+        registry.inc(name, tuple(sorted(labels.items())), amount)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Добавляет наблюдение в гистограмму."""
+    if _enabled:
+        registry.observe(name, tuple(sorted(labels.items())), value)
+
+
+class _Timer:
+    """Замер длительности блока with в гистограмму name."""
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name: str, labels: tuple):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        registry.observe(self.name, self.labels, time.perf_counter() - self.started)
+        return False
+
+
+def timer(name: str, **labels):
+    """Контекстный менеджер для замера длительности. При выключенных метриках ничего не делает."""
+    if not _enabled:
+        return _NOOP
+    return _Timer(name, tuple(sorted(labels.items())))
+
+
+def timed(name: str, **labels):
+    """
+    Декоратор замера длительности функции или корутины в гистограмму name.
+    Без меток добавляется метка function с именем функции.
+    """
+    def decorate(func):
+        import inspect
+
+        key = tuple(sorted((labels or {'function': func.__name__}).items()))
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with _Timer(name, key):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(name, key):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def format_snapshot() -> str:
+    """Краткая сводка метрик для журнала: счетчики и p50/p95/p99 гистограмм в миллисекундах."""
+    snapshot = registry.snapshot()
+    lines = [f'{name}{_format_labels(labels)} = {value}'
+             for (name, labels), value in sorted(snapshot['counters'].items())]
+    for (name, labels), stats in sorted(snapshot['histograms'].items()):
+        lines.append(
+            f'{name}{_format_labels(labels)}: n={stats["count"]} '
+            f'p50={stats["p50"] * 1000:.2f} мс p95={stats["p95"] * 1000:.2f} мс p99={stats["p99"] * 1000:.2f} мс'
+        )
+    return '\n'.join(lines)
+
+
+async def log_periodically(interval: float) -> None:
+    """Пишет сводку метрик в журнал каждые interval секунд."""
+    import asyncio
+
+    while True:
+        await asyncio.sleep(interval)
+        logger.info('Метрики:\n%s', format_snapshot())
+
+
+async def _handle_http(reader, writer) -> None:
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1] == '/metrics':
+            status, body = '200 OK', registry.render_prometheus().encode()
+        else:
+            status, body = '404 Not Found', b'not found\n'
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_http_server(port: int, host: str = '127.0.0.1'):
+    """
+    Запускает локальную точку GET /metrics для сборщика Prometheus.
+    Возвращает asyncio.Server, который нужно закрыть при остановке.
+    """
+    import asyncio
+
+    return await asyncio.start_server(_handle_http, host, port)
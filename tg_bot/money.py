@@ -0,0 +1,380 @@
+"""
+Точный денежный режим: суммы в целых копейках.
+Каждый платеж и начисленные проценты округляются до копейки по банковским правилам
+(половина - вверх), последний платеж корректируется так, чтобы долг закрывался ровно в ноль.
+Сумма всех платежей сходится с выпиской банка до копейки.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+from typing import TYPE_CHECKING, Iterator, NamedTuple
+
+from dates import add_months, parse_month
+from installment_rules import InstallmentProgram, find_pattern, get_quarter
+
+if TYPE_CHECKING:
+    import numpy as np  # Нужен только пакетным функциям и загружается при первом вызове
+
+# Годовые ставки в пакетном режиме задаются с точностью до 0.0001%
+RATE_SCALE = 10 ** 4
+# Знаменатель месячной ставки: годовой процент / 100 / 12
+_MONTHLY_DENOMINATOR = 1200
+
+
+def to_kopecks(value) -> int:
+    """Переводит сумму в рублях (число или строку) в целые копейки с округлением половины вверх."""
+    return int(Decimal(str(value)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_kopecks(kopecks: int) -> str:
+    """Форматирует копейки как рубли с двумя знаками после точки."""
+    sign = '-' if kopecks < 0 else ''
+    rubles, rest = divmod(abs(int(kopecks)), 100)
+    return f'{sign}{rubles}.{rest:02d}'
+
+
+def round_half_up(numerator: int, denominator: int) -> int:
+    """Округляет неотрицательную дробь numerator / denominator до целого, половина - вверх."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def percent_ratio(percent: float) -> tuple[int, int]:
+    """Процент в виде точной дроби (числитель, знаменатель) доли: 16.5 -> (33, 200)."""
+    numerator, denominator = Decimal(str(percent)).as_integer_ratio()
+    return numerator, denominator * 100
+
+
+def monthly_rate_ratio(annual_rate: float) -> tuple[int, int]:
+    """Месячная ставка по годовой ставке в % в виде точной дроби (числитель, знаменатель)."""
+    numerator, denominator = Decimal(str(annual_rate)).as_integer_ratio()
+    return numerator, denominator * _MONTHLY_DENOMINATOR
+
+
+def annuity_kopecks(balance: int, months: int, rate: tuple[int, int]) -> int:
+    """Аннуитетный платеж в копейках, округленный до копейки (половина - вверх)."""
+    numerator, denominator = rate
+    if numerator == 0:
+        return round_half_up(balance, months)
+    with localcontext() as context:
+        context.prec = 40
+        monthly_rate = Decimal(numerator) / Decimal(denominator)
+        payment = Decimal(balance) * monthly_rate / (1 - (1 + monthly_rate) ** -months)
+        return int(payment.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def annuity_kopecks_batch(balances, months, rate_units, denominator: int) -> 'np.ndarray':
+    """
+    Векторный вариант annuity_kopecks() для месячных ставок rate_units / denominator.
+    Платеж считается в float и округляется; значения рядом с половиной копейки,
+    где погрешность float может изменить округление, пересчитываются точно.
+    """
+    import numpy as np
+
+    balances = np.asarray(balances, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    rate_units = np.asarray(rate_units, dtype=np.int64)
+    monthly_rates = rate_units / denominator
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = balances * monthly_rates / (1 - (1 + monthly_rates) ** -months)
+    payment = np.where(rate_units == 0, 0.0, payment)
+    rounded = np.floor(payment + 0.5).astype(np.int64)
+    rounded = np.where(rate_units == 0, (2 * balances + months) // np.maximum(2 * months, 1), rounded)
+    near_half = (rate_units != 0) & (np.abs(payment - np.floor(payment) - 0.5) < 1e-9 * payment + 1e-6)
+    for idx in np.flatnonzero(near_half):
+        rounded.flat[idx] = annuity_kopecks(int(balances.flat[idx]), int(months.flat[idx]),
+                                            (int(rate_units.flat[idx]), denominator))
+    return rounded
+
+
+def amortize(balance: int, rate: tuple[int, int], payment: int, months: int, close: bool) -> tuple[int, int, int]:
+    """
+    Гасит долг balance платежами payment в течение months месяцев с округлением процентов до копейки.
+    При close=True последний платеж равен остатку долга с процентами.
+    Возвращает (остаток долга, сумма процентов, последний платеж).
+    """
+    numerator, denominator = rate
+    double_numerator, double_denominator = 2 * numerator, 2 * denominator
+    start_balance = balance
+    # Последний платеж при close=True считается отдельно, чтобы не проверять условие каждый месяц
+    steps = months - 1 if close and months > 0 else months
+    for _ in range(steps):
+        balance -= payment - (balance * double_numerator + denominator) // double_denominator
+    # Проценты не накапливаются в цикле: это внесенные платежи за вычетом погашенного долга
+    total_interest = payment * steps - (start_balance - balance)
+    last_payment = payment
+    if steps < months:
+        interest = (balance * double_numerator + denominator) // double_denominator
+        total_interest += interest
+        last_payment = balance + interest
+        balance = 0
+    return balance, total_interest, last_payment
+
+
+class ExactRow(NamedTuple):
+    """Строка графика платежей в копейках."""
+    number: int
+    date: object
+    payment: int
+    interest: int
+    principal: int
+    balance: int
+
+
+@dataclass(frozen=True, slots=True)
+class ExactMortgageResult:
+    """Результаты расчета ипотеки в копейках."""
+    down_payment: int
+    loan_amount: int
+    grace_payments: int
+    grace_monthly_payment: int
+    remaining_loan: int
+    main_payments: int
+    main_monthly_payment: int
+    last_payment: int
+    total_paid: int
+    overpayment: int
+
+
+def _mortgage_segments_exact(params: dict) -> tuple[int, int, list]:
+    """
+    Первоначальный взнос, тело кредита и участки графика (остаток, ставка, платеж, число платежей) в копейках.
+    Платежи выбираются так же, как в compute_mortgage(), но по остатку долга с округленными процентами.
+    """
+    object_cost = to_kopecks(params['object_cost'])
+    loan_term_years = params['loan_term_years']
+    grace_years = params.get('grace_years', 0)
+    has_grace_period = grace_years > 0
+    if has_grace_period and grace_years >= loan_term_years:
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
+
+    down_numerator, down_denominator = percent_ratio(params['down_payment_percent'])
+    down_payment = round_half_up(object_cost * down_numerator, down_denominator)
+    loan_amount = object_cost - down_payment
+    total_payments = loan_term_years * 12
+    grace_payments = grace_years * 12 if has_grace_period else 0
+
+    segments = []
+    balance = loan_amount
+    if has_grace_period:
+        grace_rate = monthly_rate_ratio(params.get('grace_rate', 0.0))
+        grace_payment = annuity_kopecks(loan_amount, total_payments, grace_rate)
+        segments.append((balance, grace_rate, grace_payment, grace_payments))
+        balance, _, _ = amortize(balance, grace_rate, grace_payment, grace_payments, close=False)
+        balance = max(balance, 0)
+    main_rate = monthly_rate_ratio(params['annual_rate'])
+    main_payments = total_payments - grace_payments
+    segments.append((balance, main_rate, annuity_kopecks(balance, main_payments, main_rate), main_payments))
+    return down_payment, loan_amount, segments
+
+
+def compute_mortgage_exact(params: dict) -> ExactMortgageResult:
+    """
+    Рассчитывает ипотеку в целых копейках. Параметры те же, что у compute_mortgage().
+    Последний платеж основного периода закрывает долг полностью.
+    Проценты округляются каждый месяц, поэтому остаток долга не выражается формулой и проходится циклом
+    по платежам основного периода: расчет примерно в 10 раз медленнее compute_mortgage().
+    Для портфелей есть compute_mortgage_exact_batch().
+    """
+    down_payment, loan_amount, segments = _mortgage_segments_exact(params)
+    # Остаток после льготного периода уже посчитан в сегментах, пройти заново нужно только основной период
+    total_paid = sum(payment * months for _, _, payment, months in segments[:-1])
+    balance, rate, payment, months = segments[-1]
+    _, _, last_payment = amortize(balance, rate, payment, months, close=True)
+    total_paid += payment * (months - 1) + last_payment
+
+    has_grace_period = len(segments) > 1
+    return ExactMortgageResult(
+        down_payment=down_payment,
+        loan_amount=loan_amount,
+        grace_payments=segments[0][3] if has_grace_period else 0,
+        grace_monthly_payment=segments[0][2] if has_grace_period else 0,
+        remaining_loan=segments[-1][0],
+        main_payments=segments[-1][3],
+        main_monthly_payment=segments[-1][2],
+        last_payment=last_payment,
+        total_paid=total_paid,
+        overpayment=total_paid - loan_amount,
+    )
+
+
+def iter_exact_schedule(params: dict) -> Iterator[ExactRow]:
+    """Лениво формирует помесячный график ипотеки в копейках (как iter_mortgage_schedule())."""
+    start_date = params['start_date']
+    _, _, segments = _mortgage_segments_exact(params)
+    number = 0
+    for idx, (balance, (numerator, denominator), payment, months) in enumerate(segments):
+        is_last_segment = idx == len(segments) - 1
+        for month in range(1, months + 1):
+            number += 1
+            interest = round_half_up(balance * numerator, denominator)
+            principal = balance if is_last_segment and month == months else payment - interest
+            balance -= principal
+            yield ExactRow(number, add_months(start_date, number), interest + principal,
+                           interest, principal, balance)
+
+
+def _amortize_batch(balances, units, payments, months, denominator: int) -> 'np.ndarray':
+    """
+    Векторный вариант amortize() без закрытия долга: каждый сценарий вносит months[i] платежей.
+    Сценарии упорядочиваются по убыванию числа платежей, поэтому на каждом шаге
+    обновляется непрерывный срез массива без масок.
+    """
+    import numpy as np
+
+    order = np.argsort(-months, kind='stable')
+    balance = balances[order]
+    rate_units = units[order]
+    payment = payments[order]
+    # active[j] - число сценариев, у которых больше j платежей
+    active = np.searchsorted(-months[order], -np.arange(int(months.max(initial=0))), side='left')
+    for count in active:
+        interest = (2 * balance[:count] * rate_units[:count] + denominator) // (2 * denominator)
+        balance[:count] += interest - payment[:count]
+    result = np.empty_like(balance)
+    result[order] = balance
+    return result
+
+
+def compute_mortgage_exact_batch(loan_amounts, loan_term_years, annual_rates, grace_years=0, grace_rates=0.0) -> dict:
+    """
+    Векторный вариант compute_mortgage_exact() по образцу compute_mortgage_batch().
+    loan_amounts - тело кредита в копейках; ставки - с точностью до 0.0001%.
+    Месяцы каждого периода перебираются по порядку, каждая операция выполняется сразу для всех сценариев в int64.
+    Возвращает словарь массивов в копейках: grace_monthly_payment, remaining_loan, main_monthly_payment,
+    last_payment, total_paid, overpayment.
+    """
+    import numpy as np
+
+    loan_amounts, loan_term_years, annual_rates, grace_years, grace_rates = np.broadcast_arrays(
+        np.asarray(loan_amounts, dtype=np.int64),
+        np.asarray(loan_term_years, dtype=np.int64),
+        np.asarray(annual_rates, dtype=np.float64),
+        np.asarray(grace_years, dtype=np.int64),
+        np.asarray(grace_rates, dtype=np.float64),
+    )
+    shape = loan_amounts.shape
+    loan_amounts, loan_term_years, annual_rates, grace_years, grace_rates = (
+        array.ravel() for array in (loan_amounts, loan_term_years, annual_rates, grace_years, grace_rates)
+    )
+    has_grace_period = grace_years > 0
+    if np.any(has_grace_period & (grace_years >= loan_term_years)):
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
+
+    grace_rates = np.where(has_grace_period, grace_rates, 0.0)
+    main_units = np.rint(annual_rates * RATE_SCALE).astype(np.int64)
+    grace_units = np.rint(grace_rates * RATE_SCALE).astype(np.int64)
+    if (np.any(np.abs(main_units - annual_rates * RATE_SCALE) > 1e-6)
+            or np.any(np.abs(grace_units - grace_rates * RATE_SCALE) > 1e-6)):
+        raise ValueError('Ставки в точном режиме задаются с точностью до 0.0001%.')
+    if np.any(loan_amounts.astype(np.float64) * np.maximum(main_units, grace_units) * 2 >= 2 ** 62):
+        raise ValueError('Сумма кредита слишком велика для пакетного точного расчета.')
+
+    denominator = _MONTHLY_DENOMINATOR * RATE_SCALE
+    total_payments = loan_term_years * 12
+    grace_payments = np.where(has_grace_period, grace_years * 12, 0)
+    main_payments = total_payments - grace_payments
+
+    # Льготный период
+    grace_payment = np.where(has_grace_period,
+                             annuity_kopecks_batch(loan_amounts, total_payments, grace_units, denominator), 0)
+    remaining_loan = loan_amounts.copy()
+    remaining_loan[has_grace_period] = np.maximum(_amortize_batch(
+        loan_amounts[has_grace_period], grace_units[has_grace_period], grace_payment[has_grace_period],
+        grace_payments[has_grace_period], denominator
+    ), 0)
+
+    # Основной период: все платежи, кроме последнего, затем последний платеж закрывает долг
+    main_payment = annuity_kopecks_batch(remaining_loan, main_payments, main_units, denominator)
+    balance = _amortize_batch(remaining_loan, main_units, main_payment, main_payments - 1, denominator)
+    last_payment = balance + (2 * balance * main_units + denominator) // (2 * denominator)
+    total_paid = grace_payment * grace_payments + main_payment * (main_payments - 1) + last_payment
+
+    return {
+        'grace_monthly_payment': grace_payment.reshape(shape),
+        'remaining_loan': remaining_loan.reshape(shape),
+        'main_monthly_payment': main_payment.reshape(shape),
+        'last_payment': last_payment.reshape(shape),
+        'total_paid': total_paid.reshape(shape),
+        'overpayment': (total_paid - loan_amounts).reshape(shape),
+    }
+
+
+def calculate_installment_exact(params: dict, program: InstallmentProgram) -> dict:
+    """
+    Расчет рассрочки в копейках по программе из installment_rules.
+    Остаток после первого взноса делится на части нацело, остаток от деления
+    добавляется к последнему платежу, поэтому сумма платежей равна полной стоимости.
+    """
+    cost = to_kopecks(params['cost'])
+    markup_numerator, markup_denominator = percent_ratio(params['markup'])
+    full_cost = round_half_up(cost * (markup_denominator + markup_numerator), markup_denominator)
+    down_numerator, down_denominator = percent_ratio(params['down_payment'])
+    initial_payment = round_half_up(full_cost * down_numerator, down_denominator)
+    remaining = full_cost - initial_payment
+    part_payment = remaining // program.parts
+
+    payments = [{'date': params['ddu_date'], 'amount': initial_payment}]
+    for date_field, months, parts in find_pattern(program, get_quarter(params['commissioning_date'])):
+        payments.append({
+            'date': add_months(params[date_field], months),
+            'amount': part_payment * parts
+        })
+    payments[-1]['amount'] += remaining - part_payment * program.parts
+    return {'full_cost': full_cost, 'payments': payments}
+
+
+def calculate_tranche_exact(params: dict) -> dict:
+    """
+    Расчет ипотеки с траншами в копейках. Параметры те же, что у calculate_mortgage()
+    из tranche_mortgage_calculator. Каждый транш гасится отдельным аннуитетом с округлением
+    до копейки; последний транш равен остатку кредита, последний платеж транша закрывает его долг.
+    Отличие от режима с плавающей точкой: транш со ставкой 0% гасится равными платежами (сумма / число
+    платежей), тогда как calculate_mortgage() и compute_tranche_batch() показывают для него платеж 0.0.
+    Точный режим сверяется с выпиской, где беспроцентный транш тоже погашается, поэтому платеж
+    здесь не обнуляется.
+    """
+    cost = to_kopecks(params['cost'])
+    markup_numerator, markup_denominator = percent_ratio(params['markup'])
+    full_cost = round_half_up(cost * (markup_denominator + markup_numerator), markup_denominator)
+    initial_numerator, initial_denominator = percent_ratio(params['initial_percent'])
+    initial_payment = round_half_up(full_cost * initial_numerator, initial_denominator)
+    loan_amount = full_cost - initial_payment
+
+    tranche_months = [parse_month(tranche['date']) for tranche in params['tranches']]
+    order = sorted(range(len(tranche_months)), key=tranche_months.__getitem__)
+    start_month = tranche_months[order[0]]
+    loan_term_months = params['loan_term_years'] * 12
+
+    tranches = []
+    issued = 0
+    total_paid = 0
+    for position, idx in enumerate(order):
+        tranche = params['tranches'][idx]
+        if position < len(order) - 1:
+            numerator, denominator = percent_ratio(tranche['percent'])
+            amount = round_half_up(full_cost * numerator, denominator)
+        else:
+            amount = loan_amount - issued
+        issued += amount
+        num_payments = max(loan_term_months - (tranche_months[idx] - start_month), 0)
+        monthly_payment = last_payment = 0
+        if num_payments:
+            rate = monthly_rate_ratio(tranche['rate'])
+            monthly_payment = annuity_kopecks(amount, num_payments, rate)
+            _, _, last_payment = amortize(amount, rate, monthly_payment, num_payments, close=True)
+            total_paid += monthly_payment * (num_payments - 1) + last_payment
+        tranches.append({
+            'date': tranche['date'],
+            'amount': amount,
+            'num_payments': num_payments,
+            'monthly_payment': monthly_payment,
+            'last_payment': last_payment,
+        })
+
+    return {
+        'full_cost': full_cost,
+        'initial_payment': initial_payment,
+        'loan_amount': loan_amount,
+        'tranches': tranches,
+        'total_paid': total_paid,
+        'overpayment': total_paid - loan_amount,
+    }
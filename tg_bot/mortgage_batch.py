@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def calculate_annuity_batch(loan_amounts, months, monthly_rates) -> np.ndarray:
+    """
+    Векторный аналог calculate_annuity() из mortgage_calculator.
+    Для нулевой ставки платеж равен сумме, деленной на количество платежей.
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+    months = np.asarray(months, dtype=np.int64)
+    monthly_rates = np.asarray(monthly_rates, dtype=np.float64)
+
+    growth = (1 + monthly_rates) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity_factor = (monthly_rates * growth) / (growth - 1)
+        return np.where(monthly_rates == 0, loan_amounts / months, loan_amounts * annuity_factor)
+
+
+def compute_mortgage_batch(loan_amounts, loan_term_years, annual_rates, grace_years=0, grace_rates=0.0) -> dict:
+    """
+    Рассчитывает ипотеку сразу для массива сценариев.
+    Аргументы приводятся к общей форме по правилам broadcasting NumPy:
+    - loan_amounts: тело кредита, руб.
+    - loan_term_years: срок кредита, лет
+    - annual_rates: годовая ставка, %
+    - grace_years: срок льготного периода, лет (0 - без льготного периода)
+    - grace_rates: годовая ставка в льготный период, %
+    Возвращает словарь массивов с ключами grace_payments, grace_monthly_payment,
+    remaining_loan, main_payments, main_monthly_payment, overpayment.
+    Результаты совпадают с compute_mortgage() для каждого сценария.
+    """
+    loan_amounts, loan_term_years, annual_rates, grace_years, grace_rates = np.broadcast_arrays(
+        np.asarray(loan_amounts, dtype=np.float64),
+        np.asarray(loan_term_years, dtype=np.int64),
+        np.asarray(annual_rates, dtype=np.float64),
+        np.asarray(grace_years, dtype=np.int64),
+        np.asarray(grace_rates, dtype=np.float64),
+    )
+
+    has_grace_period = grace_years > 0
+    if np.any(has_grace_period & (grace_years >= loan_term_years)):
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
+
+    total_payments = loan_term_years * 12
+    grace_payments = np.where(has_grace_period, grace_years * 12, 0)
+    main_payments = total_payments - grace_payments
+
+    # Льготный период
+    grace_monthly_rates = (grace_rates / 100) / 12
+    grace_monthly_payment = np.where(
+        has_grace_period,
+        calculate_annuity_batch(loan_amounts, total_payments, grace_monthly_rates),
+        0.0
+    )
+    grace_growth = (1 + grace_monthly_rates) ** grace_payments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining_loan = np.where(
+            grace_monthly_rates == 0,
+            loan_amounts - grace_monthly_payment * grace_payments,
+            loan_amounts * grace_growth - grace_monthly_payment * ((grace_growth - 1) / grace_monthly_rates)
+        )
+    remaining_loan = np.where(has_grace_period, np.maximum(remaining_loan, 0.0), loan_amounts)
+
+    # Основной период
+    main_monthly_rates = (annual_rates / 100) / 12
+    main_monthly_payment = np.where(
+        main_payments > 0,
+        calculate_annuity_batch(remaining_loan, main_payments, main_monthly_rates),
+        0.0
+    )
+
+    overpayment = (grace_monthly_payment * grace_payments + main_monthly_payment * main_payments) - loan_amounts
+
+    return {
+        'grace_payments': grace_payments,
+        'grace_monthly_payment': grace_monthly_payment,
+        'remaining_loan': remaining_loan,
+        'main_payments': main_payments,
+        'main_monthly_payment': main_monthly_payment,
+        'overpayment': overpayment,
+    }
@@ -1,5 +1,8 @@
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from dataclasses import dataclass
+from datetime import date
+
+from dates import add_months, parse_date
+from schema import MORTGAGE_SCHEMA
 
 # date_format = '%Y-%m-%d'
 date_format = '%d.%m.%Y'
@@ -16,10 +19,10 @@ def validate_positive_float(value: str, name: str) -> float:
         raise ValueError(f'Некорректное значение параметра "{name}". Введите число.')
 
 
-def validate_date(date_str: str) -> datetime.date:
+def validate_date(date_str: str) -> date:
     """Проверяет корректность формата даты (ДД.ММ.ГГГГ)."""
     try:
-        return datetime.strptime(date_str, date_format).date()
+        return parse_date(date_str)
     except ValueError:
         raise ValueError('Неверный формат даты. Используйте ДД.ММ.ГГГГ.')
 
@@ -57,53 +60,49 @@ def calculate_annuity(loan_amount: float, months: int, monthly_rate: float) -> f
     """
     if monthly_rate == 0:
         return loan_amount / months
-    annuity_factor = (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
+    growth = (1 + monthly_rate) ** months
+    annuity_factor = (monthly_rate * growth) / (growth - 1)
     return loan_amount * annuity_factor
 
 
-# def calculate_mortgage(params: dict) -> dict:
-def calculate_mortgage():
+@dataclass(frozen=True, slots=True)
+class MortgageResult:
+    """Результаты расчета ипотеки."""
+    down_payment: float
+    loan_amount: float
+    grace_payments: int
+    grace_end_date: date
+    grace_monthly_payment: float
+    remaining_loan: float
+    main_payments: int
+    final_end_date: date
+    main_monthly_payment: float
+    overpayment: float
+
+
+def compute_mortgage(params: dict) -> MortgageResult:
     """
-    Ипотечный калькулятор для расчета параметров кредита.
-    Запрашивает у пользователя входные данные и выводит результаты расчетов.
+    Рассчитывает параметры ипотеки без ввода-вывода.
+    Ожидает словарь с ключами:
+    - object_cost: стоимость объекта, руб.
+    - down_payment_percent: первоначальный взнос, %
+    - start_date: дата первоначального взноса
+    - loan_term_years: срок кредита, лет
+    - annual_rate: годовая ставка, %
+    - grace_years: срок льготного периода, лет (необязательно, 0 - без льготного периода)
+    - grace_rate: годовая ставка в льготный период, % (необязательно)
     """
-    print('Введите параметры расчета ипотеки:')
+    object_cost = params['object_cost']
+    loan_term_years = params['loan_term_years']
+    grace_years = params.get('grace_years', 0)
+    grace_rate = params.get('grace_rate', 0.0)
+    has_grace_period = grace_years > 0
 
-    # Основные параметры
-    object_cost = get_input('Введите стоимость объекта (руб.): ',
-                            lambda vld: validate_positive_float(vld, 'Стоимость объекта'))
-    down_payment_percent = get_input('Введите первоначальный взнос (%): ',
-                                     lambda vld: validate_percent(vld, 'Первоначальный взнос'))
-    start_date = get_input('Введите дату первоначального взноса (ДД.ММ.ГГГГ): ', validate_date)
-    loan_term_years = get_input('Введите срок кредита (лет): ',
-                                lambda vld: int(validate_positive_float(vld, 'Срок кредита')))
-    annual_rate = get_input('Введите годовую ставку (%): ',
-                            lambda vld: validate_positive_float(vld, 'Годовая ставка'))
-    has_grace_period = get_input('Есть льготный период? (да/нет): ', validate_yes_no)
-
-    # Параметры льготного периода
-    grace_years = 0
-    grace_rate = 0.0
-    if has_grace_period:
-        grace_years = get_input(
-            'Введите срок льготного периода (лет): ',
-            lambda vld: int(validate_positive_float(vld, 'Срок льготного периода'))
-        )
-
-        while grace_years >= loan_term_years:
-            print('❌ Срок льготного периода должен быть меньше общего срока.')
-            grace_years = get_input(
-                'Введите срок льготного периода (лет): ',
-                lambda vld: int(validate_positive_float(vld, 'Срок льготного периода'))
-            )
-
-        grace_rate = get_input(
-            'Введите годовую ставку в льготный период (%): ',
-            lambda vld: validate_positive_float(vld, 'Льготная ставка')
-        )
+    if has_grace_period and grace_years >= loan_term_years:
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
 
     # Расчет базовых параметров
-    down_payment = object_cost * (down_payment_percent / 100)  # Первоначальный взнос, руб.
+    down_payment = object_cost * (params['down_payment_percent'] / 100)  # Первоначальный взнос, руб.
     loan_amount = object_cost - down_payment  # Тело кредита, руб.
     total_payments = loan_term_years * 12  # Общее количество платежей (месяцев)
 
@@ -119,12 +118,15 @@ def calculate_mortgage():
         grace_monthly_payment = calculate_annuity(loan_amount, total_payments, grace_monthly_rate)
 
         # Пересчет остатка после льготного периода
-        remaining_loan = loan_amount * (1 + grace_monthly_rate) ** grace_payments - grace_monthly_payment * (
-                ((1 + grace_monthly_rate) ** grace_payments - 1) / grace_monthly_rate)
+        if grace_monthly_rate == 0:
+            remaining_loan = loan_amount - grace_monthly_payment * grace_payments
+        else:
+            remaining_loan = loan_amount * (1 + grace_monthly_rate) ** grace_payments - grace_monthly_payment * (
+                    ((1 + grace_monthly_rate) ** grace_payments - 1) / grace_monthly_rate)
         remaining_loan = max(remaining_loan, 0.0)  # Защита от отрицательных значений
 
     # Расчет платежей для основного периода
-    main_monthly_rate = (annual_rate / 100) / 12
+    main_monthly_rate = (params['annual_rate'] / 100) / 12
     main_monthly_payment = calculate_annuity(remaining_loan, main_payments,
                                              main_monthly_rate) if main_payments > 0 else 0.0
 
@@ -134,37 +136,71 @@ def calculate_mortgage():
     overpayment = (total_grace_payment + total_main_payment) - loan_amount
 
     # Даты платежей
-    grace_end_date = start_date + relativedelta(months=+grace_payments) if has_grace_period else start_date
-    final_end_date = grace_end_date + relativedelta(months=+main_payments)
-
-    # Вывод результатов
+    start_date = params['start_date']
+    grace_end_date = add_months(start_date, grace_payments) if has_grace_period else start_date
+    final_end_date = add_months(grace_end_date, main_payments)
+
+    return MortgageResult(
+        down_payment=down_payment,
+        loan_amount=loan_amount,
+        grace_payments=grace_payments,
+        grace_end_date=grace_end_date,
+        grace_monthly_payment=grace_monthly_payment,
+        remaining_loan=remaining_loan,
+        main_payments=main_payments,
+        final_end_date=final_end_date,
+        main_monthly_payment=main_monthly_payment,
+        overpayment=overpayment,
+    )
+
+
+def print_results(result: MortgageResult) -> None:
+    """Выводит результаты расчета ипотеки на экран."""
     print('\nРезультаты расчета:')
 
-    if has_grace_period:
+    if result.grace_payments:
         print(f'\nЛьготный период:')
-        print(f'1. Число платежей: {grace_payments}')
-        print(f'2. Дата окончания льготного периода: {grace_end_date.strftime(date_format)}')
-        print(f'3. Сумма ежемесячного платежа: {grace_monthly_payment:.2f} руб.')
-        print(f'4. Остаток долга после льготного периода: {remaining_loan:.2f} руб.')
+        print(f'1. Число платежей: {result.grace_payments}')
+        print(f'2. Дата окончания льготного периода: {result.grace_end_date.strftime(date_format)}')
+        print(f'3. Сумма ежемесячного платежа: {result.grace_monthly_payment:.2f} руб.')
+        print(f'4. Остаток долга после льготного периода: {result.remaining_loan:.2f} руб.')
         print(f'\nОсновной период:')
 
-    print(f'1. Число платежей: {main_payments}')
-    print(f'2. Дата последнего платежа: {final_end_date.strftime(date_format)}')
-    print(f'3. Сумма ежемесячного платежа: {main_monthly_payment:.2f} руб.')
-    print(f'4. Сумма кредита: {loan_amount:.2f} руб.')
-    print(f'5. Сумма переплат: {overpayment:.2f} руб.')
-
-    # return {
-    #     'grace_payments': grace_payments,
-    #     'grace_end_date': grace_end_date.strftime(date_format),
-    #     'grace_monthly_payment': grace_monthly_payment,
-    #
-    #     'main_payments': main_payments,
-    #     'final_end_date': final_end_date.strftime(date_format),
-    #     'main_monthly_payment': main_monthly_payment,
-    #     'loan_amount': loan_amount,
-    #     'overpayment': overpayment
-    # }
+    print(f'1. Число платежей: {result.main_payments}')
+    print(f'2. Дата последнего платежа: {result.final_end_date.strftime(date_format)}')
+    print(f'3. Сумма ежемесячного платежа: {result.main_monthly_payment:.2f} руб.')
+    print(f'4. Сумма кредита: {result.loan_amount:.2f} руб.')
+    print(f'5. Сумма переплат: {result.overpayment:.2f} руб.')
+
+
+def calculate_mortgage():
+    """
+    Ипотечный калькулятор для расчета параметров кредита.
+    Запрашивает у пользователя входные данные и выводит результаты расчетов.
+    """
+    print('Введите параметры расчета ипотеки:')
+
+    # Основные параметры
+    params = {}
+    for name, prompt in (
+            ('object_cost', 'Введите стоимость объекта (руб.): '),
+            ('down_payment_percent', 'Введите первоначальный взнос (%): '),
+            ('start_date', 'Введите дату первоначального взноса (ДД.ММ.ГГГГ): '),
+            ('loan_term_years', 'Введите срок кредита (лет): '),
+            ('annual_rate', 'Введите годовую ставку (%): '),
+    ):
+        params[name] = get_input(prompt, MORTGAGE_SCHEMA.field_parser(name, params))
+
+    # Параметры льготного периода
+    params['grace_years'] = 0
+    params['grace_rate'] = 0.0
+    if get_input('Есть льготный период? (да/нет): ', validate_yes_no):
+        params['grace_years'] = get_input('Введите срок льготного периода (лет): ',
+                                          MORTGAGE_SCHEMA.field_parser('grace_years', params))
+        params['grace_rate'] = get_input('Введите годовую ставку в льготный период (%): ',
+                                         MORTGAGE_SCHEMA.field_parser('grace_rate', params))
+
+    print_results(compute_mortgage(params))
 
 
 # Запуск калькулятора
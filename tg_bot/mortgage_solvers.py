@@ -0,0 +1,198 @@
+import numpy as np
+
+from mortgage_batch import calculate_annuity_batch
+from mortgage_calculator import calculate_annuity
+
+
+def _grace_factors(loan_term_years: int, grace_years: int, grace_rate: float) -> tuple[float, float]:
+    """
+    Платеж в льготный период и остаток долга после него в расчете на 1 рубль кредита.
+    Формулы совпадают с compute_mortgage(), поэтому обе величины линейны по сумме кредита.
+    """
+    if grace_years <= 0:
+        return 0.0, 1.0
+    if grace_years >= loan_term_years:
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
+    total_payments = loan_term_years * 12
+    grace_payments = grace_years * 12
+    grace_monthly_rate = (grace_rate / 100) / 12
+    grace_factor = calculate_annuity(1.0, total_payments, grace_monthly_rate)
+    if grace_monthly_rate == 0:
+        remaining_factor = 1.0 - grace_factor * grace_payments
+    else:
+        remaining_factor = (1 + grace_monthly_rate) ** grace_payments - grace_factor * (
+                ((1 + grace_monthly_rate) ** grace_payments - 1) / grace_monthly_rate)
+    return grace_factor, max(remaining_factor, 0.0)
+
+
+def max_loan_amount(
+        target_payment: float,
+        loan_term_years: int,
+        annual_rate: float,
+        grace_years: int = 0,
+        grace_rate: float = 0.0
+) -> float:
+    """
+    Максимальная сумма кредита, при которой ни льготный, ни основной ежемесячный платеж
+    не превышает target_payment. Рассчитывается в замкнутой форме.
+    """
+    if target_payment <= 0:
+        raise ValueError('Целевой платеж должен быть больше нуля.')
+    grace_factor, remaining_factor = _grace_factors(loan_term_years, grace_years, grace_rate)
+    main_payments = (loan_term_years - max(grace_years, 0)) * 12
+    main_factor = remaining_factor * calculate_annuity(1.0, main_payments, (annual_rate / 100) / 12)
+    return target_payment / max(grace_factor, main_factor)
+
+
+def max_object_cost(
+        target_payment: float,
+        down_payment_percent: float,
+        loan_term_years: int,
+        annual_rate: float,
+        grace_years: int = 0,
+        grace_rate: float = 0.0
+) -> float:
+    """Максимальная стоимость объекта при заданном первоначальном взносе (%) и целевом платеже."""
+    if not 0 <= down_payment_percent < 100:
+        raise ValueError('Первоначальный взнос должен быть от 0 до 100% (не включая).')
+    loan_amount = max_loan_amount(target_payment, loan_term_years, annual_rate, grace_years, grace_rate)
+    return loan_amount / (1 - down_payment_percent / 100)
+
+
+def required_down_payment(
+        object_cost: float,
+        target_payment: float,
+        loan_term_years: int,
+        annual_rate: float,
+        grace_years: int = 0,
+        grace_rate: float = 0.0
+) -> dict:
+    """
+    Минимальный первоначальный взнос, при котором платеж не превышает target_payment.
+    Возвращает словарь с суммой (amount) и процентом от стоимости (percent).
+    """
+    loan_amount = max_loan_amount(target_payment, loan_term_years, annual_rate, grace_years, grace_rate)
+    amount = max(object_cost - loan_amount, 0.0)
+    return {'amount': amount, 'percent': amount / object_cost * 100}
+
+
+def _annuity_factor_and_derivative(months, monthly_rate):
+    """Платеж на 1 рубль кредита и его производная по месячной ставке (ставка больше нуля)."""
+    discount = (1 + monthly_rate) ** -months
+    denominator = 1 - discount
+    factor = monthly_rate / denominator
+    derivative = (denominator - monthly_rate * months * discount / (1 + monthly_rate)) / denominator ** 2
+    return factor, derivative
+
+
+def required_rate(
+        loan_amount: float,
+        target_payment: float,
+        loan_term_years: int,
+        grace_years: int = 0,
+        grace_rate: float = 0.0,
+        tolerance: float = 1e-9,
+        max_iterations: int = 100
+) -> float:
+    """
+    Годовая ставка основного периода (%), при которой основной ежемесячный платеж равен target_payment.
+    Корень ищется методом Ньютона с защитой бисекцией на отрезке, где платеж заведомо меняет знак.
+    """
+    _, remaining_factor = _grace_factors(loan_term_years, grace_years, grace_rate)
+    remaining_loan = loan_amount * remaining_factor
+    months = (loan_term_years - max(grace_years, 0)) * 12
+    if remaining_loan <= 0:
+        raise ValueError('После льготного периода долг погашен, ставка не влияет на платеж.')
+    target_factor = target_payment / remaining_loan
+    if target_factor < 1 / months:
+        raise ValueError('Целевой платеж меньше платежа при нулевой ставке.')
+    if target_factor == 1 / months:
+        return 0.0
+
+    # Платеж на 1 рубль всегда больше месячной ставки, поэтому корень лежит в (0, target_factor]
+    low, high = 0.0, target_factor
+    # Начальное приближение: ставка, при которой проценты равны разнице с платежом при нулевой ставке
+    rate = min(max(target_factor - 1 / months, tolerance), high)
+    for _ in range(max_iterations):
+        factor, derivative = _annuity_factor_and_derivative(months, rate)
+        error = factor - target_factor
+        if error > 0:
+            high = rate
+        else:
+            low = rate
+        next_rate = rate - error / derivative
+        if not low < next_rate < high:
+            next_rate = (low + high) / 2
+        if abs(next_rate - rate) <= tolerance * max(rate, 1e-12):
+            rate = next_rate
+            break
+        rate = next_rate
+    return rate * 12 * 100
+
+
+def max_loan_amount_batch(target_payments, loan_term_years, annual_rates, grace_years=0, grace_rates=0.0) -> np.ndarray:
+    """Векторный вариант max_loan_amount() для сеток параметров (аргументы приводятся к общей форме)."""
+    target_payments, loan_term_years, annual_rates, grace_years, grace_rates = np.broadcast_arrays(
+        np.asarray(target_payments, dtype=np.float64),
+        np.asarray(loan_term_years, dtype=np.int64),
+        np.asarray(annual_rates, dtype=np.float64),
+        np.asarray(grace_years, dtype=np.int64),
+        np.asarray(grace_rates, dtype=np.float64),
+    )
+    has_grace_period = grace_years > 0
+    if np.any(has_grace_period & (grace_years >= loan_term_years)):
+        raise ValueError('Срок льготного периода должен быть меньше общего срока.')
+
+    grace_payments = np.where(has_grace_period, grace_years * 12, 0)
+    main_payments = loan_term_years * 12 - grace_payments
+    grace_monthly_rates = (grace_rates / 100) / 12
+    grace_factor = np.where(has_grace_period,
+                            calculate_annuity_batch(1.0, loan_term_years * 12, grace_monthly_rates), 0.0)
+    grace_growth = (1 + grace_monthly_rates) ** grace_payments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining_factor = np.where(
+            grace_monthly_rates == 0,
+            1.0 - grace_factor * grace_payments,
+            grace_growth - grace_factor * ((grace_growth - 1) / grace_monthly_rates)
+        )
+    remaining_factor = np.where(has_grace_period, np.maximum(remaining_factor, 0.0), 1.0)
+    main_factor = remaining_factor * calculate_annuity_batch(1.0, main_payments, (annual_rates / 100) / 12)
+    return target_payments / np.maximum(grace_factor, main_factor)
+
+
+def required_rate_batch(loan_amounts, target_payments, loan_term_years, tolerance: float = 1e-9,
+                        max_iterations: int = 100) -> np.ndarray:
+    """
+    Векторный вариант required_rate() без льготного периода.
+    Для недостижимых платежей (меньше платежа при нулевой ставке) возвращает NaN.
+    """
+    loan_amounts, target_payments, loan_term_years = np.broadcast_arrays(
+        np.asarray(loan_amounts, dtype=np.float64),
+        np.asarray(target_payments, dtype=np.float64),
+        np.asarray(loan_term_years, dtype=np.int64),
+    )
+    shape = loan_amounts.shape
+    months = loan_term_years.ravel() * 12
+    target_factor = (target_payments / loan_amounts).ravel()
+    feasible = target_factor > 1 / months
+
+    low = np.zeros_like(target_factor)
+    high = np.where(feasible, target_factor, 1.0)
+    rate = np.clip(target_factor - 1 / months, tolerance, high)
+    active = feasible.copy()
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        factor, derivative = _annuity_factor_and_derivative(months[active], rate[active])
+        error = factor - target_factor[active]
+        high[active] = np.where(error > 0, rate[active], high[active])
+        low[active] = np.where(error > 0, low[active], rate[active])
+        next_rate = rate[active] - error / derivative
+        bisect = (next_rate <= low[active]) | (next_rate >= high[active])
+        next_rate = np.where(bisect, (low[active] + high[active]) / 2, next_rate)
+        converged = np.abs(next_rate - rate[active]) <= tolerance * np.maximum(rate[active], 1e-12)
+        rate[active] = next_rate
+        active[active] = ~converged
+
+    annual_rates = np.where(target_factor == 1 / months, 0.0, rate * 12 * 100)
+    return np.where(target_factor < 1 / months, np.nan, annual_rates).reshape(shape)
@@ -0,0 +1,200 @@
+from datetime import date
+from typing import TYPE_CHECKING, Iterator, NamedTuple
+
+from dates import add_months, first_day, parse_month
+from mortgage_calculator import compute_mortgage
+from tranche_mortgage_calculator import calculate_mortgage as calculate_tranche_mortgage
+
+if TYPE_CHECKING:
+    import numpy as np  # Загружается при первом построении графика массивами
+
+
+class ScheduleRow(NamedTuple):
+    """Строка графика платежей."""
+    number: int  # Номер платежа
+    date: date  # Дата платежа
+    payment: float  # Сумма платежа, руб.
+    interest: float  # Проценты, руб.
+    principal: float  # Погашение тела кредита, руб.
+    balance: float  # Остаток долга после платежа, руб.
+
+
+def mortgage_segments(params: dict) -> list[tuple[float, float, float, int]]:
+    """
+    Возвращает участки графика ипотеки (льготный период, если есть, и основной) в виде кортежей
+    (остаток на начало, месячная ставка, платеж, число платежей).
+    Внутри участка платеж постоянный, поэтому график и пересчеты строятся по участкам
+    (iter_mortgage_schedule(), prepayment.PrepaymentSchedule). Параметры те же, что у compute_mortgage().
+    """
+    result = compute_mortgage(params)
+    segments = []
+    if result.grace_payments:
+        segments.append((result.loan_amount, (params['grace_rate'] / 100) / 12,
+                         result.grace_monthly_payment, result.grace_payments))
+    if result.main_payments:
+        segments.append((result.remaining_loan, (params['annual_rate'] / 100) / 12,
+                         result.main_monthly_payment, result.main_payments))
+    return segments
+
+
+def iter_mortgage_schedule(params: dict) -> Iterator[ScheduleRow]:
+    """
+    Лениво формирует помесячный график платежей по ипотеке.
+    Параметры те же, что у compute_mortgage(). Основной период начинается с остатка
+    remaining_loan, последний платеж закрывает долг полностью.
+    """
+    start_date = params['start_date']
+    segments = mortgage_segments(params)
+    number = 0
+    for segment_idx, (balance, monthly_rate, payment, months) in enumerate(segments):
+        is_last_segment = segment_idx == len(segments) - 1
+        for month in range(1, months + 1):
+            number += 1
+            interest = balance * monthly_rate
+            if is_last_segment and month == months:
+                principal = balance
+            else:
+                principal = payment - interest
+            balance -= principal
+            yield ScheduleRow(number, add_months(start_date, number), interest + principal,
+                              interest, principal, balance)
+
+
+def _month_dates(start_date: date, months: 'np.ndarray') -> 'np.ndarray':
+    """Даты start_date + months месяцев с переносом на последний день короткого месяца."""
+    import numpy as np
+    month_start = np.datetime64(start_date, 'M') + months
+    days_in_month = (month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')
+    day_offset = np.minimum(start_date.day, days_in_month.astype(np.int64)) - 1
+    return month_start.astype('datetime64[D]') + day_offset
+
+
+def _segment_balances(balance: float, monthly_rate: float, payment: float, months: int) -> 'np.ndarray':
+    """Остатки долга на начало участка и после каждого из months платежей."""
+    import numpy as np
+    steps = np.arange(months + 1)
+    if monthly_rate == 0:
+        return balance - payment * steps
+    growth = (1 + monthly_rate) ** steps
+    return balance * growth - payment * ((growth - 1) / monthly_rate)
+
+
+def mortgage_schedule_columns(params: dict) -> dict:
+    """
+    Формирует график платежей по ипотеке в виде словаря массивов NumPy
+    (number, date, payment, interest, principal, balance) для массовой выгрузки.
+    Значения совпадают с iter_mortgage_schedule() с точностью до погрешности вычислений.
+    """
+    import numpy as np
+
+    segments = mortgage_segments(params)
+    interest_parts = []
+    principal_parts = []
+    balance_parts = []
+    for balance, monthly_rate, payment, months in segments:
+        balances = _segment_balances(balance, monthly_rate, payment, months)
+        interest = balances[:-1] * monthly_rate
+        interest_parts.append(interest)
+        principal_parts.append(payment - interest)
+        balance_parts.append(balances[1:])
+
+    interest = np.concatenate(interest_parts) if segments else np.empty(0)
+    principal = np.concatenate(principal_parts) if segments else np.empty(0)
+    balance = np.concatenate(balance_parts) if segments else np.empty(0)
+    if len(balance):
+        # Последний платеж закрывает долг полностью
+        principal[-1] += balance[-1]
+        balance[-1] = 0.0
+
+    number = np.arange(1, len(balance) + 1)
+    return {
+        'number': number,
+        'date': _month_dates(params['start_date'], number),
+        'payment': interest + principal,
+        'interest': interest,
+        'principal': principal,
+        'balance': balance,
+    }
+
+
+def _tranche_streams(params: dict) -> tuple[date, int, list[tuple[int, float, float, float]]]:
+    """
+    Возвращает дату первого транша, срок кредита в месяцах и список траншей в виде кортежей
+    (месяц выдачи от начала кредита, сумма, месячная ставка, платеж).
+    """
+    results = calculate_tranche_mortgage(params)
+    sorted_tranches = sorted(params['tranches'], key=lambda x: parse_month(x['date']))
+    start_date = first_day(parse_month(results['tranches'][0]['date']))
+    loan_term_months = params['loan_term_years'] * 12
+
+    streams = []
+    issued = 0.0
+    for tranche, tranche_result in zip(sorted_tranches, results['tranches']):
+        amount = tranche_result['total_loan'] - issued
+        issued = tranche_result['total_loan']
+        streams.append((loan_term_months - tranche_result['num_payments'], amount,
+                        tranche['rate'] / 100 / 12, tranche_result['monthly_payment']))
+    return start_date, loan_term_months, streams
+
+
+def iter_tranche_schedule(params: dict) -> Iterator[ScheduleRow]:
+    """
+    Лениво формирует помесячный график платежей по ипотеке с траншами.
+    Параметры те же, что у calculate_mortgage() из tranche_mortgage_calculator.
+    Каждая строка суммирует платежи всех выданных к этому месяцу траншей,
+    дата платежа - первое число месяца.
+    """
+    start_date, loan_term_months, streams = _tranche_streams(params)
+    balances = [0.0] * len(streams)
+    for number in range(1, loan_term_months + 1):
+        total_interest = 0.0
+        total_principal = 0.0
+        for idx, (issue_month, amount, monthly_rate, payment) in enumerate(streams):
+            if issue_month >= number:
+                continue
+            if issue_month == number - 1:
+                balances[idx] = amount
+            interest = balances[idx] * monthly_rate
+            principal = balances[idx] if number == loan_term_months else payment - interest
+            balances[idx] -= principal
+            total_interest += interest
+            total_principal += principal
+        yield ScheduleRow(number, add_months(start_date, number), total_interest + total_principal,
+                          total_interest, total_principal, sum(balances))
+
+
+def tranche_schedule_columns(params: dict) -> dict:
+    """
+    Формирует график платежей по ипотеке с траншами в виде словаря массивов NumPy
+    (number, date, payment, interest, principal, balance) для массовой выгрузки.
+    """
+    import numpy as np
+
+    start_date, loan_term_months, streams = _tranche_streams(params)
+    interest = np.zeros(loan_term_months)
+    principal = np.zeros(loan_term_months)
+    balance = np.zeros(loan_term_months)
+    for issue_month, amount, monthly_rate, payment in streams:
+        months = loan_term_months - issue_month
+        if months == 0:
+            continue
+        balances = _segment_balances(amount, monthly_rate, payment, months)
+        tranche_interest = balances[:-1] * monthly_rate
+        tranche_principal = payment - tranche_interest
+        tranche_balance = balances[1:].copy()
+        # Последний платеж закрывает долг по траншу полностью
+        tranche_principal[-1] += tranche_balance[-1]
+        tranche_balance[-1] = 0.0
+        interest[issue_month:] += tranche_interest
+        principal[issue_month:] += tranche_principal
+        balance[issue_month:] += tranche_balance
+
+    number = np.arange(1, loan_term_months + 1)
+    return {
+        'number': number,
+        'date': _month_dates(start_date, number),
+        'payment': interest + principal,
+        'interest': interest,
+        'principal': principal,
+        'balance': balance,
+    }
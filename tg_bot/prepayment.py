@@ -0,0 +1,232 @@
+import math
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Iterator, NamedTuple
+
+from dates import add_months
+from mortgage_calculator import calculate_annuity
+from payment_schedule import ScheduleRow, mortgage_segments
+
+# Способы пересчета графика после досрочного погашения
+PREPAYMENT_MODES = {
+    'term': 'сокращение срока',  # Платежи сохраняются, кредит заканчивается раньше
+    'payment': 'уменьшение платежа',  # Дата окончания сохраняется, платежи уменьшаются
+}
+
+
+class Segment(NamedTuple):
+    """Участок графика с постоянным платежом."""
+    first: int  # Номер первого платежа участка
+    balance: float  # Остаток долга перед первым платежом, руб.
+    rate: float  # Месячная ставка
+    payment: float  # Ежемесячный платеж, руб.
+    count: int  # Число платежей
+
+
+def _balance_after(balance: float, rate: float, payment: float, months: int) -> float:
+    """Остаток долга после months платежей в замкнутой форме (может быть отрицательным при переплате)."""
+    if rate == 0:
+        return balance - payment * months
+    growth = (1 + rate) ** months
+    return balance * growth - payment * ((growth - 1) / rate)
+
+
+def _months_to_repay(balance: float, rate: float, payment: float) -> int:
+    """Число платежей payment, за которое гасится долг balance (последний платеж может быть меньше)."""
+    if rate == 0:
+        months = balance / payment
+    else:
+        months = -math.log(1 - balance * rate / payment) / math.log(1 + rate)
+    return max(math.ceil(months - 1e-9), 1)
+
+
+def _keep_payment(first: int, balance: float, rest: list[tuple[float, float, int]]) -> list[Segment]:
+    """
+    Пересчет хвоста графика с сохранением платежей: участки rest (ставка, платеж, число платежей)
+    проходятся по порядку, пока долг не будет погашен.
+    """
+    segments = []
+    for idx, (rate, payment, count) in enumerate(rest):
+        end_balance = _balance_after(balance, rate, payment, count)
+        if end_balance <= 1e-9 or idx == len(rest) - 1:
+            months = min(_months_to_repay(balance, rate, payment), count)
+            segments.append(Segment(first, balance, rate, payment, months))
+            break
+        segments.append(Segment(first, balance, rate, payment, count))
+        first += count
+        balance = end_balance
+    return segments
+
+
+def _keep_term(first: int, balance: float, rest: list[tuple[float, float, int]]) -> list[Segment]:
+    """
+    Пересчет хвоста графика с сохранением даты окончания: платеж каждого участка - аннуитет
+    на остаток долга до конца срока по ставке участка, как в compute_mortgage().
+    """
+    segments = []
+    remaining = sum(count for _, _, count in rest)
+    for rate, _, count in rest:
+        payment = calculate_annuity(balance, remaining, rate)
+        segments.append(Segment(first, balance, rate, payment, count))
+        first += count
+        remaining -= count
+        balance = _balance_after(balance, rate, payment, count)
+    return segments
+
+
+class PrepaymentSchedule:
+    """
+    График платежей по ипотеке с досрочными погашениями.
+    График хранится как список участков с постоянным платежом; после каждого события сохраняется
+    контрольная точка, поэтому добавление погашения пересчитывает только участки после его месяца,
+    а не весь график. Параметры те же, что у compute_mortgage().
+    """
+
+    def __init__(self, params: dict):
+        self.start_date = params['start_date']
+        segments = []
+        first = 1
+        for balance, rate, payment, count in mortgage_segments(params):
+            segments.append(Segment(first, balance, rate, payment, count))
+            first += count
+        self._base_overpayment = _overpayment(segments, ())
+        self._events = []  # Кортежи (месяц, сумма, способ) по возрастанию месяца
+        self._states = [(tuple(segments), ())]  # Участки и внесенные суммы после первых i событий
+
+    @property
+    def segments(self) -> tuple:
+        return self._states[-1][0]
+
+    @property
+    def prepayments(self) -> tuple:
+        """Фактически внесенные досрочные платежи: кортежи (номер платежа, сумма)."""
+        return self._states[-1][1]
+
+    def add(self, month: int, amount: float, mode: str = 'term') -> None:
+        """
+        Добавляет досрочное погашение amount руб. вместе с платежом номер month.
+        mode: 'term' - сократить срок, 'payment' - уменьшить платеж.
+        Сумма больше остатка долга закрывает кредит.
+        """
+        if mode not in PREPAYMENT_MODES:
+            raise ValueError(f'Неизвестный способ пересчета "{mode}". Допустимо: {", ".join(PREPAYMENT_MODES)}.')
+        if amount <= 0:
+            raise ValueError('Сумма досрочного погашения должна быть больше нуля.')
+        if month < 1:
+            raise ValueError('Номер платежа должен быть больше нуля.')
+        position = bisect_right(self._events, month, key=itemgetter(0))
+        self._events.insert(position, (month, amount, mode))
+        try:
+            self._replay(position)
+        except ValueError:
+            del self._events[position]
+            self._replay(position)
+            raise
+
+    def remove(self, month: int) -> None:
+        """Удаляет все досрочные погашения в платеж номер month."""
+        position = bisect_left(self._events, month, key=itemgetter(0))
+        self._events = [event for event in self._events if event[0] != month]
+        self._replay(position)
+
+    def _replay(self, position: int) -> None:
+        """Состояния до события position остаются в силе, пересчитываются только последующие."""
+        del self._states[position + 1:]
+        for month, amount, mode in self._events[position:]:
+            self._states.append(_apply(*self._states[-1], month, amount, mode))
+
+    def rows(self) -> Iterator[ScheduleRow]:
+        """Лениво формирует помесячный график; досрочный платеж входит в строку своего месяца."""
+        segments = self.segments
+        prepaid = {}
+        for month, amount in self.prepayments:
+            prepaid[month] = prepaid.get(month, 0.0) + amount
+        last_number = segments[-1].first + segments[-1].count - 1 if segments else 0
+        for segment in segments:
+            balance = segment.balance
+            for number in range(segment.first, segment.first + segment.count):
+                interest = balance * segment.rate
+                principal = min(segment.payment - interest, balance)
+                balance -= principal
+                extra = prepaid.get(number, 0.0)
+                if number == last_number:
+                    # Последний платеж закрывает долг полностью
+                    if extra:
+                        extra = balance
+                    else:
+                        principal += balance
+                    balance = 0.0
+                else:
+                    balance -= extra
+                yield ScheduleRow(number, add_months(self.start_date, number),
+                                  interest + principal + extra, interest, principal + extra, balance)
+
+    def summary(self) -> dict:
+        """
+        Итоги графика без построения строк:
+        - payments: число платежей, final_end_date: дата последнего платежа
+        - periods: участки с постоянным платежом (номера платежей from/to и monthly_payment)
+        - total_prepaid: сумма досрочных погашений
+        - overpayment: переплата по процентам, saved_interest: экономия относительно графика без погашений
+        """
+        segments = self.segments
+        payments = segments[-1].first + segments[-1].count - 1 if segments else 0
+        overpayment = _overpayment(segments, self.prepayments)
+        return {
+            'payments': payments,
+            'final_end_date': add_months(self.start_date, payments),
+            'periods': [
+                {'from': segment.first, 'to': segment.first + segment.count - 1, 'monthly_payment': segment.payment}
+                for segment in segments
+            ],
+            'total_prepaid': sum(amount for _, amount in self.prepayments),
+            'overpayment': overpayment,
+            'saved_interest': self._base_overpayment - overpayment,
+        }
+
+
+def _overpayment(segments, prepayments) -> float:
+    """Сумма процентов: все выплаты, включая досрочные, минус сумма кредита."""
+    if not segments:
+        return 0.0
+    paid = sum(segment.payment * segment.count for segment in segments)
+    paid += sum(amount for _, amount in prepayments)
+    last = segments[-1]
+    if not prepayments or prepayments[-1][0] != last.first + last.count - 1:
+        # Последний платеж отличается от планового на остаток долга после него
+        paid += _balance_after(last.balance, last.rate, last.payment, last.count)
+    return paid - segments[0].balance
+
+
+def _apply(segments: tuple, prepayments: tuple, month: int, amount: float, mode: str) -> tuple[tuple, tuple]:
+    """Применяет одно досрочное погашение к состоянию графика и возвращает новое состояние."""
+    firsts = [segment.first for segment in segments]
+    # Участок, в который попадает платеж, следующий за погашением
+    idx = bisect_right(firsts, month + 1) - 1
+    if idx < 0 or not segments or month + 1 > segments[idx].first + segments[idx].count - 1:
+        raise ValueError(f'Платеж номер {month} - последний или выходит за срок кредита.')
+    segment = segments[idx]
+    done = month + 1 - segment.first  # Платежей участка до погашения включительно
+    balance = _balance_after(segment.balance, segment.rate, segment.payment, done)
+
+    head = segments[:idx]
+    if done:
+        head += (segment._replace(count=done),)
+    if amount >= balance:
+        return head, prepayments + ((month, balance),)
+
+    rest = [(segment.rate, segment.payment, segment.count - done)]
+    rest += [(other.rate, other.payment, other.count) for other in segments[idx + 1:]]
+    rebuild = _keep_payment if mode == 'term' else _keep_term
+    return head + tuple(rebuild(month + 1, balance - amount, rest)), prepayments + ((month, amount),)
+
+
+def simulate_prepayments(params: dict, events: list[dict]) -> PrepaymentSchedule:
+    """
+    Строит график с досрочными погашениями. events - список словарей с ключами
+    month (номер платежа), amount (сумма, руб.) и mode ('term' или 'payment', по умолчанию 'term').
+    """
+    schedule = PrepaymentSchedule(params)
+    for event in sorted(events, key=lambda x: x['month']):
+        schedule.add(event['month'], event['amount'], event.get('mode', 'term'))
+    return schedule
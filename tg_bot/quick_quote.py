@@ -0,0 +1,57 @@
+"""
+Разбор однострочного запроса на расчет ипотеки для inline-режима бота, например "12000000 20% 30y 6%":
+стоимость объекта (можно 12млн, 12m, 12 000 000), первоначальный взнос и ставка в процентах
+(первое и второе число со знаком %), срок в годах (30y, 30г, 30л, 30 лет).
+Порядок частей, кроме взноса и ставки, не важен. Дата первоначального взноса - сегодня, без льготного периода.
+"""
+import re
+from datetime import date
+
+from schema import MORTGAGE_SCHEMA
+
+QUICK_QUOTE_HELP = 'Формат: стоимость взнос% срок ставка%, например: 12000000 20% 30y 6%'
+
+_TOKEN = re.compile(
+    r'\s*(?P<number>(?:\d{1,3}(?:[ \u00a0]\d{3})+|\d+)(?:[.,]\d+)?)\s*'
+    # После % следующая часть может идти без пробела (20%30y); после числа и буквенных единиц - нет
+    r'(?P<unit>%|(?:млн|m|м|тыс|k|к|лет|года|год|y|г|л)(?![^\W_]))?(?(unit)|(?![^\W_%]))',
+    re.IGNORECASE
+)
+_MULTIPLIERS = {'млн': 1_000_000, 'm': 1_000_000, 'м': 1_000_000, 'тыс': 1_000, 'k': 1_000, 'к': 1_000}
+_YEAR_UNITS = {'лет', 'года', 'год', 'y', 'г', 'л'}
+
+
+def parse_quick_quote(text: str, today: date | None = None) -> dict:
+    """
+    Разбирает строку запроса и возвращает параметры для compute_mortgage().
+    При ошибке разбора или проверки бросает ValueError с описанием.
+    """
+    record = {'start_date': today or date.today()}
+    percents = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f'Не удалось разобрать "{text[position:].split()[0]}". {QUICK_QUOTE_HELP}')
+        position = match.end()
+        number = float(re.sub(r'[ \u00a0]', '', match['number']).replace(',', '.'))
+        unit = (match['unit'] or '').lower()
+        if unit == '%':
+            percents.append(number)
+        elif unit in _YEAR_UNITS:
+            if 'loan_term_years' in record:
+                raise ValueError(f'Срок кредита указан дважды. {QUICK_QUOTE_HELP}')
+            record['loan_term_years'] = number
+        else:
+            if 'object_cost' in record:
+                raise ValueError(f'Стоимость объекта указана дважды. {QUICK_QUOTE_HELP}')
+            record['object_cost'] = number * _MULTIPLIERS.get(unit, 1)
+    if len(percents) != 2:
+        raise ValueError(f'Укажите первоначальный взнос и ставку в процентах. {QUICK_QUOTE_HELP}')
+    record['down_payment_percent'], record['annual_rate'] = percents
+
+    values, errors = MORTGAGE_SCHEMA.validate(record)
+    if errors:
+        raise ValueError(errors[0][1])
+    return values
@@ -0,0 +1,190 @@
+import copy
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import metrics
+from dates import format_month, parse_month
+from installment_calculator_limits import calculate_installment
+from mortgage_calculator import MortgageResult, compute_mortgage
+from tranche_mortgage_calculator import calculate_mortgage as calculate_tranche_mortgage
+
+
+class QuoteCache:
+    """
+    Ограниченный по размеру LRU-кэш результатов расчетов.
+    Безопасен для использования из нескольких потоков, ведет счетчики попаданий, промахов и вытеснений.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: tuple, compute):
+        """Возвращает результат из кэша или вычисляет его через compute() и сохраняет."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc('quote_cache_requests_total', result='hit')
+                return self._entries[key]
+            self.misses += 1
+        metrics.inc('quote_cache_requests_total', result='miss')
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        """Возвращает текущие показатели кэша."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счетчики."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def _money(value) -> float:
+    """Сумма в рублях, округленная до копеек."""
+    return round(float(value), 2)
+
+
+def _number(value) -> float:
+    """Процент или ставка, округленные до 6 знаков."""
+    return round(float(value), 6)
+
+
+def _whole(value) -> int:
+    """Целое число (срок, количество траншей); дробное значение не усекается, а отклоняется."""
+    if isinstance(value, bool) or int(value) != value:
+        raise ValueError(f'Ожидалось целое число, получено {value!r}.')
+    return int(value)
+
+
+def _date(value: date | datetime) -> date:
+    """Дата без времени."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def mortgage_params(params: dict) -> dict:
+    """
+    Параметры compute_mortgage() в каноническом виде: суммы до копеек, проценты до 6 знаков, даты без времени.
+    Ключ кэша строится по ним же, и расчет ведется по ним, поэтому результат из кэша совпадает с прямым расчетом.
+    """
+    grace_years = _whole(params.get('grace_years', 0))
+    return {
+        'object_cost': _money(params['object_cost']),
+        'down_payment_percent': _number(params['down_payment_percent']),
+        'start_date': _date(params['start_date']),
+        'loan_term_years': _whole(params['loan_term_years']),
+        'annual_rate': _number(params['annual_rate']),
+        'grace_years': grace_years,
+        'grace_rate': _number(params.get('grace_rate', 0.0)) if grace_years > 0 else 0.0,
+    }
+
+
+def tranche_params(params: dict) -> dict:
+    """
+    Параметры расчета ипотеки с траншами в каноническом виде.
+    Транши упорядочиваются по дате (ГГГГ-ММ), процент последнего транша не учитывается - он равен остатку.
+    """
+    tranches = sorted(params['tranches'], key=lambda x: parse_month(x['date']))
+    last_idx = len(tranches) - 1
+    return {
+        'cost': _money(params['cost']),
+        'markup': _number(params['markup']),
+        'initial_percent': _number(params['initial_percent']),
+        'loan_term_years': _whole(params['loan_term_years']),
+        'num_tranches': _whole(params['num_tranches']),
+        'tranches': [
+            {'date': format_month(parse_month(tranche['date'])),
+             'percent': _number(tranche['percent']) if idx < last_idx else None,
+             'rate': _number(tranche['rate'])}
+            for idx, tranche in enumerate(tranches)
+        ],
+    }
+
+
+def installment_params(params: dict) -> dict:
+    """Параметры расчета рассрочки в каноническом виде."""
+    return {
+        'cost': _money(params['cost']),
+        'markup': _number(params['markup']),
+        'down_payment': _number(params['down_payment']),
+        'ddu_date': _date(params['ddu_date']),
+        'commissioning_date': _date(params['commissioning_date']),
+        'key_handover_date': _date(params['key_handover_date']),
+    }
+
+
+def _key(kind: str, canonical: dict) -> tuple:
+    """Ключ кэша по каноническим параметрам."""
+    return (kind,) + tuple(
+        tuple(tuple(item.values()) for item in value) if isinstance(value, list) else value
+        for value in canonical.values()
+    )
+
+
+def mortgage_key(params: dict) -> tuple:
+    """Ключ кэша для параметров compute_mortgage()."""
+    return _key('mortgage', mortgage_params(params))
+
+
+def tranche_key(params: dict) -> tuple:
+    """Ключ кэша для параметров расчета ипотеки с траншами."""
+    return _key('tranche', tranche_params(params))
+
+
+def installment_key(params: dict) -> tuple:
+    """Ключ кэша для параметров расчета рассрочки."""
+    return _key('installment', installment_params(params))
+
+
+quote_cache = QuoteCache()
+
+
+def _run_engine(engine: str, compute, params: dict):
+    """Выполняет расчет с замером длительности по движку."""
+    with metrics.timer('engine_seconds', engine=engine):
+        return compute(params)
+
+
+def _cached(kind: str, canonical: dict, compute):
+    """Расчет по каноническим параметрам через кэш."""
+    return quote_cache.get_or_compute(_key(kind, canonical), lambda: _run_engine(kind, compute, canonical))
+
+
+def cached_compute_mortgage(params: dict) -> MortgageResult:
+    """compute_mortgage() с кэшированием результата. Дробный срок отклоняется с ValueError."""
+    return _cached('mortgage', mortgage_params(params), compute_mortgage)
+
+
+def cached_tranche_mortgage(params: dict) -> dict:
+    """Расчет ипотеки с траншами с кэшированием. Возвращает копию результата."""
+    return copy.deepcopy(_cached('tranche', tranche_params(params), calculate_tranche_mortgage))
+
+
+def cached_installment(params: dict) -> dict:
+    """Расчет рассрочки с кэшированием. Возвращает копию результата."""
+    return copy.deepcopy(_cached('installment', installment_params(params), calculate_installment))
@@ -0,0 +1,390 @@
+"""
+Декларативные схемы параметров расчетов: типы, границы и правила, связывающие несколько полей.
+Схема один раз компилирует для каждого поля функцию проверки, которая возвращает значение или
+текст ошибки без исключений, поэтому запись проверяется целиком и сообщаются все ошибки сразу.
+Одни и те же схемы используются в консольных калькуляторах, пакетном расчете и боте.
+"""
+import functools
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, NamedTuple
+
+from dates import format_month, month_of, parse_date, parse_month
+
+# Наибольший срок кредита и льготного периода, лет
+MAX_TERM_YEARS = 50
+# Наибольшая стоимость объекта, руб., и наибольшие ставка и удорожание, %: за этими пределами
+# расчеты переполняются (OverflowError, inf) и ошибка ввода становится ошибкой расчета
+MAX_COST = 10 ** 12
+MAX_RATE = 100
+MAX_MARKUP = 100
+# Целые поля в пакетном расчете приводятся к int64; значения вне его диапазона считаются ошибкой
+_INT64_LIMIT = 2.0 ** 63
+
+# Виды полей и сообщения о неверном формате значения
+_INVALID = {
+    'float': 'Некорректное значение "{title}". Введите число.',
+    'int': 'Некорректное значение "{title}". Введите целое число.',
+    'date': 'Неверный формат даты "{title}". Используйте ДД.ММ.ГГГГ.',
+    'month': 'Неверный формат даты "{title}". Используйте ГГГГ-ММ или 01.ММ.ГГГГ.',
+    'str': 'Некорректное значение "{title}".',
+    'list': 'Некорректное значение "{title}". Ожидается список.',
+}
+_NUMERIC = ('float', 'int')
+
+
+@dataclass(frozen=True, slots=True)
+class Field:
+    """Описание параметра."""
+    name: str  # Ключ в словаре параметров
+    title: str  # Название для сообщений об ошибках
+    kind: str = 'float'  # float, int, date (ДД.ММ.ГГГГ), month (строка ГГГГ-ММ), str, list
+    greater_than: float | None = None  # Значение должно быть строго больше
+    minimum: float | None = None
+    maximum: float | None = None
+    required: bool = True
+    default: object = None  # Значение необязательного параметра, если он не указан
+    items: 'Schema | None' = None  # Схема элементов списка для kind='list'
+
+
+class Rule(NamedTuple):
+    """
+    Правило для нескольких полей. check получает словарь значений и возвращает истину, если правило
+    выполнено; проверяется, только когда все поля fields указаны и прошли проверку.
+    Правила для числовых полей записываются операциями &, |, ~ и сравнениями,
+    чтобы работать и со скалярами, и с массивами NumPy в Schema.check_columns().
+    """
+    fields: tuple[str, ...]
+    check: Callable[[dict], bool]
+    message: str
+
+
+class SchemaError(ValueError):
+    """
+    Ошибки проверки: errors - список кортежей (номер записи, поле, сообщение).
+    При numbered=False (ошибки одной записи, Schema.check()) текст ошибки без номеров записей.
+    """
+
+    def __init__(self, errors: list[tuple[int, str, str]], numbered: bool = True):
+        super().__init__(errors, numbered)
+        self.errors = errors
+        self.numbered = numbered
+
+    def __str__(self) -> str:
+        if not self.numbered:
+            return '; '.join(message for _, _, message in self.errors)
+        return '; '.join(f'запись {index + 1}: {message}' for index, _, message in self.errors)
+
+
+def _parse_float(value):
+    if value.__class__ is bool:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _parse_int(value):
+    if value.__class__ is int:
+        return value if -_INT64_LIMIT < value < _INT64_LIMIT else None
+    number = _parse_float(value)
+    if number is None or not number.is_integer() or abs(number) >= _INT64_LIMIT:
+        return None
+    return int(number)
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return parse_date(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _parse_month(value):
+    """
+    Строка ГГГГ-ММ, приведенная к виду с ведущим нулем: такие строки сравниваются как даты.
+    Расчеты по месяцам (транши) выдают деньги первого числа месяца, поэтому дата (объект date
+    или строка ДД.ММ.ГГГГ) принимается, только если это первое число, и заменяется своим месяцем:
+    другой день молча потерялся бы.
+    """
+    try:
+        if not isinstance(value, date):
+            value = value.strip()
+            if '.' not in value:
+                index = parse_month(value)
+                return value if len(value) == 7 else format_month(index)
+            value = parse_date(value)
+    except (AttributeError, ValueError):
+        return None
+    return format_month(month_of(value)) if value.day == 1 else None
+
+
+def _parse_str(value):
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+_PARSERS = {'float': _parse_float, 'int': _parse_int, 'date': _parse_date, 'month': _parse_month, 'str': _parse_str}
+
+
+def _format_number(value: float) -> str:
+    return f'{value:.15g}'
+
+
+def _compile_field(field: Field) -> Callable[[object], tuple[object, str | None]]:
+    """Функция проверки поля: возвращает (значение, None) или (None, сообщение об ошибке)."""
+    if field.kind not in _INVALID:
+        raise ValueError(f'Неизвестный вид поля "{field.kind}" у параметра "{field.name}".')
+    invalid = _INVALID[field.kind].format(title=field.title)
+    if field.kind == 'list':
+        # Элементы проверяются схемой items в Schema.validate()
+        return lambda value: ((value, None) if isinstance(value, list) and all(isinstance(item, dict) for item in value)
+                              else (None, invalid))
+
+    parse = _PARSERS[field.kind]
+    above, lower, upper = field.greater_than, field.minimum, field.maximum
+    if above is not None:
+        above_message = (f'Параметр "{field.title}" должен быть больше '
+                         f'{"нуля" if above == 0 else _format_number(above)}.')
+    if lower is not None and upper is not None:
+        bounds_message = (f'Параметр "{field.title}" должен находиться в диапазоне '
+                          f'от {_format_number(lower)} до {_format_number(upper)}.')
+    elif lower is not None:
+        bounds_message = f'Параметр "{field.title}" должен быть не меньше {_format_number(lower)}.'
+    elif upper is not None:
+        bounds_message = f'Параметр "{field.title}" должен быть не больше {_format_number(upper)}.'
+
+    def validate(value):
+        value = parse(value)
+        if value is None:
+            return None, invalid
+        if above is not None and value <= above:
+            return None, above_message
+        if (lower is not None and value < lower) or (upper is not None and value > upper):
+            return None, bounds_message
+        return value, None
+    return validate
+
+
+class Schema:
+    """Набор полей и правил, скомпилированный в функции проверки."""
+
+    def __init__(self, fields: list[Field], rules: tuple[Rule, ...] = ()):
+        self.fields = {field.name: field for field in fields}
+        self.rules = rules
+        self._validators = {field.name: _compile_field(field) for field in fields}
+        self._plan = [
+            (field.name, field.title, field.required, field.default, self._validators[field.name], field.items)
+            for field in fields
+        ]
+        self._field_rules = {name: [rule for rule in rules if name in rule.fields] for name in self.fields}
+
+    def validate(self, record: dict) -> tuple[dict, list[tuple[str, str]]]:
+        """
+        Проверяет запись целиком. Возвращает словарь проверенных значений полей схемы
+        и список ошибок (поле, сообщение); при ошибках значения неполные.
+        """
+        values = {}
+        errors = []
+        for name, title, required, default, validate, items in self._plan:
+            value = record.get(name)
+            if value is None or value == '':
+                if required:
+                    errors.append((name, f'Не указан параметр "{title}".'))
+                elif default is not None:
+                    values[name] = default
+                continue
+            value, error = validate(value)
+            if error is not None:
+                errors.append((name, error))
+                continue
+            if items is not None:
+                value, item_errors = items.validate_many(value)
+                if item_errors:
+                    errors.extend((name, f'{title}, элемент {index + 1}: {message}')
+                                  for index, _, message in item_errors)
+                    continue
+            values[name] = value
+        for rule in self.rules:
+            if all(name in values for name in rule.fields) and not rule.check(values):
+                errors.append((rule.fields[0], rule.message))
+        return values, errors
+
+    def validate_many(self, records: list[dict]) -> tuple[list[dict], list[tuple[int, str, str]]]:
+        """Проверяет список записей. Возвращает значения всех записей и ошибки (номер записи, поле, сообщение)."""
+        results = []
+        errors = []
+        for index, record in enumerate(records):
+            values, record_errors = self.validate(record)
+            results.append(values)
+            if record_errors:
+                errors.extend((index, name, message) for name, message in record_errors)
+        return results, errors
+
+    def check(self, record: dict) -> dict:
+        """Проверенные значения записи; при ошибках исключение SchemaError со всеми ошибками."""
+        values, errors = self.validate(record)
+        if errors:
+            raise SchemaError([(0, name, message) for name, message in errors], numbered=False)
+        return values
+
+    def check_many(self, records: list[dict]) -> list[dict]:
+        """Проверенные значения всех записей; при ошибках исключение SchemaError со всеми ошибками."""
+        results, errors = self.validate_many(records)
+        if errors:
+            raise SchemaError(errors)
+        return results
+
+    def check_columns(self, records: list[dict], names: tuple[str, ...]) -> dict:
+        """
+        Векторная проверка числовых полей names для пакетного расчета.
+        Возвращает словарь массивов NumPy (целые поля - int64). Записи с ошибками находятся
+        масками по всем записям сразу и только они проверяются по одной ради текста сообщений.
+        """
+        import numpy as np
+
+        columns = {}
+        bad = np.zeros(len(records), dtype=bool)
+        for name in names:
+            field = self.fields[name]
+            if field.kind not in _NUMERIC:
+                raise ValueError(f'Поле "{name}" не числовое и не проверяется векторно.')
+            raw = [record.get(name) for record in records]
+            if not field.required:
+                default = math.nan if field.default is None else field.default
+                raw = [default if value is None or value == '' else value for value in raw]
+            try:
+                column = np.array(raw, dtype=np.float64)
+            except (TypeError, ValueError):
+                parsed = (_parse_float(value) for value in raw)
+                column = np.fromiter((math.nan if value is None else value for value in parsed), np.float64, len(raw))
+            # float() и NumPy принимают True как 1, а validate() логические значения отклоняет
+            is_bool = np.fromiter((value.__class__ is bool for value in raw), dtype=bool, count=len(raw))
+            mask = ~np.isfinite(column) | is_bool
+            if field.kind == 'int':
+                mask |= (column != np.floor(column)) | (np.abs(column) >= _INT64_LIMIT)
+            with np.errstate(invalid='ignore'):
+                if field.greater_than is not None:
+                    mask |= column <= field.greater_than
+                if field.minimum is not None:
+                    mask |= column < field.minimum
+                if field.maximum is not None:
+                    mask |= column > field.maximum
+            bad |= mask
+            columns[name] = np.where(mask, 0, column).astype(np.int64) if field.kind == 'int' else column
+        for rule in self.rules:
+            if all(name in columns for name in rule.fields):
+                bad |= ~np.asarray(rule.check(columns), dtype=bool)
+
+        if bad.any():
+            errors = []
+            for index in np.flatnonzero(bad):
+                _, record_errors = self.validate({name: records[index].get(name) for name in names})
+                errors.extend((int(index), name, message) for name, message in record_errors)
+            raise SchemaError(errors)
+        return columns
+
+    def parse(self, name: str, value, values: dict | None = None):
+        """
+        Проверяет одно поле для пошагового ввода. values - уже введенные параметры для правил,
+        связывающих поля. При ошибке исключение ValueError с текстом для пользователя.
+        """
+        result, error = self._validators[name](value)
+        if error is not None:
+            raise ValueError(error)
+        if values is not None:
+            candidate = {**values, name: result}
+            for rule in self._field_rules[name]:
+                if all(field in candidate for field in rule.fields) and not rule.check(candidate):
+                    raise ValueError(rule.message)
+        return result
+
+    def field_parser(self, name: str, values: dict | None = None) -> Callable:
+        """Функция проверки одного поля для get_input()."""
+        return functools.partial(self.parse, name, values=values)
+
+
+MORTGAGE_SCHEMA = Schema(
+    [
+        Field('object_cost', 'Стоимость объекта', greater_than=0, maximum=MAX_COST),
+        Field('down_payment_percent', 'Первоначальный взнос', greater_than=0, maximum=100),
+        Field('start_date', 'Дата первоначального взноса', kind='date', required=False),
+        Field('loan_term_years', 'Срок кредита', kind='int', greater_than=0, maximum=MAX_TERM_YEARS),
+        Field('annual_rate', 'Годовая ставка', greater_than=0, maximum=MAX_RATE),
+        Field('grace_years', 'Срок льготного периода', kind='int', minimum=0, maximum=MAX_TERM_YEARS, required=False,
+              default=0),
+        Field('grace_rate', 'Льготная ставка', minimum=0, maximum=MAX_RATE, required=False, default=0.0),
+    ],
+    rules=(
+        Rule(('grace_years', 'loan_term_years'),
+             lambda v: (v['grace_years'] == 0) | (v['grace_years'] < v['loan_term_years']),
+             'Срок льготного периода должен быть меньше общего срока.'),
+    ),
+)
+
+TRANCHE_ITEM_SCHEMA = Schema([
+    Field('date', 'Дата транша', kind='month'),
+    Field('percent', 'Сумма транша', greater_than=0, maximum=100, required=False),
+    Field('rate', 'Годовая ставка', minimum=0, maximum=MAX_RATE),
+])
+
+
+def _tranche_percents_defined(values: dict) -> bool:
+    """Сумма задана у всех траншей, кроме последнего по дате (даты уже приведены к виду ГГГГ-ММ)."""
+    tranches = values['tranches']
+    if not tranches:
+        return True  # Пустой список отклоняет правило 'Нужен хотя бы один транш.'
+    last = max(range(len(tranches)), key=lambda idx: tranches[idx]['date'])
+    return all('percent' in tranche for idx, tranche in enumerate(tranches) if idx != last)
+
+
+TRANCHE_SCHEMA = Schema(
+    [
+        Field('cost', 'Стоимость объекта', greater_than=0, maximum=MAX_COST),
+        Field('markup', 'Удорожание', minimum=0, maximum=MAX_MARKUP),
+        Field('initial_percent', 'Первоначальный взнос', minimum=0, maximum=100),
+        Field('loan_term_years', 'Срок кредита', kind='int', greater_than=0, maximum=MAX_TERM_YEARS),
+        Field('num_tranches', 'Количество траншей', kind='int', greater_than=0, required=False),
+        Field('tranches', 'Транши', kind='list', items=TRANCHE_ITEM_SCHEMA),
+    ],
+    rules=(
+        Rule(('tranches',), lambda v: len(v['tranches']) > 0, 'Нужен хотя бы один транш.'),
+        Rule(('num_tranches', 'tranches'), lambda v: v['num_tranches'] == len(v['tranches']),
+             'Количество траншей не совпадает со списком траншей.'),
+        Rule(('tranches',), _tranche_percents_defined,
+             'Сумма в % должна быть указана у всех траншей, кроме последнего.'),
+        Rule(('initial_percent', 'tranches'),
+             lambda v: v['initial_percent'] + sum(tranche.get('percent', 0.0) for tranche in v['tranches']) <= 100,
+             'Первоначальный взнос и транши превышают стоимость объекта.'),
+    ),
+)
+
+INSTALLMENT_SCHEMA = Schema(
+    [
+        Field('cost', 'Стоимость объекта', greater_than=0, maximum=MAX_COST),
+        Field('markup', 'Удорожание', minimum=0, maximum=MAX_MARKUP),
+        Field('down_payment', 'Первоначальный взнос', minimum=0, maximum=100),
+        Field('ddu_date', 'Дата заключения ДДУ', kind='date'),
+        Field('commissioning_date', 'Дата ввода в эксплуатацию', kind='date'),
+        Field('key_handover_date', 'Дата выдачи ключей', kind='date'),
+        Field('program', 'Программа рассрочки', kind='str', required=False),
+    ],
+    rules=(
+        Rule(('commissioning_date', 'ddu_date'), lambda v: v['commissioning_date'] >= v['ddu_date'],
+             'Дата ввода в эксплуатацию не может быть раньше даты ДДУ.'),
+        Rule(('key_handover_date', 'commissioning_date'), lambda v: v['key_handover_date'] >= v['commissioning_date'],
+             'Дата выдачи ключей не может быть раньше даты ввода в эксплуатацию.'),
+    ),
+)
+
+# Общие параметры сделки для сравнения продуктов; параметры продуктов проверяются их собственными схемами
+COMPARISON_SCHEMA = Schema([
+    Field('object_cost', 'Стоимость объекта', greater_than=0, maximum=MAX_COST),
+    Field('down_payment_percent', 'Первоначальный взнос', minimum=0, maximum=100),
+    Field('start_date', 'Дата ДДУ', kind='date'),
+    Field('discount_rate', 'Ставка дисконтирования', minimum=0, maximum=MAX_RATE),
+])
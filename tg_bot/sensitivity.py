@@ -0,0 +1,168 @@
+"""
+Чувствительность платежей к изменению ставки и срока: сетка стресс-сценариев для портфеля сделок.
+Для каждой сделки считается полное декартово произведение сдвигов ставки и сроков,
+результат - массивы NumPy формы (сделки, сдвиги, сроки).
+Степени (1 + r)^n считаются один раз для каждой пары (уникальная ставка, уникальный срок)
+и раздаются сделкам по индексам, поэтому их число не зависит от количества сделок.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from tranche_engine import build_tables, compute_tranche_batch
+
+
+def rate_shocks(low: float = -5.0, high: float = 5.0, step: float = 0.1) -> np.ndarray:
+    """Сдвиги годовой ставки в п.п. от low до high включительно с шагом step."""
+    count = int(round((high - low) / step)) + 1
+    return np.round(low + step * np.arange(count), 10)
+
+
+@dataclass(frozen=True, slots=True)
+class MortgageSensitivity:
+    """
+    Сетка сценариев по ипотеке. Массивы результатов имеют форму (сделки, сдвиги, сроки);
+    сочетания, где льготный период не короче срока кредита, равны NaN.
+    """
+    shocks: np.ndarray  # Сдвиги ставки, п.п.
+    terms: np.ndarray  # Сроки кредита, лет, форма (сделки, сроки)
+    grace_monthly_payment: np.ndarray
+    remaining_loan: np.ndarray
+    main_monthly_payment: np.ndarray
+    overpayment: np.ndarray
+
+
+@dataclass(frozen=True, slots=True)
+class TrancheSensitivity:
+    """
+    Сетка сценариев по ипотеке с траншами. Массивы результатов имеют форму (планы, сдвиги, сроки):
+    peak_payment - суммарный платеж после выдачи всех траншей, overpayment - переплата по процентам.
+    """
+    shocks: np.ndarray  # Сдвиги ставки, п.п.
+    terms: np.ndarray  # Сроки кредита, лет, форма (планы, сроки)
+    peak_payment: np.ndarray
+    overpayment: np.ndarray
+
+
+def _rate_grid_factors(annual_rates: np.ndarray, shocks: np.ndarray, months: np.ndarray):
+    """
+    Месячные ставки, (1 + r)^n и аннуитетные коэффициенты для ставок annual_rates[i] + shocks[j]
+    (не ниже нуля) и сроков months[i, k] месяцев.
+    Возвращает массивы форм (i, j, 1), (i, j, k) и (i, j, k).
+    """
+    base_rates, rate_idx = np.unique(annual_rates, return_inverse=True)
+    month_values, month_idx = np.unique(months, return_inverse=True)
+    month_idx = month_idx.reshape(months.shape)
+
+    table_rates = np.maximum(base_rates[:, None] + shocks[None, :], 0.0) / 100 / 12
+    rates = table_rates[:, :, None]
+    growth_table = (1 + rates) ** month_values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity_table = np.where(rates == 0, 1 / month_values, rates * growth_table / (growth_table - 1))
+    annuity_table[..., month_values == 0] = np.nan
+
+    index = (rate_idx[:, None, None], np.arange(len(shocks))[None, :, None], month_idx[:, None, :])
+    return table_rates[rate_idx][:, :, None], growth_table[index], annuity_table[index]
+
+
+def _terms_grid(loan_term_years: np.ndarray, terms) -> np.ndarray:
+    """Сроки в годах формы (сделки, сроки): собственный срок сделки или общий список terms."""
+    if terms is None:
+        return loan_term_years[:, None]
+    return np.broadcast_to(np.asarray(terms, dtype=np.int64)[None, :], (len(loan_term_years), len(terms)))
+
+
+def mortgage_sensitivity(loan_amounts, loan_term_years, annual_rates, grace_years=0, grace_rates=0.0,
+                         shocks=None, terms=None, shock_grace: bool = False) -> MortgageSensitivity:
+    """
+    Платежи и переплата по ипотеке для всех сочетаний сдвига ставки и срока.
+    Параметры сделок - как у compute_mortgage_batch() (одномерные массивы или скаляры).
+    shocks - сдвиги годовой ставки в п.п. (по умолчанию rate_shocks(): от -5 до +5 с шагом 0.1),
+    ставка после сдвига не опускается ниже нуля.
+    terms - сроки кредита в годах для перебора (по умолчанию - собственный срок каждой сделки).
+    shock_grace - сдвигать ли и льготную ставку (по умолчанию субсидированная ставка не меняется).
+    При нулевом сдвиге и собственном сроке результаты совпадают с compute_mortgage_batch().
+    """
+    loan_amounts, loan_term_years, annual_rates, grace_years, grace_rates = (
+        np.atleast_1d(array) for array in np.broadcast_arrays(
+            np.asarray(loan_amounts, dtype=np.float64),
+            np.asarray(loan_term_years, dtype=np.int64),
+            np.asarray(annual_rates, dtype=np.float64),
+            np.asarray(grace_years, dtype=np.int64),
+            np.asarray(grace_rates, dtype=np.float64),
+        )
+    )
+    shocks = rate_shocks() if shocks is None else np.atleast_1d(np.asarray(shocks, dtype=np.float64))
+    term_grid = _terms_grid(loan_term_years, terms)
+
+    has_grace_period = (grace_years > 0)[:, None]
+    feasible = ~has_grace_period | (grace_years[:, None] < term_grid)  # (сделки, сроки)
+    total_payments = term_grid * 12
+    grace_payments = np.where(has_grace_period, grace_years[:, None] * 12, 0)
+    main_payments = np.where(feasible, total_payments - grace_payments, 0)
+    loan = loan_amounts[:, None, None]
+
+    # Льготный период: платеж - аннуитет на весь срок по льготной ставке, остаток - после grace_payments платежей
+    grace_shocks = shocks if shock_grace else np.zeros(1)
+    grace_rate, _, grace_annuity = _rate_grid_factors(grace_rates, grace_shocks, total_payments)
+    _, grace_growth, _ = _rate_grid_factors(grace_rates, grace_shocks, grace_payments)
+    grace_payment = np.where(has_grace_period[:, :, None], loan * grace_annuity, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining_loan = np.where(
+            grace_rate == 0,
+            loan - grace_payment * grace_payments[:, None, :],
+            loan * grace_growth - grace_payment * ((grace_growth - 1) / grace_rate),
+        )
+    remaining_loan = np.where(has_grace_period[:, :, None], np.maximum(remaining_loan, 0.0), loan)
+
+    # Основной период с учетом сдвига ставки
+    _, _, main_annuity = _rate_grid_factors(annual_rates, shocks, main_payments)
+    shape = (len(loan_amounts), len(shocks), term_grid.shape[1])
+    grace_payment = np.broadcast_to(grace_payment, shape)
+    remaining_loan = np.broadcast_to(remaining_loan, shape)
+    main_payment = np.where(main_payments[:, None, :] > 0, remaining_loan * main_annuity, 0.0)
+    overpayment = grace_payment * grace_payments[:, None, :] + main_payment * main_payments[:, None, :] - loan
+
+    infeasible = ~feasible[:, None, :]
+    return MortgageSensitivity(
+        shocks=shocks,
+        terms=term_grid,
+        grace_monthly_payment=np.where(infeasible, np.nan, grace_payment),
+        remaining_loan=np.where(infeasible, np.nan, remaining_loan),
+        main_monthly_payment=np.where(infeasible, np.nan, main_payment),
+        overpayment=np.where(infeasible, np.nan, overpayment),
+    )
+
+
+def tranche_sensitivity(plans: list[dict], shocks=None, terms=None) -> TrancheSensitivity:
+    """
+    Суммарный платеж и переплата по ипотеке с траншами для всех сочетаний сдвига ставки и срока.
+    plans - параметры в формате tranche_mortgage_calculator.calculate_mortgage().
+    Сдвиг применяется к ставкам всех траншей (не ниже нуля), terms - сроки кредита в годах
+    (по умолчанию - собственный срок плана). Суммы траншей от ставки и срока не зависят и берутся
+    из compute_tranche_batch(); транш с нулевой ставкой гасится равными платежами.
+    """
+    plan_table, tranche_table = build_tables(plans)
+    batch = compute_tranche_batch(plan_table, tranche_table, with_timeline=False)
+    tranches = batch['tranches']
+    shocks = rate_shocks() if shocks is None else np.atleast_1d(np.asarray(shocks, dtype=np.float64))
+    term_grid = _terms_grid(plan_table['loan_term_years'], terms)
+
+    # Транши упорядочены по плану и дате; платежи траншей начинаются со сдвигом от первого транша
+    plan = tranches['plan']
+    delta_months = tranches['month'] - batch['plans']['start_month'][plan]
+    num_payments = np.maximum(term_grid[plan] * 12 - delta_months[:, None], 0)  # (транши, сроки)
+    order = np.lexsort((tranche_table['month'], tranche_table['plan']))
+    rates = np.asarray(tranche_table['rate'], dtype=np.float64)[order]
+    _, _, annuity = _rate_grid_factors(rates, shocks, num_payments)
+    monthly_payment = np.where(num_payments[:, None, :] > 0, tranches['amount'][:, None, None] * annuity, 0.0)
+
+    starts = np.flatnonzero(np.r_[True, plan[1:] != plan[:-1]])
+    peak_payment = np.add.reduceat(monthly_payment, starts, axis=0)
+    total_paid = np.add.reduceat(monthly_payment * num_payments[:, None, :], starts, axis=0)
+    return TrancheSensitivity(
+        shocks=shocks,
+        terms=term_grid,
+        peak_payment=peak_payment,
+        overpayment=total_paid - batch['plans']['loan_amount'][:, None, None],
+    )
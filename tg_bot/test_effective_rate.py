@@ -0,0 +1,99 @@
+"""Сверка effective_rate с расчетом ставок бисекцией по определению (медленно, но без допущений)."""
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+import installment_calculator
+from benchmarks import (make_installment_rows, make_mortgage_rows, make_tranche_rows, to_installment_params,
+                        to_mortgage_params, to_tranche_params)
+from dates import add_months
+from effective_rate import (CashFlow, effective_rates, full_credit_cost, installment_cash_flows,
+                            mortgage_cash_flows, tranche_cash_flows, xirr)
+
+
+def _bisect(present_value, low: float = -0.5, high: float = 10.0) -> float:
+    for _ in range(200):
+        middle = (low + high) / 2
+        if (present_value(middle) > 0) == (present_value(low) > 0):
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def _reference_xirr(flows: list[CashFlow]) -> float:
+    flows = sorted(flows)
+    start = flows[0].date
+    return _bisect(lambda rate: sum(
+        amount * (1 + rate) ** (-(flow_date - start).days / 365) for flow_date, amount in flows)) * 100
+
+
+def _reference_psk(flows: list[CashFlow]) -> float:
+    """ПСК по формуле 353-ФЗ: полные месяцы q_k и остаток e_k в долях следующего месяца."""
+    flows = sorted(flows)
+    start = flows[0].date
+    terms = []
+    for flow_date, amount in flows:
+        months = (flow_date.year - start.year) * 12 + flow_date.month - start.month
+        if add_months(start, months) > flow_date:
+            months -= 1
+        anchor = add_months(start, months)
+        fraction = (flow_date - anchor).days / (add_months(start, months + 1) - anchor).days
+        terms.append((amount, months, fraction))
+    rate = _bisect(lambda rate: sum(
+        amount / ((1 + fraction * rate) * (1 + rate) ** months) for amount, months, fraction in terms))
+    return round(rate * 12 * 100, 3)
+
+
+@pytest.fixture(scope='module')
+def portfolio() -> list[list[CashFlow]]:
+    flows = [mortgage_cash_flows(params) for params in to_mortgage_params(make_mortgage_rows(40))]
+    flows += [tranche_cash_flows(params) for params in to_tranche_params(make_tranche_rows(40))]
+    flows += [
+        installment_cash_flows(params, installment_calculator.calculate_installment(params))
+        for params in to_installment_params(make_installment_rows(40))
+    ]
+    return flows
+
+
+def test_xirr_matches_bisection(portfolio):
+    rates = effective_rates(portfolio, 'xirr')
+    expected = np.array([_reference_xirr(flows) for flows in portfolio])
+    np.testing.assert_allclose(rates, expected, rtol=0, atol=1e-9)
+
+
+def test_psk_matches_bisection(portfolio):
+    rates = effective_rates(portfolio, 'psk')
+    expected = np.array([_reference_psk(flows) for flows in portfolio])
+    np.testing.assert_allclose(rates, expected, rtol=0, atol=1e-9)
+
+
+def test_scalar_helpers_match_batch(portfolio):
+    assert xirr(portfolio[0]) == effective_rates(portfolio[:1], 'xirr')[0]
+    assert full_credit_cost(portfolio[0]) == effective_rates(portfolio[:1], 'psk')[0]
+
+
+def test_plain_annuity_psk_equals_nominal_rate():
+    params = {'object_cost': 10e6, 'down_payment_percent': 20, 'loan_term_years': 20, 'annual_rate': 6.0,
+              'start_date': date(2025, 1, 15)}
+    flows = mortgage_cash_flows(params)
+    assert full_credit_cost(flows) == 6.0
+    assert math.isclose(xirr(flows), 6.1657482346, abs_tol=1e-9)
+
+
+def test_zero_markup_installment_is_exactly_zero():
+    portfolio = []
+    for params in to_installment_params(make_installment_rows(20)):
+        params['markup'] = 0.0
+        portfolio.append(installment_cash_flows(params, installment_calculator.calculate_installment(params)))
+    assert (effective_rates(portfolio, 'xirr') == 0.0).all()
+    assert (effective_rates(portfolio, 'psk') == 0.0).all()
+
+
+def test_one_sided_flows_have_no_rate():
+    flows = [CashFlow(date(2025, 1, 1), 1.0), CashFlow(date(2026, 1, 1), 1.0)]
+    assert np.isnan(effective_rates([flows, []])).all()
+    with pytest.raises(ValueError):
+        xirr(flows)
@@ -1,15 +1,41 @@
+import asyncio
+import functools
+import io
 import logging
-from telegram import Update, ReplyKeyboardMarkup
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Update,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from telegram.error import BadRequest
 from telegram.ext import (
-    Updater,
+    Application,
+    ApplicationBuilder,
+    BaseUpdateProcessor,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters,
     ConversationHandler,
-    CallbackContext,
+    ContextTypes,
+    TypeHandler,
 )
-from config import BOT_TOKEN
-from mortgage_calculator import calculate_mortgage
+from telegram.request import BaseRequest, HTTPXRequest
+from telegram.warnings import PTBUserWarning
+import metrics
+from dialog_persistence import DialogPersistence, SqliteBackend
+from export import export_rows
+from mortgage_calculator import MortgageResult, date_format, validate_yes_no
+from payment_schedule import iter_mortgage_schedule
+from quick_quote import QUICK_QUOTE_HELP, parse_quick_quote
+from quote_cache import cached_compute_mortgage
+from schema import MORTGAGE_SCHEMA
 
 # Настройка логирования
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -23,68 +49,428 @@ logger = logging.getLogger(__name__)
     INPUT_LOAN_TERM,
     INPUT_RATE,
     INPUT_GRACE_PERIOD,
-) = range(6)
+    INPUT_GRACE_YEARS,
+    INPUT_GRACE_RATE,
+) = range(8)
+
+# Незавершенный диалог удаляется после суток бездействия
+DIALOG_TIMEOUT = 24 * 60 * 60
+DIALOGS_DB_PATH = 'dialogs.sqlite3'
+
+YES_NO_KEYBOARD = ReplyKeyboardMarkup([['Да', 'Нет']], one_time_keyboard=True, resize_keyboard=True)
+
+# Формат файла с графиком платежей, который бот отправляет после расчета
+SCHEDULE_FORMAT = 'xlsx'
 
+# Inline-режим: расчет начинается после паузы в наборе, ответы кэшируются на стороне Telegram
+INLINE_DEBOUNCE = 0.3  # с
+INLINE_CACHE_TIME = 300  # с
 
-def start(update: Update) -> int:
+# Пул потоков для расчетов, чтобы долгий расчет не блокировал обработку других чатов
+calculation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='calculation')
+
+
+@metrics.timed('bot_handler_seconds')
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.message.from_user
-    update.message.reply_text(
+    context.user_data.clear()
+    await update.message.reply_text(
         f'Привет, {user.first_name}! Я помогу рассчитать ипотеку.\n'
         'Введите стоимость объекта (руб.):'
     )
     return INPUT_OBJECT_COST
 
 
-def input_object_cost(update: Update, context: CallbackContext) -> int:
+@metrics.timed('bot_handler_seconds')
+async def input_object_cost(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
-        cost = float(update.message.text)
-        context.user_data['object_cost'] = cost
-        update.message.reply_text('Введите первоначальный взнос (%):')
-        return INPUT_DOWN_PAYMENT
-    except ValueError:
-        update.message.reply_text('❌ Ошибка! Введите число.')
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['object_cost'] = MORTGAGE_SCHEMA.parse('object_cost', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_object_cost')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
         return INPUT_OBJECT_COST
+    await update.message.reply_text('Введите первоначальный взнос (%):')
+    return INPUT_DOWN_PAYMENT
 
 
-# ... аналогичные обработчики для других шагов ...
+@metrics.timed('bot_handler_seconds')
+async def input_down_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['down_payment_percent'] = MORTGAGE_SCHEMA.parse(
+                'down_payment_percent', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_down_payment')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_DOWN_PAYMENT
+    await update.message.reply_text('Введите дату первоначального взноса (ДД.ММ.ГГГГ):')
+    return INPUT_START_DATE
 
-def calculate(update: Update, context: CallbackContext) -> int:
-    user_data = context.user_data
-    result = calculate_mortgage(user_data)
 
-    response = (
-        '📊 Результаты расчета:\n'
-        f'▪ Ежемесячный платеж: {result['monthly_payment']:.2f} руб.\n'
-        f'▪ Общая переплата: {result['total_overpayment']:.2f} руб.\n'
-        # ... другие параметры ...
-    )
+@metrics.timed('bot_handler_seconds')
+async def input_start_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['start_date'] = MORTGAGE_SCHEMA.parse('start_date', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_start_date')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_START_DATE
+    await update.message.reply_text('Введите срок кредита (лет):')
+    return INPUT_LOAN_TERM
+
+
+@metrics.timed('bot_handler_seconds')
+async def input_loan_term(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['loan_term_years'] = MORTGAGE_SCHEMA.parse('loan_term_years', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_loan_term')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_LOAN_TERM
+    await update.message.reply_text('Введите годовую ставку (%):')
+    return INPUT_RATE
+
+
+@metrics.timed('bot_handler_seconds')
+async def input_rate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['annual_rate'] = MORTGAGE_SCHEMA.parse('annual_rate', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_rate')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_RATE
+    await update.message.reply_text('Есть льготный период? (да/нет)', reply_markup=YES_NO_KEYBOARD)
+    return INPUT_GRACE_PERIOD
+
 
-    update.message.reply_text(response)
+@metrics.timed('bot_handler_seconds')
+async def input_grace_period(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            has_grace_period = validate_yes_no(update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_grace_period')
+        await update.message.reply_text(f'❌ Ошибка: {err}', reply_markup=YES_NO_KEYBOARD)
+        return INPUT_GRACE_PERIOD
+    if not has_grace_period:
+        return await calculate(update, context)
+    await update.message.reply_text('Введите срок льготного периода (лет):', reply_markup=ReplyKeyboardRemove())
+    return INPUT_GRACE_YEARS
+
+
+@metrics.timed('bot_handler_seconds')
+async def input_grace_years(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            grace_years = MORTGAGE_SCHEMA.parse('grace_years', update.message.text, context.user_data)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_grace_years')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_GRACE_YEARS
+    context.user_data['grace_years'] = grace_years
+    await update.message.reply_text('Введите годовую ставку в льготный период (%):')
+    return INPUT_GRACE_RATE
+
+
+@metrics.timed('bot_handler_seconds')
+async def input_grace_rate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        with metrics.timer('bot_stage_seconds', stage='validation'):
+            context.user_data['grace_rate'] = MORTGAGE_SCHEMA.parse('grace_rate', update.message.text)
+    except ValueError as err:
+        metrics.inc('bot_validation_errors_total', handler='input_grace_rate')
+        await update.message.reply_text(f'❌ Ошибка: {err}')
+        return INPUT_GRACE_RATE
+    return await calculate(update, context)
+
+
+def format_result(result: MortgageResult) -> str:
+    """Формирует текст сообщения с результатами расчета."""
+    lines = ['📊 Результаты расчета:']
+    if result.grace_payments:
+        lines += [
+            '\nЛьготный период:',
+            f'▪ Число платежей: {result.grace_payments}',
+            f'▪ Дата окончания: {result.grace_end_date.strftime(date_format)}',
+            f'▪ Ежемесячный платеж: {result.grace_monthly_payment:.2f} руб.',
+            f'▪ Остаток долга: {result.remaining_loan:.2f} руб.',
+            '\nОсновной период:',
+        ]
+    lines += [
+        f'▪ Число платежей: {result.main_payments}',
+        f'▪ Дата последнего платежа: {result.final_end_date.strftime(date_format)}',
+        f'▪ Ежемесячный платеж: {result.main_monthly_payment:.2f} руб.',
+        f'▪ Сумма кредита: {result.loan_amount:.2f} руб.',
+        f'▪ Общая переплата: {result.overpayment:.2f} руб.',
+    ]
+    return '\n'.join(lines)
+
+
+async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Расчет по собранным параметрам диалога. Вызывается из обработчиков input_grace_period
+    и input_grace_rate и сам не замеряется: его время уже входит в bot_handler_seconds этих обработчиков.
+    """
+    params = dict(context.user_data)
+    context.application.drop_user_data(update.effective_user.id)
+
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.timer('bot_stage_seconds', stage='calculation'):
+            result = await loop.run_in_executor(calculation_executor, cached_compute_mortgage, params)
+    except ValueError as err:
+        await update.message.reply_text(f'❌ Ошибка: {err}', reply_markup=ReplyKeyboardRemove())
+        return ConversationHandler.END
+
+    with metrics.timer('bot_stage_seconds', stage='formatting'):
+        text = format_result(result)
+    await update.message.reply_text(text, reply_markup=ReplyKeyboardRemove())
+
+    with metrics.timer('bot_stage_seconds', stage='export'):
+        schedule = await loop.run_in_executor(calculation_executor, build_schedule_file, params)
+    with schedule:
+        await update.message.reply_document(schedule, filename=f'schedule.{SCHEDULE_FORMAT}',
+                                            caption='График платежей')
     return ConversationHandler.END
 
 
-def cancel(update: Update, context: CallbackContext) -> int:
-    update.message.reply_text('Расчет отменен.')
+def build_schedule_file(params: dict):
+    """Выгружает помесячный график платежей в формате SCHEDULE_FORMAT в буфер в памяти."""
+    return export_rows(iter_mortgage_schedule(params), SCHEDULE_FORMAT, file=io.BytesIO())
+
+
+def _inline_article(result_id: str, title: str, description: str, text: str) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(result_id, title, InputTextMessageContent(text), description=description)
+
+
+async def answer_inline_quote(query: InlineQuery) -> None:
+    """
+    Отвечает на inline-запрос расчетом ипотеки. Сначала выжидает INLINE_DEBOUNCE:
+    если пользователь продолжает набирать текст, задача отменяется до начала расчета.
+    """
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    text = query.query.strip()
+    if not text:
+        metrics.inc('bot_inline_queries_total', result='help')
+        results = [_inline_article('help', 'Быстрый расчет ипотеки', QUICK_QUOTE_HELP, QUICK_QUOTE_HELP)]
+    else:
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timer('bot_stage_seconds', stage='validation'):
+                params = parse_quick_quote(text)
+            with metrics.timer('bot_stage_seconds', stage='calculation'):
+                result = await loop.run_in_executor(calculation_executor, cached_compute_mortgage, params)
+        except ValueError as err:
+            metrics.inc('bot_inline_queries_total', result='invalid')
+            results = [_inline_article('error', '❌ Не удалось рассчитать', str(err), f'❌ Ошибка: {err}')]
+        else:
+            metrics.inc('bot_inline_queries_total', result='answered')
+            summary = (f'🏠 Стоимость {params["object_cost"]:.2f} руб., взнос {params["down_payment_percent"]:g}%, '
+                       f'срок {params["loan_term_years"]} лет, ставка {params["annual_rate"]:g}%')
+            results = [_inline_article(
+                'quote',
+                f'Платеж {result.main_monthly_payment:.2f} руб./мес.',
+                f'Кредит {result.loan_amount:.2f} руб., переплата {result.overpayment:.2f} руб.',
+                f'{summary}\n\n{format_result(result)}',
+            )]
+    try:
+        await query.answer(results, cache_time=INLINE_CACHE_TIME)
+    except BadRequest as err:
+        # Запрос мог устареть, пока пользователь набирал текст
+        logger.debug('Ответ на inline-запрос не отправлен: %s', err)
+
+
+def _forget_inline_task(tasks: dict, user_id: int, task: asyncio.Task) -> None:
+    if tasks.get(user_id) is task:
+        del tasks[user_id]
+
+
+@metrics.timed('bot_handler_seconds')
+async def inline_quote(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Inline-запрос "@bot 12000000 20% 30y 6%". Telegram присылает запрос на каждое изменение текста,
+    поэтому незавершенный расчет по предыдущему запросу того же пользователя отменяется.
+    """
+    query = update.inline_query
+    user_id = query.from_user.id
+    tasks = context.bot_data.setdefault('inline_quotes', {})
+    previous = tasks.get(user_id)
+    if previous is not None and not previous.done():
+        previous.cancel()
+        metrics.inc('bot_inline_queries_total', result='superseded')
+    task = context.application.create_task(answer_inline_quote(query), update=update)
+    tasks[user_id] = task
+    task.add_done_callback(functools.partial(_forget_inline_task, tasks, user_id))
+
+
+@metrics.timed('bot_handler_seconds')
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.application.drop_user_data(update.effective_user.id)
+    await update.message.reply_text('Расчет отменен.', reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
 
-def main() -> None:
-    updater = Updater(BOT_TOKEN)
-    dispatcher = updater.dispatcher
+@metrics.timed('bot_handler_seconds')
+async def drop_dialog(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Удаляет данные диалога, прерванного по таймауту."""
+    context.application.drop_user_data(update.effective_user.id)
 
-    conv_handler = ConversationHandler(
+
+def build_conversation_handler(
+        persistent: bool = False,
+        conversation_timeout: float | None = None
+) -> ConversationHandler:
+    """Создает обработчик диалога расчета ипотеки."""
+    text = filters.TEXT & ~filters.COMMAND
+    return ConversationHandler(
         entry_points=[CommandHandler('start', start)],
         states={
-            INPUT_OBJECT_COST: [MessageHandler(filters.text & ~filters.command, input_object_cost)],
-            INPUT_DOWN_PAYMENT: [MessageHandler(filters.text & ~filters.command, input_down_payment)],
-            # ... другие состояния ...
+            INPUT_OBJECT_COST: [MessageHandler(text, input_object_cost)],
+            INPUT_DOWN_PAYMENT: [MessageHandler(text, input_down_payment)],
+            INPUT_START_DATE: [MessageHandler(text, input_start_date)],
+            INPUT_LOAN_TERM: [MessageHandler(text, input_loan_term)],
+            INPUT_RATE: [MessageHandler(text, input_rate)],
+            INPUT_GRACE_PERIOD: [MessageHandler(text, input_grace_period)],
+            INPUT_GRACE_YEARS: [MessageHandler(text, input_grace_years)],
+            INPUT_GRACE_RATE: [MessageHandler(text, input_grace_rate)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, drop_dialog)],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        name='mortgage',
+        persistent=persistent,
+        conversation_timeout=conversation_timeout,
     )
 
-    dispatcher.add_handler(conv_handler)
-    updater.start_polling()
-    updater.idle()
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает обновления разных пользователей параллельно, а одного пользователя - по очереди:
+    шаг диалога и calculate() не выполняются дважды при повторной отправке сообщения.
+    """
+
+    def __init__(self, max_concurrent_updates: int = 256):
+        super().__init__(max_concurrent_updates)
+        # Пользователь (или чат) -> [блокировка, число ожидающих ее обновлений]
+        self._locks: dict[int, list] = {}
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = None
+        if isinstance(update, Update):
+            user, chat = update.effective_user, update.effective_chat
+            key = user.id if user else chat.id if chat else None
+        if key is None:
+            await coroutine
+            return
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class InstrumentedRequest(BaseRequest):
+    """Обертка транспорта Bot API, замеряющая длительность запросов к Telegram по методам."""
+
+    def __init__(self, request: BaseRequest):
+        self._request = request
+
+    @property
+    def read_timeout(self) -> float | None:
+        return self._request.read_timeout
+
+    async def initialize(self) -> None:
+        await self._request.initialize()
+
+    async def shutdown(self) -> None:
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None) -> tuple[int, bytes]:
+        with metrics.timer('bot_api_seconds', method=url.rsplit('/', 1)[-1]):
+            return await self._request.do_request(url, method, request_data, read_timeout, write_timeout,
+                                                  connect_timeout, pool_timeout)
+
+
+def setup_metrics(builder: ApplicationBuilder, request: BaseRequest, port: int | None = None,
+                  log_interval: float | None = None) -> ApplicationBuilder:
+    """
+    Включает метрики: запросы к Bot API идут через InstrumentedRequest, при запуске бота
+    поднимается точка GET /metrics на порту port и/или сводка пишется в журнал раз в log_interval секунд.
+    """
+    metrics.enable()
+    server = None
+
+    async def post_init(application: Application) -> None:
+        nonlocal server
+        if port:
+            server = await metrics.start_http_server(port)
+            logger.info('Метрики доступны на http://127.0.0.1:%s/metrics', port)
+        if log_interval:
+            application.create_task(metrics.log_periodically(log_interval))
+
+    async def post_shutdown(application: Application) -> None:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    return builder.request(InstrumentedRequest(request)).post_init(post_init).post_shutdown(post_shutdown)
+
+
+def build_application(builder: ApplicationBuilder, persistence: DialogPersistence | None = None) -> Application:
+    """
+    Собирает приложение бота из подготовленного ApplicationBuilder.
+    Обновления от разных пользователей обрабатываются параллельно, от одного - по очереди.
+    С persistence состояние диалогов сохраняется между перезапусками.
+    """
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    application = builder.concurrent_updates(PerUserUpdateProcessor()).build()
+    if persistence is not None:
+        persistence.set_application(application)
+
+    conversation_timeout = None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', PTBUserWarning)
+        has_job_queue = application.job_queue is not None
+    if has_job_queue:
+        conversation_timeout = DIALOG_TIMEOUT
+    elif persistence is None:
+        # С persistence брошенные диалоги удаляются из памяти вместе с записями хранилища по ttl
+        logger.warning('JobQueue недоступен: незавершенные диалоги не будут удаляться из памяти по таймауту.')
+
+    application.add_handler(build_conversation_handler(persistence is not None, conversation_timeout))
+    # Для inline-режима его нужно включить у бота командой /setinline в BotFather
+    application.add_handler(InlineQueryHandler(inline_quote))
+    return application
+
+
+def main() -> None:
+    import config
+
+    builder = Application.builder().token(config.BOT_TOKEN)
+    # Метрики включаются параметрами METRICS_PORT и/или METRICS_LOG_INTERVAL в config.py
+    metrics_port = getattr(config, 'METRICS_PORT', None)
+    metrics_log_interval = getattr(config, 'METRICS_LOG_INTERVAL', None)
+    if metrics_port or metrics_log_interval:
+        builder = setup_metrics(builder, HTTPXRequest(connection_pool_size=256), metrics_port, metrics_log_interval)
+
+    persistence = DialogPersistence(SqliteBackend(DIALOGS_DB_PATH), ttl=DIALOG_TIMEOUT)
+    application = build_application(builder, persistence)
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+import numpy as np
+
+from dates import parse_month
+
+# Структура записи о транше: номер плана, номер месяца (год * 12 + месяц - 1),
+# сумма транша в % от стоимости (для последнего транша плана не используется), годовая ставка в %
+TRANCHE_DTYPE = np.dtype([
+    ('plan', np.int64),
+    ('month', np.int64),
+    ('percent', np.float64),
+    ('rate', np.float64),
+])
+
+
+def build_tables(plans: list[dict]) -> tuple[dict, np.ndarray]:
+    """
+    Преобразует список параметров в формате tranche_mortgage_calculator.calculate_mortgage()
+    в таблицу планов (словарь массивов) и массив записей о траншах TRANCHE_DTYPE.
+    Даты траншей разбираются один раз.
+    """
+    plan_table = {
+        'cost': np.fromiter((plan['cost'] for plan in plans), np.float64, len(plans)),
+        'markup': np.fromiter((plan['markup'] for plan in plans), np.float64, len(plans)),
+        'initial_percent': np.fromiter((plan['initial_percent'] for plan in plans), np.float64, len(plans)),
+        'loan_term_years': np.fromiter((plan['loan_term_years'] for plan in plans), np.int64, len(plans)),
+    }
+    tranche_table = np.fromiter(
+        ((plan_idx, parse_month(tranche['date']), tranche.get('percent', np.nan), tranche['rate'])
+         for plan_idx, plan in enumerate(plans) for tranche in plan['tranches']),
+        TRANCHE_DTYPE
+    )
+    return plan_table, tranche_table
+
+
+def compute_tranche_batch(plan_table: dict, tranche_table, with_timeline: bool = True) -> dict:
+    """
+    Рассчитывает ипотеку с траншами сразу для множества планов.
+    plan_table - словарь массивов cost, markup, initial_percent, loan_term_years (по одному значению на план).
+    tranche_table - массив записей TRANCHE_DTYPE или словарь массивов с теми же полями.
+    Возвращает словарь:
+    - plans: full_cost, initial_payment, loan_amount, start_month, loan_term_months по планам,
+      а также максимальный суммарный платеж peak_payment и месяц его начала peak_month
+    - tranches: plan, month, amount, num_payments, monthly_payment, total_loan по траншам,
+      упорядоченным по плану и дате, как в calculate_mortgage()
+    - timeline: матрица (планы x месяцы) суммарного платежа по всем выданным траншам,
+      столбец j - платеж за (j + 1)-й месяц от даты первого транша (None, если with_timeline=False)
+    """
+    cost = np.asarray(plan_table['cost'], dtype=np.float64)
+    markup = np.asarray(plan_table['markup'], dtype=np.float64)
+    initial_percent = np.asarray(plan_table['initial_percent'], dtype=np.float64)
+    loan_term_months = np.asarray(plan_table['loan_term_years'], dtype=np.int64) * 12
+    num_plans = len(cost)
+
+    full_cost = cost * (1 + markup / 100)
+    initial_payment = full_cost * initial_percent / 100
+    loan_amount = full_cost - initial_payment
+
+    # Сортировка траншей по плану и дате (устойчивая, как sorted() в calculate_mortgage)
+    plan = np.asarray(tranche_table['plan'], dtype=np.int64)
+    month = np.asarray(tranche_table['month'], dtype=np.int64)
+    order = np.lexsort((month, plan))
+    plan = plan[order]
+    month = month[order]
+    percent = np.asarray(tranche_table['percent'], dtype=np.float64)[order]
+    rate = np.asarray(tranche_table['rate'], dtype=np.float64)[order]
+
+    counts = np.bincount(plan, minlength=num_plans)
+    if np.any(counts == 0):
+        raise ValueError('Каждый план должен содержать хотя бы один транш.')
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    position = np.arange(len(plan)) - starts[plan]  # Номер транша внутри плана
+    is_last = position == counts[plan] - 1
+
+    # Суммы траншей: последний транш плана - остаток кредита
+    amount = np.where(is_last, 0.0, full_cost[plan] * percent / 100)
+    amount[is_last] = (loan_amount - np.bincount(plan, weights=amount, minlength=num_plans))[plan[is_last]]
+
+    # Количество платежей и ежемесячный платеж по каждому траншу
+    start_month = month[starts]
+    delta_months = month - start_month[plan]
+    num_payments = np.maximum(loan_term_months[plan] - delta_months, 0)
+    monthly_rate = rate / 100 / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly_payment = (amount * monthly_rate) / (1 - (1 + monthly_rate) ** -num_payments)
+    monthly_payment = np.where((num_payments == 0) | (monthly_rate == 0), 0.0, monthly_payment)
+
+    # Нарастающий итог выданных сумм и суммарного платежа внутри плана.
+    # Платеж транша начинается в месяце, следующем за выдачей, и действует до конца срока,
+    # поэтому максимум суммарного платежа достигается в момент начала платежей по одному из траншей.
+    total_loan = np.empty_like(amount)
+    issued = np.zeros(num_plans)
+    combined_payment = np.zeros(num_plans)
+    peak_payment = np.zeros(num_plans)
+    peak_month = start_month + 1
+    for idx in range(counts.max()):
+        mask = position == idx
+        mask_plan = plan[mask]
+        issued[mask_plan] += amount[mask]
+        total_loan[mask] = issued[mask_plan]
+        combined_payment[mask_plan] += monthly_payment[mask]
+        higher = combined_payment[mask_plan] > peak_payment[mask_plan]
+        peak_payment[mask_plan[higher]] = combined_payment[mask_plan[higher]]
+        peak_month[mask_plan[higher]] = month[mask][higher] + 1
+
+    timeline = None
+    if with_timeline:
+        # Разностный массив: платеж транша действует с месяца выдачи до конца срока кредита
+        horizon = int(loan_term_months.max())
+        diff = np.zeros((num_plans, horizon + 1))
+        np.add.at(diff, (plan, np.minimum(delta_months, horizon)), monthly_payment)
+        np.add.at(diff, (plan, loan_term_months[plan]), -monthly_payment)
+        timeline = np.cumsum(diff[:, :-1], axis=1)
+        timeline[np.arange(horizon) >= loan_term_months[:, None]] = 0.0
+
+    return {
+        'plans': {
+            'full_cost': full_cost,
+            'initial_payment': initial_payment,
+            'loan_amount': loan_amount,
+            'start_month': start_month,
+            'loan_term_months': loan_term_months,
+            'peak_payment': peak_payment,
+            'peak_month': peak_month,
+        },
+        'tranches': {
+            'plan': plan,
+            'month': month,
+            'amount': amount,
+            'num_payments': num_payments,
+            'monthly_payment': monthly_payment,
+            'total_loan': total_loan,
+        },
+        'timeline': timeline,
+    }
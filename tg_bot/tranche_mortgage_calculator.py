@@ -1,5 +1,7 @@
-# Импорт модуля datetime для работы с датами
-from datetime import datetime
+# Разбор и форматирование дат ГГГГ-ММ
+from dates import format_month, parse_month
+from input_tools import get_input
+from schema import TRANCHE_ITEM_SCHEMA, TRANCHE_SCHEMA
 
 
 def input_parameters():
@@ -9,27 +11,54 @@ def input_parameters():
     """
     params = {}
     # Ввод основных параметров
-    params['cost'] = float(input('Введите стоимость объекта, руб.: '))
-    params['markup'] = float(input('Введите удорожание, %: '))
-    params['initial_percent'] = float(input('Введите первоначальный взнос, %: '))
-    params['loan_term_years'] = int(input('Введите срок кредита, лет: '))
-    params['num_tranches'] = int(input('Введите количество траншей: '))
+    for name, prompt in (
+            ('cost', 'Введите стоимость объекта, руб.: '),
+            ('markup', 'Введите удорожание, %: '),
+            ('initial_percent', 'Введите первоначальный взнос, %: '),
+            ('loan_term_years', 'Введите срок кредита, лет: '),
+            ('num_tranches', 'Введите количество траншей: '),
+    ):
+        params[name] = get_input(prompt, TRANCHE_SCHEMA.field_parser(name))
     params['tranches'] = []
 
     # Ввод данных для каждого транша
     for i in range(params['num_tranches']):
         tranche = {}
         print(f'Транш {i + 1}:')
-        tranche['date'] = input('Дата транша (формат ГГГГ-ММ): ')
+        tranche['date'] = get_input('Дата транша (формат ГГГГ-ММ): ', TRANCHE_ITEM_SCHEMA.field_parser('date'))
         # Для последнего транша процент не запрашивается
         if i < params['num_tranches'] - 1:
-            tranche['percent'] = float(input('Сумма транша, % от стоимости: '))
-        tranche['rate'] = float(input('Годовая ставка, %: '))
+            tranche['percent'] = get_input('Сумма транша, % от стоимости: ',
+                                           TRANCHE_ITEM_SCHEMA.field_parser('percent'))
+        tranche['rate'] = get_input('Годовая ставка, %: ', TRANCHE_ITEM_SCHEMA.field_parser('rate'))
         params['tranches'].append(tranche)
 
     return params
 
 
+def merge_payment_streams(streams, end_month: int) -> list:
+    """
+    Объединяет ежемесячные платежи траншей в единый график суммарного платежа.
+    streams - список кортежей (месяц первого платежа, ежемесячный платеж), месяцы отсчитываются
+    от даты первого транша, каждый платеж действует до месяца end_month (не включая).
+    Расчет идет по событиям изменения платежа, без перебора месяцев.
+    Возвращает список кортежей (первый месяц, месяц после последнего, суммарный платеж).
+    """
+    changes = {}
+    for first_month, payment in streams:
+        if first_month < end_month and payment:
+            changes[first_month] = changes.get(first_month, 0.0) + payment
+            changes[end_month] = changes.get(end_month, 0.0) - payment
+
+    periods = []
+    current_payment = 0.0
+    months = sorted(changes)
+    for month, next_month in zip(months, months[1:]):
+        current_payment += changes[month]
+        periods.append((month, next_month, current_payment))
+    return periods
+
+
 def calculate_mortgage(params):
     """
     Выполняет расчет ипотеки на основе переданных параметров.
@@ -42,11 +71,10 @@ def calculate_mortgage(params):
     # Сумма кредита (полная стоимость минус первоначальный взнос)
     loan_amount = full_cost - initial_payment
 
-    # Сортировка траншей по дате
-    sorted_tranches = sorted(
-        params['tranches'],
-        key=lambda x: datetime.strptime(x['date'], '%Y-%m')
-    )
+    # Сортировка траншей по дате (каждая дата разбирается один раз)
+    tranche_months = [parse_month(tranche['date']) for tranche in params['tranches']]
+    order = sorted(range(len(tranche_months)), key=tranche_months.__getitem__)
+    sorted_tranches = [params['tranches'][i] for i in order]
     # Список сумм траншей
     tranche_amounts = []
 
@@ -64,7 +92,7 @@ def calculate_mortgage(params):
     loan_term_months = params['loan_term_years'] * 12
     # Дата начала кредита (дата первого транша)
     start_date = sorted_tranches[0]['date']
-    start_date_dt = datetime.strptime(start_date, '%Y-%m')
+    start_month = tranche_months[order[0]]
 
     results = {
         'full_cost': full_cost,
@@ -76,6 +104,7 @@ def calculate_mortgage(params):
     }
 
     total_issued = 0  # Общая сумма выданных траншей
+    payment_streams = []  # Платежи траншей для суммарного графика
 
     # Расчет данных для каждого транша
     for i in range(params['num_tranches']):
@@ -85,8 +114,7 @@ def calculate_mortgage(params):
         rate = tranche['rate']
 
         # Расчет разницы в месяцах между датой транша и началом кредита
-        current_date_dt = datetime.strptime(date, '%Y-%m')
-        delta_months = (current_date_dt.year - start_date_dt.year) * 12 + (current_date_dt.month - start_date_dt.month)
+        delta_months = tranche_months[order[i]] - start_month
         # Количество платежей для транша
         num_payments = max(loan_term_months - delta_months, 0)
 
@@ -99,6 +127,8 @@ def calculate_mortgage(params):
 
         # Обновление общей выданной суммы
         total_issued += amount
+        # Первый платеж по траншу - в месяце, следующем за выдачей
+        payment_streams.append((delta_months + 1, monthly_payment))
 
         # Сохранение результатов транша
         results['tranches'].append({
@@ -108,6 +138,21 @@ def calculate_mortgage(params):
             'total_loan': total_issued
         })
 
+    # Суммарный платеж по всем выданным траншам и его максимум
+    results['timeline'] = []
+    results['peak_payment'] = 0.0
+    results['peak_date'] = None
+    for first_month, next_month, payment in merge_payment_streams(payment_streams, loan_term_months + 1):
+        period = {
+            'date_from': format_month(start_month + first_month),
+            'date_to': format_month(start_month + next_month - 1),
+            'monthly_payment': payment
+        }
+        results['timeline'].append(period)
+        if payment > results['peak_payment']:
+            results['peak_payment'] = payment
+            results['peak_date'] = period['date_from']
+
     return results
 
 
@@ -125,6 +170,13 @@ def print_results(results):
         print(f'Ежемесячный платеж: {tranche["monthly_payment"]:.2f} руб.')
         print(f'Общая сумма кредита: {tranche["total_loan"]:.2f} руб.')
 
+    # Вывод суммарного платежа по периодам
+    print('\nСуммарный ежемесячный платеж:')
+    for period in results['timeline']:
+        print(f'{period["date_from"]} - {period["date_to"]}: {period["monthly_payment"]:.2f} руб.')
+    if results['peak_date'] is not None:
+        print(f'Максимальный платеж: {results["peak_payment"]:.2f} руб. с {results["peak_date"]}')
+
 
 def main():
     """Основная функция программы."""